@@ -1,45 +1,142 @@
-"""Graphic display of Boggle board"""
+"""Graphic display of Boggle board.
+
+The display can instead record what it would draw (see display), to
+be rendered later into frames or an animated GIF (see render_log).
+"""
+import time
 from typing import Optional
 
 import graphics.grid as grid_view
+import graphics.raster
+import graphics.recorder
 
 COLOR_UNUSED = grid_view.tile_background
 COLOR_IN_USE = grid_view.tile_accent_background
 
 VIEW: Optional[grid_view.Grid] = None
 
+# Log of drawing operations, when recording instead of drawing
+RECORDING: Optional[graphics.recorder.Recorder] = None
+
 
 def display(board: list[list[str]],
             width: int = 500, height: int = 500,
-            title="BOGGLER"):
+            title="BOGGLER", backend: str = "tk",
+            frame_pattern: Optional[str] = None,
+            record_path: Optional[str] = None):
     """Create a graphical representation of the Boggle board.
     We cache the model component (board) so we can reuse it when
     calls are made to occupy or leave a cell.
+    With backend "raster", the board is drawn off-screen and saved
+    as image files named by frame_pattern (see grid_view.Grid); with
+    backend "none", there is no display.
+    With record_path, nothing is drawn; instead cell colors are
+    logged to record_path as they change (see graphics.recorder).
     """
-    global VIEW
-    VIEW = grid_view.Grid(len(board), len(board[0]), title="BOGGLER")
+    global VIEW, RECORDING
+    if backend == "none" and not record_path:
+        return
+    if record_path:
+        RECORDING = graphics.recorder.Recorder(record_path,
+            {"view": "board_view", "board": board, "width": width,
+             "height": height, "title": title})
+        return
+    VIEW = grid_view.Grid(len(board), len(board[0]), width, height, title=title,
+                          backend=backend, frame_pattern=frame_pattern)
     for row_i in range(len(board)):
         for col_i in range(len(board[0])):
             VIEW.fill_cell(row_i, col_i, COLOR_UNUSED)
             VIEW.label_cell(row_i, col_i, board[row_i][col_i])
+    VIEW.flush()
+
+
+def active() -> bool:
+    """Is there a display (or recording) to show the search?"""
+    return VIEW is not None or RECORDING is not None
 
 
 def mark_occupied(row: int, col: int):
     """Mark board[row][col] as occupied in display"""
     if VIEW:
         VIEW.fill_cell(row, col, color=COLOR_IN_USE)
+    elif RECORDING:
+        RECORDING.record("fill", row, col, COLOR_IN_USE)
 
 
 def mark_unoccupied(row: int, col: int):
     """Mark board[row][col] as unoccupied (available)"""
     if VIEW:
         VIEW.fill_cell(row, col, color=COLOR_UNUSED)
+    elif RECORDING:
+        RECORDING.record("fill", row, col, COLOR_UNUSED)
+
+
+def replay(steps: list[tuple[int, int, bool]], max_fps: int = 30):
+    """Animate a recorded search, as logged by boggler.boggle_solve.
+    Each step is (row, col, occupied).  Steps are shown no faster
+    than max_fps, so the animation is watchable however fast the
+    search was (an off-screen display saves one frame per step, with
+    no delay).  When recording, step n is logged at time
+    (n + 1) / max_fps, so that rendering at max_fps shows one step
+    per frame.  Does nothing if there is no display.
+    """
+    if RECORDING:
+        for step_i, (row, col, occupied) in enumerate(steps):
+            color = COLOR_IN_USE if occupied else COLOR_UNUSED
+            RECORDING.record("fill", row, col, color, at=(step_i + 1) / max_fps)
+        return
+    if not VIEW:
+        return
+    frame_time = 1.0 / max_fps
+    next_frame = time.monotonic()
+    for row, col, occupied in steps:
+        if occupied:
+            mark_occupied(row, col)
+        else:
+            mark_unoccupied(row, col)
+        VIEW.flush()
+        next_frame += frame_time
+        delay = next_frame - time.monotonic()
+        if VIEW.live and delay > 0:
+            time.sleep(delay)
 
 
 def prompt_to_close():
-    """Prompt the user before closing the display"""
-    global VIEW
+    """Prompt the user before closing the display
+    (or, when recording, finish the log)
+    """
+    global VIEW, RECORDING
+    if RECORDING:
+        RECORDING.close()
+        RECORDING = None
     if VIEW:
-        input("Press enter to close display")
+        VIEW.flush()
+        if VIEW.live:
+            input("Press enter to close display")
         VIEW.win.close()
         VIEW = None
+
+
+def render_log(log_path: str, fps: float = 30, slowdown: float = 1.0,
+               frame_pattern: Optional[str] = None,
+               gif_path: Optional[str] = None) -> int:
+    """Render a log recorded by display (with record_path) into
+    numbered frames and/or an animated GIF, returning the number
+    of frames (see graphics.recorder.render).
+    """
+    def start(header: dict):
+        display(header["board"], header["width"], header["height"],
+                title=header["title"], backend="raster")
+
+    def apply(event: list):
+        _, _, row, col, color = event
+        VIEW.fill_cell(row, col, color)
+
+    def finish_frame() -> graphics.raster.Raster:
+        VIEW.flush()
+        return VIEW.win.raster
+
+    n_frames = graphics.recorder.render(log_path, start, apply, finish_frame,
+                                        fps, slowdown, frame_pattern, gif_path)
+    prompt_to_close()
+    return n_frames
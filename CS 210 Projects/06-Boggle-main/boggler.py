@@ -3,9 +3,18 @@ Boggler:  Boggle game solver. CS 210, Fall 2022.
 Josh Jilot.
 Credits: Just me :)
 """
+import argparse
 import doctest
+import functools
+import json
+import multiprocessing
 import sys
+from typing import Iterable, Iterator, Optional
+
 import board_view
+import dict_cache
+import lexicon
+from lexicon import Lexicon
 
 import config
 
@@ -15,36 +24,45 @@ MATCH = "Match"     # Exact match to a valid word
 PREFIX = "Prefix"   # Not an exact match, but a prefix (keep searching!)
 # Boggle rules
 MIN_WORD = 3   # A word must be at least 3 characters to count
-# Board dimensions
-N_ROWS = 4
-N_COLS = N_ROWS
+# Default board dimensions (4x4 standard, 5x5 Big Boggle, ...)
+N_ROWS = config.BOARD_ROWS
+N_COLS = config.BOARD_COLS
 BOARD_SIZE = N_ROWS * N_COLS
-# Special character in position that is already in use
-IN_USE = "@"
-# Max word length is 16, so we can just list all
-# the point values.
+# Point values by word length.  Words longer than
+# the table is long score the same as the last entry,
+# so boards of any size can be scored.
 #
-#         0  1  2  3  4  5  6  7  8
-POINTS = [0, 0, 0, 1, 1, 2, 3, 5, 11,
-          11, 11, 11, 11, 11, 11, 11, 11 ]
-#          9  10  11  12  13  14  15  16
+#         0  1  2  3  4  5  6  7  8 or more
+POINTS = [0, 0, 0, 1, 1, 2, 3, 5, 11]
 
-def read_dict(path: str) -> list[str]:
+def read_dict(path: str, use_cache: bool = config.DICT_CACHE) -> Lexicon:
     """
-    Returns ordered list of valid, normalized words from dictionary.
+    Returns a trie (prefix tree) of valid, normalized words from dictionary,
+    compiled to a Lexicon.  If use_cache, the compiled trie is saved
+    beside the dictionary and reused for as long as the dictionary
+    is unchanged.
 
-    >>> read_dict("data/shortdict.txt")
+    >>> trie = read_dict("data/shortdict.txt", use_cache=False)
+    >>> sorted(trie.words)
     ['ALPHA', 'BETA', 'DELTA', 'GAMMA', 'OMEGA']
     """
-    valid_list = []
-
-    dict_file = open(path, "r")
-    for line in dict_file:
-        word = line.strip()
-        if allowed(word):
-            valid_list.append(normalize(word))
-
-    return sorted(valid_list)
+    cache_path = path + config.DICT_CACHE_SUFFIX
+    if use_cache:
+        data = dict_cache.read_cache(cache_path, path, "trie")
+        if data is not None:
+            return Lexicon.from_bytes(data)
+
+    trie = {}
+    with open(path, "r") as dict_file:
+        for line in dict_file:
+            word = line.strip()
+            if allowed(word):
+                lexicon.trie_insert(trie, normalize(word))
+    compiled = lexicon.compile_trie(trie)
+
+    if use_cache:
+        dict_cache.write_cache(cache_path, path, "trie", compiled.to_bytes())
+    return compiled
 
 def allowed(s: str) -> bool:
     """
@@ -72,135 +90,173 @@ def normalize(s: str) -> str:
     """
     return s.upper()
 
-def search(candidate: str, word_list: list[str]) -> str:
+def search(candidate: str, words: Lexicon) -> str:
     """
     Determine whether candidate is a MATCH, a PREFIX of a match, or a big NOPE
-    Note word list MUST be in sorted order.
+    by walking the trie one letter at a time.
+
+    >>> trie = {}
+    >>> for word in ['ALPHA', 'BETA', 'GAMMA']:
+    ...     lexicon.trie_insert(trie, word)
+    >>> trie = lexicon.compile_trie(trie)
 
-    >>> search("ALPHA", ['ALPHA', 'BETA', 'GAMMA']) == MATCH
+    >>> search("ALPHA", trie) == MATCH
     True
 
-    >>> search("BE", ['ALPHA', 'BETA', 'GAMMA']) == PREFIX
+    >>> search("BE", trie) == PREFIX
     True
 
-    >>> search("FOX", ['ALPHA', 'BETA', 'GAMMA']) == NOPE
+    >>> search("FOX", trie) == NOPE
     True
 
-    >>> search("ZZZZ", ['ALPHA', 'BETA', 'GAMMA']) == NOPE
+    >>> search("ZZZZ", trie) == NOPE
     True
     """
-    low = 0
-    high = len(word_list) - 1
-
-    while low <= high:
-        mid = (high + low) // 2
-
-        if candidate == word_list[mid]:
-            return MATCH
-        
-        cand_compare = candidate, word_list[mid]
-        if sorted(cand_compare)[0] == candidate:
-            high = mid - 1
-        else:
-            low = mid + 1
+    node = lexicon.ROOT
+    for letter in candidate:
+        node = words.child(node, letter)
+        if node < 0:
+            return NOPE
 
-    if low < len(word_list) and word_list[low].startswith(candidate):
-        return PREFIX
+    if words.word_at(node) is not None:
+        return MATCH
+    return PREFIX
 
-    return NOPE
-
-def get_board_letters() -> str:
+def get_board_letters(board_size: int = BOARD_SIZE) -> str:
     """Get a valid string to form a Boggle board
     from the user.  May produce diagnostic
     output and quit.
     """
     while True:
         board_string = input("Boggle board letters (or 'return' to exit)> ")
-        if allowed(board_string) and len(board_string) == BOARD_SIZE:
+        if allowed(board_string) and len(board_string) == board_size:
             return board_string
         elif len(board_string) == 0:
             print(f"OK, sorry it didn't work out")
             sys.exit(0)
         else:
             print(f'"{board_string}" is not a valid Boggle board')
-            print(f'Please enter exactly 16 letters (or empty to quit)')
+            print(f'Please enter exactly {board_size} letters (or empty to quit)')
 
-def unpack_board(letters: str) -> list[list[str]]:
+def unpack_board(letters: str, n_rows: int = N_ROWS, n_cols: int = N_COLS
+                 ) -> list[list[str]]:
     """Unpack a single string of characters into
-    a matrix of individual characters, N_ROWS x N_COLS.
+    a matrix of individual characters, n_rows x n_cols.
 
     >>> unpack_board("abcdefghijklmnop")
     [['a', 'b', 'c', 'd'], ['e', 'f', 'g', 'h'], ['i', 'j', 'k', 'l'], ['m', 'n', 'o', 'p']]
+
+    >>> unpack_board("abcdef", 2, 3)
+    [['a', 'b', 'c'], ['d', 'e', 'f']]
     """
+    assert len(letters) == n_rows * n_cols, f"Need {n_rows * n_cols} letters"
     board_list = []
-    count = 0
-    
-    for i in range(N_ROWS):
-        board_list.append([])
 
-    for letter in letters:
-        board_position = count // N_COLS
-        board_list[board_position] += letter
-        count += 1
+    for row_i in range(n_rows):
+        board_list.append(list(letters[row_i * n_cols:(row_i + 1) * n_cols]))
 
     return board_list
 
-def boggle_solve(board: list[list[str]], words: list[str]) -> list[str]:
+@functools.lru_cache(maxsize=None)
+def neighbor_table(n_rows: int, n_cols: int) -> tuple[tuple[int, ...], ...]:
+    """For each position of an n_rows x n_cols board, flattened in
+    row-major order (position = row * n_cols + col), the positions
+    of its neighbors in all 8 directions.  Built once per board shape,
+    so the search never has to check board bounds.
+
+    >>> neighbor_table(2, 3)
+    ((1, 3, 4), (0, 2, 3, 4, 5), (1, 4, 5), (0, 1, 4), (0, 1, 2, 3, 5), (1, 2, 4))
+    """
+    table = []
+    for row in range(n_rows):
+        for col in range(n_cols):
+            neighbors = []
+            for d_row in [-1, 0, 1]:
+                for d_col in [-1, 0, 1]:
+                    n_row = row + d_row
+                    n_col = col + d_col
+                    if ((d_row != 0 or d_col != 0)
+                        and 0 <= n_row < n_rows and 0 <= n_col < n_cols):
+                        neighbors.append(n_row * n_cols + n_col)
+            table.append(tuple(neighbors))
+    return tuple(table)
+
+def boggle_solve(board: list[list[str]], words: Lexicon,
+                 replay: Optional[list[tuple[int, int, bool]]] = None
+                 ) -> list[str]:
     """Find all the words that can be made by traversing
     the boggle board in all 8 directions.  Returns sorted list without
-    duplicates.
+    duplicates.  words is a trie as returned by read_dict; each step
+    of the search follows one letter down the trie, so a path is
+    abandoned as soon as it is not the prefix of any word.
+
+    The board may have any number of rows and columns.  The search
+    works on the board flattened to one list of letters, with a
+    precomputed table of neighbor positions and an integer bitmask
+    of positions used in the current path; board is not modified.
+
+    The search itself never touches the display.  If replay is
+    a list, each step is appended to it as (row, col, occupied)
+    so that board_view.replay can animate the search afterward.
 
     >>> board = unpack_board("PLXXMEXXXAXXSXXX")
     >>> words = read_dict("data/dict.txt")
     >>> boggle_solve(board, words)
     ['AMP', 'AMPLE', 'AXE', 'AXLE', 'ELM', 'EXAM', 'LEA', 'MAX', 'PEA', 'PLEA', 'SAME', 'SAMPLE', 'SAX']
-    """
-    solutions = []
 
-    def solve(row: int, col: int, prefix: str):
+    >>> steps = []
+    >>> boggle_solve(unpack_board("AXEXXXXXXXXXXXXX"), words, replay=steps)
+    ['AXE']
+    >>> steps[:4]
+    [(0, 0, True), (0, 1, True), (0, 2, True), (0, 2, False)]
+
+    >>> boggle_solve(unpack_board("SAMPLE", 2, 3), words)
+    ['ALE', 'ALP', 'ASP', 'ELM', 'LAM', 'LAME', 'LAP', 'LEA', 'LEAP', 'MALE', 'MAP', 'MAPLE', 'MEAL', 'PAL', 'PALE', 'PALM', 'PLEA', 'PSALM', 'SALE', 'SAME', 'SAP', 'SLAM', 'SLAP', 'SPA']
+    """
+    n_rows = len(board)
+    n_cols = len(board[0])
+    letters = [ord(letter) for row in board for letter in row]
+    neighbors = neighbor_table(n_rows, n_cols)
+    # Local names for the trie arrays; see lexicon.Lexicon
+    edges = words.edges
+    first = words.first
+    word_ids = words.word_ids
+    solutions = set()
+
+    def solve(pos: int, node: int, in_use: int):
         """One solution step"""
+        node = edges.find(letters[pos], first[node], first[node + 1])
+        if node < 0:
+            # Not a prefix of any word; abandon this path
+            return
+
+        if word_ids[node] >= 0:
+            solutions.add(words.words[word_ids[node]])
+
+        # Keep searching, but not through positions already in this path
+        in_use |= 1 << pos
+        if replay is not None:
+            replay.append((pos // n_cols, pos % n_cols, True))
+        for next_pos in neighbors[pos]:
+            if not (in_use >> next_pos) & 1:
+                solve(next_pos, node, in_use)
+        if replay is not None:
+            replay.append((pos // n_cols, pos % n_cols, False))
 
-        if (row < N_ROWS and row >= 0
-        and col < N_COLS and col >= 0):
-            letter = board[row][col]
-            if letter == IN_USE:
-                return
-        
-            prefix = prefix + letter
-            status = search(prefix, words)
-
-            if status == MATCH:
-                solutions.append(prefix)
-
-            if status == MATCH or status == PREFIX:
-                # Keep searching
-                board[row][col] = IN_USE  # Prevent reusing
-                board_view.mark_occupied(row, col)
-                #recursion time
-                for d_row in [0, -1, 1]:
-                    for d_col in [0, -1, 1]:
-                        ## Make recursive col with row+d_row, col+d_col
-                        solve(row + d_row, col + d_col, prefix)
-
-                # Restore letter for further search
-                board[row][col] = letter
-                board_view.mark_unoccupied(row, col)
-            else:
-                return
-                    
     # Look for solutions starting from each board position
-    for row_i in range(N_ROWS):
-        for col_i in range(N_COLS):
-            solve(row_i, col_i, "")
+    for pos in range(len(letters)):
+        solve(pos, lexicon.ROOT, 0)
 
-    # Return solutions without duplicates, in sorted order
-    solutions = list(set(solutions))
+    # Return solutions in sorted order
     return sorted(solutions)
 
 def word_score(word: str) -> int:
-    """Standard point value in Boggle"""
-    assert len(word) <= 16
-    return POINTS[len(word)]
+    """Standard point value in Boggle
+
+    >>> word_score("ABSENTMINDEDNESS")
+    11
+    """
+    return POINTS[min(len(word), len(POINTS) - 1)]
 
 def score(solutions: list[str]) -> int:
     """Sum of scores for each solution
@@ -215,19 +271,97 @@ def score(solutions: list[str]) -> int:
 
     return total_score
 
+def getargs() -> argparse.Namespace:
+    """Return arguments as a Namespace object"""
+    parser = argparse.ArgumentParser("Solve Boggle boards")
+    parser.add_argument("--batch", dest="batch", default=None,
+        type=argparse.FileType(mode="r", encoding="utf-8"),
+        help="Solve boards listed one per line in this file ('-' for stdin)")
+    parser.add_argument("--rows", dest="rows", type=int, default=N_ROWS,
+        help="Number of rows on the board")
+    parser.add_argument("--cols", dest="cols", type=int, default=N_COLS,
+        help="Number of columns on the board")
+    parser.add_argument("--workers", dest="workers", type=int,
+        default=config.BATCH_WORKERS,
+        help="Number of worker processes for --batch (default: all cores)")
+    return parser.parse_args()
+
+# Word trie and board shape used by batch worker processes.  Installed by
+# _init_worker as each worker starts; when workers are forked, the trie built
+# in the parent is inherited as-is rather than being rebuilt or copied through a pipe.
+_worker_words: Optional[Lexicon] = None
+_worker_shape = (N_ROWS, N_COLS)
+
+def _init_worker(words: Lexicon, shape: tuple[int, int]):
+    """Install the shared word trie in a batch worker process"""
+    global _worker_words, _worker_shape
+    _worker_words = words
+    _worker_shape = shape
+
+def solve_letters(letters: str, words: Lexicon,
+                  n_rows: int = N_ROWS, n_cols: int = N_COLS) -> dict:
+    """Solve the board spelled by letters, returning a record
+    suitable for one line of JSONL batch output.
+
+    >>> words = read_dict("data/dict.txt")
+    >>> solve_letters("plxxmexxxaxxsxxx", words)["score"]
+    16
+    >>> solve_letters("abc", words)["error"]
+    'not a valid Boggle board'
+    >>> solve_letters("abcdefghijklmnopqrstuvwxy", words, 5, 5)["score"]
+    47
+    """
+    letters = normalize(letters)
+    if not (allowed(letters) and len(letters) == n_rows * n_cols):
+        return {"board": letters, "error": "not a valid Boggle board"}
+    solutions = boggle_solve(unpack_board(letters, n_rows, n_cols), words)
+    return {"board": letters, "words": solutions, "score": score(solutions)}
+
+def _solve_in_worker(letters: str) -> dict:
+    """Solve one batch board using the worker's shared trie"""
+    assert _worker_words is not None, "Worker started without _init_worker"
+    n_rows, n_cols = _worker_shape
+    return solve_letters(letters, _worker_words, n_rows, n_cols)
+
+def solve_batch(boards: Iterable[str], words: Lexicon,
+                workers: Optional[int] = None,
+                n_rows: int = N_ROWS, n_cols: int = N_COLS) -> Iterator[dict]:
+    """Solve each board in boards (one string of letters each) in a
+    pool of worker processes, yielding result records in input order
+    as they become available.  Blank lines are skipped.
+    """
+    letter_strings = (line.strip() for line in boards if line.strip())
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(words, (n_rows, n_cols))) as pool:
+        yield from pool.imap(_solve_in_worker, letter_strings,
+                             chunksize=config.BATCH_CHUNK)
+
 def main():
-    
+    args = getargs()
     words = read_dict(config.DICT_PATH)
-    board_string = get_board_letters()
+    if args.batch:
+        # Batch mode:  JSONL results to stdout, no display
+        for result in solve_batch(args.batch, words, args.workers,
+                                  args.rows, args.cols):
+            print(json.dumps(result), flush=True)
+        return
+
+    board_string = get_board_letters(args.rows * args.cols)
     board_string = normalize(board_string)
-    board = unpack_board(board_string)
-    board_view.display(board)
-    solutions = boggle_solve(board, words)
+    board = unpack_board(board_string, args.rows, args.cols)
+    board_view.display(board, backend=config.DISPLAY_BACKEND,
+                       frame_pattern=config.FRAME_PATTERN,
+                       record_path=config.RECORD_PATH)
+    # Log the search to animate it only if it will be shown
+    steps = [] if board_view.active() else None
+    solutions = boggle_solve(board, words, replay=steps)
     print(solutions)
     print(f"{score(solutions)} points")
+    if steps is not None:
+        board_view.replay(steps, config.REPLAY_FPS)
     board_view.prompt_to_close()
     
 if __name__ == "__main__":
     doctest.testmod()
-    print("Doctests complete")
+    print("Doctests complete", file=sys.stderr)
     main()
@@ -2,3 +2,31 @@
 
 # List of words to search for
 DICT_PATH = "data/dict.txt"
+# Keep the compiled word trie in DICT_PATH + DICT_CACHE_SUFFIX,
+# so later runs can skip reading and indexing the dictionary
+DICT_CACHE = True
+DICT_CACHE_SUFFIX = ".trie"
+
+# Board dimensions:  4x4 is standard Boggle, 5x5 is Big Boggle,
+# 6x6 is Super Big Boggle.  Override with --rows and --cols.
+BOARD_ROWS = 4
+BOARD_COLS = 4
+
+# Draw the board in a window ("tk"), or off-screen ("raster"),
+# saving frames as PNG (or PPM) files named by FRAME_PATTERN,
+# or not at all ("none"), which solves fastest
+DISPLAY_BACKEND = "tk"
+FRAME_PATTERN = "frames/boggle-{:05d}.png"
+# Or record the drawing, without drawing it, in a log to be rendered
+# later (python3 -m graphics.recorder), e.g., "boggle.log.gz"; None to draw
+RECORD_PATH = None
+
+# Maximum frames per second when animating the search
+# after it has been solved (see board_view.replay)
+REPLAY_FPS = 30
+
+# Batch mode (boggler.py --batch):  number of worker
+# processes (None to use every core) and how many boards
+# to hand a worker at a time.
+BATCH_WORKERS = None
+BATCH_CHUNK = 16
@@ -15,17 +15,26 @@ modified rather than abandoned.  Although the prior version was working,
 it could create a large number of invisible (obscured) rectangles and texts
 as filling or re-labeling a tile just drew a new one atop it.
 
+Fills are also batched:  fill_cell only queues the new color of a
+cell, and queued colors are drawn together at most max_fps times a
+second, or when flush is called.  The window is updated once per
+batch rather than after every change.
+
 Uses the simple graphics module provided by Zelle, which in turn 
 is built on the Tk graphics package (and which should therefore be 
 available on all major Python platforms, including Linux, Mac, and 
-all flavors of Windows at least back to XP). 
+all flavors of Windows at least back to XP).  The grid can also be
+drawn off-screen, without Tk, into an image (see graphics.raster).
 """
+import time
+from typing import Optional
+
 import logging
 logging.basicConfig()
 log = logging.getLogger(__name__)
 log.setLevel(logging.WARN)
 
-from graphics.graphics import *    # Zelle's simple OO graphics
+from graphics.raster import color_rgb, RasterCanvas
 
 global win  # The window we are drawing the grid in
 global cell_width, cell_height  # The size of a cell in the grid
@@ -54,25 +63,43 @@ class Grid:
     """Visual display of the grid"""
 
     def __init__(self, rows: int, cols: int, width_px: int = 500, height_px: int = 500,
-                 title: str = "Grid", cell_margin_px: int = 5) :
+                 title: str = "Grid", cell_margin_px: int = 5, max_fps: int = 30,
+                 backend: str = "tk", frame_pattern: Optional[str] = None) :
         """Create and show the grid display, initially all white.
         rows, cols are the grid size in rows and columns.
         width, height are the window size in pixels.
+        Queued fills are drawn at most max_fps times a second.
+        With backend "raster" the grid is drawn off-screen, and each
+        batch is saved as a frame named by frame_pattern (see
+        graphics.raster.RasterCanvas); otherwise it is drawn in a window.
         """
         log.debug("Creating grid")
-        self.win = GraphWin("Grid", width_px, height_px)
-        self.bkgrnd = Rectangle( Point(0,0), Point(width_px,height_px) )
-        self.bkgrnd.setFill( color_rgb(231,231,231) ) # Grey background
+        self.live = backend == "tk"
+        if backend == "raster":
+            self.win = RasterCanvas(width_px, height_px, frame_pattern=frame_pattern)
+        else:
+            assert backend == "tk", f"Unknown display backend '{backend}'"
+            # Imported only when needed, as importing it connects to the display
+            from graphics.graphics import GraphWin
+            # We update the window ourselves, in batches (see flush)
+            self.win = GraphWin("Grid", width_px, height_px, autoflush=False)
+        self.pending = {}  # Queued colors, by (row, col)
+        self.frame_time = 1 / max_fps
+        self.last_flush = 0.0
+        # Grey background
+        self.bkgrnd = self.win.create_rectangle(0, 0, width_px, height_px,
+                                                fill=color_rgb(231,231,231), outline=black)
         self.cell_width = width_px / cols
         self.cell_height = height_px / rows
-        self.bkgrnd.draw(self.win)
         # Representation of each cell in the grid, and its label
         self._make_cells(rows, cols, cell_margin_px)
+        self.flush()
         log.debug('Created grid')
 
     def _make_cells(self, rows: int, cols: int, margin_px: int):
         """Create self.cells, depiction of each cell in the grid.
-        Each cell is (rect, label), but label is initially None.
+        Each cell is (rect, label), the ids of their canvas items,
+        but label is initially None.
         Initially white cell with black boarder and no label.
         """
         self.cells = []
@@ -84,33 +111,39 @@ class Grid:
                 right = (col_i + 1) * self.cell_width
                 top = row_i * self.cell_height
                 bottom = top + self.cell_height
-                cell = Rectangle(Point(left + margin_px, bottom - margin_px),
-                                 Point(right - margin_px, top + margin_px))
-                cell.setFill(white)
-                cell.setOutline(black)
-                cell.draw(self.win)
+                cell = self.win.create_rectangle(left + margin_px, bottom - margin_px,
+                                                 right - margin_px, top + margin_px,
+                                                 fill=white, outline=black)
                 row.append((cell, None))
             self.cells.append(row)
 
     def fill_cell(self, row: int, col: int, color=white):
-        """Fill cell[row,col] with color."""
-        tile, label = self.cells[row][col]
-        tile.setFill(color)
-        # tile.draw(self.win)
-        # if label:
-        #    label.draw(self.win)
+        """Fill cell[row,col] with color, with the next batch."""
+        self.pending[(row, col)] = color
+        if time.monotonic() - self.last_flush >= self.frame_time:
+            self.flush()
+
+    def flush(self):
+        """Draw all queued fills and update the window."""
+        for (row, col), color in self.pending.items():
+            tile, _ = self.cells[row][col]
+            # Only reconfigures the existing canvas item
+            self.win.itemconfig(tile, fill=color)
+        self.pending = {}
+        self.win.update()
+        self.last_flush = time.monotonic()
 
     def label_cell(self, row: int, col: int, text: str, color=black):
-        """Place text label on cell[row,col]."""
-        tile, _ = self.cells[row][col]
-        ll, ur = tile.p1, tile.p2
-        x_center = (ll.x + ur.x) / 2.0
-        y_center = (ll.y + ur.y) / 2.0
-        label = Text(Point(x_center, y_center), text)
-        label.setFace("helvetica")
-        label.setSize(20)  ## Is there a better way to choose text size?
-        label.setFill(color)
-        label.draw(self.win)
+        """Place text label on cell[row,col], or change its label."""
+        tile, label = self.cells[row][col]
+        if label:
+            self.win.itemconfig(label, text=text, fill=color)
+            return
+        x_center = (col + 0.5) * self.cell_width
+        y_center = (row + 0.5) * self.cell_height
+        ## Is there a better way to choose text size?
+        label = self.win.create_text(x_center, y_center, text=text, fill=color,
+                                     font=("helvetica", 20))
         self.cells[row][col] = (tile, label)
 
 def get_cur_color():
@@ -0,0 +1,886 @@
+"""Off-screen drawing, for running without a display.
+
+The graphics module draws through Tk, which needs a display and
+redraws slowly when there are many thousands of shapes.  This module
+draws instead into a Raster, an image held in memory as a bytearray
+of RGB pixels, and writes the image to a PNG or PPM file.  It needs
+only the Python standard library (PNG files are compressed with zlib).
+
+RasterCanvas stands in for the Tk canvas of a GraphWin.  It has the
+few canvas methods our views use (create_rectangle, itemconfig, etc.),
+so a view can draw the same way into either one.  Each call to
+RasterCanvas.update can save the picture so far as one numbered frame.
+GifWriter collects frames into an animated GIF instead.  read_png
+and read_gif read the files back, to check them.
+"""
+import os
+import struct
+import zlib
+from typing import Optional, Union
+
+Color = Union[str, tuple[int, int, int]]
+
+
+def color_rgb(r: int, g: int, b: int) -> str:
+    """Color as a string that Tk and Raster both accept,
+    as in graphics.color_rgb
+
+    >>> color_rgb(255, 0, 10)
+    '#ff000a'
+    """
+    return "#%02x%02x%02x" % (r, g, b)
+
+
+# Tk color names used in our views
+NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "grey": (190, 190, 190),
+    "gray": (190, 190, 190),
+}
+
+
+def rgb_bytes(color: Color) -> Optional[bytes]:
+    """The 3 bytes of a pixel of color, which may be a Tk color
+    string ('#rrggbb' or a name in NAMED_COLORS) or an (r, g, b)
+    tuple.  None for the empty string, which Tk takes to mean
+    'not filled'.
+
+    >>> rgb_bytes("#ff000a")
+    b'\\xff\\x00\\n'
+    >>> rgb_bytes("white")
+    b'\\xff\\xff\\xff'
+    """
+    if isinstance(color, tuple):
+        return bytes(color)
+    if color == "":
+        return None
+    if color.startswith("#") and len(color) == 7:
+        return bytes.fromhex(color[1:])
+    assert color.lower() in NAMED_COLORS, f"Unknown color '{color}'"
+    return bytes(NAMED_COLORS[color.lower()])
+
+
+# A 5x7 bitmap font for labels:  each glyph is 7 rows, top to bottom,
+# separated by '/', with '#' for a pixel drawn
+FONT = {
+    "A": ".###./#...#/#...#/#####/#...#/#...#/#...#",
+    "B": "####./#...#/#...#/####./#...#/#...#/####.",
+    "C": ".###./#...#/#..../#..../#..../#...#/.###.",
+    "D": "####./#...#/#...#/#...#/#...#/#...#/####.",
+    "E": "#####/#..../#..../####./#..../#..../#####",
+    "F": "#####/#..../#..../####./#..../#..../#....",
+    "G": ".###./#...#/#..../#.###/#...#/#...#/.####",
+    "H": "#...#/#...#/#...#/#####/#...#/#...#/#...#",
+    "I": ".###./..#../..#../..#../..#../..#../.###.",
+    "J": "..###/...#./...#./...#./...#./#..#./.##..",
+    "K": "#...#/#..#./#.#../##.../#.#../#..#./#...#",
+    "L": "#..../#..../#..../#..../#..../#..../#####",
+    "M": "#...#/##.##/#.#.#/#.#.#/#...#/#...#/#...#",
+    "N": "#...#/#...#/##..#/#.#.#/#..##/#...#/#...#",
+    "O": ".###./#...#/#...#/#...#/#...#/#...#/.###.",
+    "P": "####./#...#/#...#/####./#..../#..../#....",
+    "Q": ".###./#...#/#...#/#...#/#.#.#/#..#./.##.#",
+    "R": "####./#...#/#...#/####./#.#../#..#./#...#",
+    "S": ".####/#..../#..../.###./....#/....#/####.",
+    "T": "#####/..#../..#../..#../..#../..#../..#..",
+    "U": "#...#/#...#/#...#/#...#/#...#/#...#/.###.",
+    "V": "#...#/#...#/#...#/#...#/#...#/.#.#./..#..",
+    "W": "#...#/#...#/#...#/#.#.#/#.#.#/#.#.#/.#.#.",
+    "X": "#...#/#...#/.#.#./..#../.#.#./#...#/#...#",
+    "Y": "#...#/#...#/.#.#./..#../..#../..#../..#..",
+    "Z": "#####/....#/...#./..#../.#.../#..../#####",
+    "0": ".###./#...#/#..##/#.#.#/##..#/#...#/.###.",
+    "1": "..#../.##../..#../..#../..#../..#../.###.",
+    "2": ".###./#...#/....#/...#./..#../.#.../#####",
+    "3": "#####/...#./..#../...#./....#/#...#/.###.",
+    "4": "...#./..##./.#.#./#..#./#####/...#./...#.",
+    "5": "#####/#..../####./....#/....#/#...#/.###.",
+    "6": "..##./.#.../#..../####./#...#/#...#/.###.",
+    "7": "#####/....#/...#./..#../.#.../.#.../.#...",
+    "8": ".###./#...#/#...#/.###./#...#/#...#/.###.",
+    "9": ".###./#...#/#...#/.####/....#/...#./.##..",
+}
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+
+# RasterCanvas finds the overlay items near a rectangle by these
+# square buckets of pixels
+OVERLAY_BUCKET = 64
+
+
+class Raster:
+    """An image of width x height pixels, stored row by row from the
+    top left in one bytearray, 3 bytes (red, green, blue) per pixel.
+    Coordinates are in pixels, x to the right and y down, as on a
+    Tk canvas.  Shapes are clipped to the image, or to the smaller
+    rectangle given to set_clip.
+
+    >>> image = Raster(4, 2, "black")
+    >>> image.fill_rect(1, 0, 3, 1, "white")
+    >>> image.pixel(1, 0), image.pixel(3, 0)
+    ((255, 255, 255), (0, 0, 0))
+    """
+
+    def __init__(self, width: int, height: int, background: Color = "white"):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(rgb_bytes(background) * (width * height))
+        self.set_clip()
+
+    def set_clip(self, x0: int = 0, y0: int = 0,
+                 x1: Optional[int] = None, y1: Optional[int] = None):
+        """Draw only from (x0, y0) up to (not including) (x1, y1),
+        by default the whole image
+
+        >>> image = Raster(4, 1, "black")
+        >>> image.set_clip(2, 0, 3, 1)
+        >>> image.fill_rect(0, 0, 4, 1, "white")
+        >>> [image.pixel(x, 0)[0] for x in range(4)]
+        [0, 0, 255, 0]
+        """
+        self.clip_x0 = max(x0, 0)
+        self.clip_y0 = max(y0, 0)
+        self.clip_x1 = self.width if x1 is None else min(x1, self.width)
+        self.clip_y1 = self.height if y1 is None else min(y1, self.height)
+
+    def copy(self) -> "Raster":
+        """A new Raster with the same pixels"""
+        image = Raster(0, 0)
+        image.width = self.width
+        image.height = self.height
+        image.pixels = bytearray(self.pixels)
+        image.set_clip()
+        return image
+
+    def pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        """(red, green, blue) of the pixel at (x, y)"""
+        start = 3 * (y * self.width + x)
+        return tuple(self.pixels[start:start + 3])
+
+    def _span(self, y: int, x0: int, x1: int, color: bytes):
+        """Set pixels x0 up to (not including) x1 of row y to color"""
+        if self.clip_y0 <= y < self.clip_y1:
+            x0 = max(x0, self.clip_x0)
+            x1 = min(x1, self.clip_x1)
+            if x0 < x1:
+                start = 3 * (y * self.width + x0)
+                self.pixels[start:start + 3 * (x1 - x0)] = color * (x1 - x0)
+
+    def fill_rect(self, x0: float, y0: float, x1: float, y1: float, color: Color):
+        """Fill the rectangle from (x0, y0) up to (not including) (x1, y1)"""
+        pixel = rgb_bytes(color)
+        if pixel is None:
+            return
+        for y in range(max(round(y0), self.clip_y0), min(round(y1), self.clip_y1)):
+            self._span(y, round(x0), round(x1), pixel)
+
+    def fill_oval(self, x0: float, y0: float, x1: float, y1: float, color: Color):
+        """Fill the ellipse inside the rectangle from (x0, y0) to (x1, y1)"""
+        pixel = rgb_bytes(color)
+        if pixel is None:
+            return
+        center_x = (x0 + x1) / 2
+        center_y = (y0 + y1) / 2
+        radius_x = (x1 - x0) / 2
+        radius_y = (y1 - y0) / 2
+        if radius_x <= 0 or radius_y <= 0:
+            return
+        for y in range(max(round(y0), self.clip_y0), min(round(y1), self.clip_y1)):
+            dy = (y + 0.5 - center_y) / radius_y
+            if dy * dy <= 1:
+                half = radius_x * (1 - dy * dy) ** 0.5
+                self._span(y, round(center_x - half), round(center_x + half), pixel)
+
+    def draw_line(self, x0: float, y0: float, x1: float, y1: float,
+                  color: Color, width: int = 1):
+        """Draw a line from (x0, y0) to (x1, y1), width pixels wide"""
+        pixel = rgb_bytes(color)
+        if pixel is None:
+            return
+        steps = max(abs(round(x1) - round(x0)), abs(round(y1) - round(y0)), 1)
+        half = width // 2
+        # A width x width square of pixels at each step along the line
+        for step in range(steps + 1):
+            x = round(x0 + (x1 - x0) * step / steps) - half
+            y = round(y0 + (y1 - y0) * step / steps) - half
+            for row in range(y, y + width):
+                self._span(row, x, x + width, pixel)
+
+    def draw_text(self, x: float, y: float, text: str, color: Color, size: int = 12):
+        """Draw text centered at (x, y) in the built-in bitmap font,
+        scaled to roughly size points.  Letters are drawn in upper
+        case; characters not in the font are left blank.
+        """
+        pixel = rgb_bytes(color)
+        scale = max(1, round(size / GLYPH_HEIGHT))
+        advance = (GLYPH_WIDTH + 1) * scale
+        left = round(x - (advance * len(text) - scale) / 2)
+        top = round(y - GLYPH_HEIGHT * scale / 2)
+        for char_i, char in enumerate(text.upper()):
+            glyph = FONT.get(char)
+            if glyph is None:
+                continue
+            for row_i, row in enumerate(glyph.split("/")):
+                for col_i, mark in enumerate(row):
+                    if mark == "#":
+                        glyph_x = left + char_i * advance + col_i * scale
+                        glyph_y = top + row_i * scale
+                        for y_i in range(glyph_y, glyph_y + scale):
+                            self._span(y_i, glyph_x, glyph_x + scale, pixel)
+
+    def paste(self, image: "Raster", x: int, y: int):
+        """Copy image onto this one with its top left at (x, y)"""
+        for row in range(max(0, -y), min(image.height, self.height - y)):
+            x0 = max(x, 0)
+            x1 = min(x + image.width, self.width)
+            if x0 < x1:
+                source = 3 * (row * image.width + x0 - x)
+                target = 3 * ((y + row) * self.width + x0)
+                self.pixels[target:target + 3 * (x1 - x0)] = \
+                    image.pixels[source:source + 3 * (x1 - x0)]
+
+    def to_ppm(self) -> bytes:
+        """The image as a binary PPM file"""
+        return b"P6\n%d %d\n255\n" % (self.width, self.height) + bytes(self.pixels)
+
+    def to_png(self) -> bytes:
+        """The image as a PNG file
+
+        >>> Raster(2, 1, "red").to_png()[:8]
+        b'\\x89PNG\\r\\n\\x1a\\n'
+
+        read_png reads back exactly the same pixels:
+
+        >>> import os, tempfile
+        >>> image = Raster(40, 30, "black")
+        >>> for x in range(40):
+        ...     image.fill_rect(x, 0, x + 1, 30 - x % 7, color_rgb(6 * x, 255 - 6 * x, x % 3))
+        >>> path = os.path.join(tempfile.mkdtemp(), "stripes.png")
+        >>> with open(path, "wb") as png_file:
+        ...     _ = png_file.write(image.to_png())
+        >>> read_png(path).pixels == image.pixels
+        True
+        """
+        row_len = 3 * self.width
+        # Each row is preceded by its filter type, 0 (none)
+        rows = b"".join(b"\0" + self.pixels[start:start + row_len]
+                        for start in range(0, len(self.pixels), row_len))
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return (PNG_SIGNATURE + _png_chunk(b"IHDR", header)
+                + _png_chunk(b"IDAT", zlib.compress(rows, 6))
+                + _png_chunk(b"IEND", b""))
+
+    def save(self, path: str):
+        """Write the image to path, as PPM if path ends with
+        '.ppm' and otherwise as PNG, creating its directory if needed
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = self.to_ppm() if path.lower().endswith(".ppm") else self.to_png()
+        with open(path, "wb") as image_file:
+            image_file.write(data)
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    """One chunk of a PNG file:  length, kind, data, checksum"""
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+
+def read_png(path: str, background: Color = "white") -> Raster:
+    """Read a PNG image of 8-bit grey, RGB, palette, or RGBA pixels
+    (not interlaced).  Transparent pixels are blended with background.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "red.png")
+    >>> image = Raster(3, 2, "red")
+    >>> image.fill_rect(0, 1, 1, 2, "blue")
+    >>> image.save(path)
+    >>> read_png(path).pixels == image.pixels
+    True
+    """
+    with open(path, "rb") as png_file:
+        data = png_file.read()
+    assert data.startswith(PNG_SIGNATURE), f"{path} is not a PNG file"
+    pos = len(PNG_SIGNATURE)
+    compressed = []
+    palette = b""
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+            assert depth == 8 and interlace == 0, f"{path}: only 8-bit, non-interlaced PNG supported"
+        elif kind == b"PLTE":
+            palette = chunk
+        elif kind == b"IDAT":
+            compressed.append(chunk)
+        elif kind == b"IEND":
+            break
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color_type]
+    raw = _unfilter(zlib.decompress(b"".join(compressed)), width, height, channels)
+
+    image = Raster(width, height, background)
+    n_pixels = width * height
+    if color_type == 2:
+        image.pixels = raw
+    elif color_type == 3:
+        image.pixels = bytearray(b"".join(palette[3 * index:3 * index + 3] for index in raw))
+    else:
+        # Spread grey to all three channels, or drop alpha
+        color_channels = 1 if color_type in [0, 4] else 3
+        pixels = bytearray(3 * n_pixels)
+        for channel in range(3):
+            pixels[channel::3] = raw[channel % color_channels::channels]
+        if color_type in [4, 6]:
+            alpha = raw[channels - 1::channels]
+            back = rgb_bytes(background)
+            if alpha.count(255) < n_pixels:
+                for pixel_i, opacity in enumerate(alpha):
+                    if opacity < 255:
+                        for channel in range(3):
+                            value = pixels[3 * pixel_i + channel]
+                            pixels[3 * pixel_i + channel] = (
+                                value * opacity + back[channel] * (255 - opacity)) // 255
+        image.pixels = pixels
+    return image
+
+
+def _unfilter(filtered: bytes, width: int, height: int, channels: int) -> bytearray:
+    """Undo the per-row filters of PNG image data"""
+    row_len = width * channels
+    result = bytearray()
+    previous = bytearray(row_len)
+    pos = 0
+    for _ in range(height):
+        kind = filtered[pos]
+        row = bytearray(filtered[pos + 1:pos + 1 + row_len])
+        pos += 1 + row_len
+        if kind == 1:    # Sub
+            for i in range(channels, row_len):
+                row[i] = (row[i] + row[i - channels]) & 0xff
+        elif kind == 2:  # Up
+            row = bytearray((a + b) & 0xff for a, b in zip(row, previous))
+        elif kind == 3:  # Average
+            for i in range(row_len):
+                left = row[i - channels] if i >= channels else 0
+                row[i] = (row[i] + (left + previous[i]) // 2) & 0xff
+        elif kind == 4:  # Paeth
+            for i in range(row_len):
+                left = row[i - channels] if i >= channels else 0
+                up = previous[i]
+                up_left = previous[i - channels] if i >= channels else 0
+                estimate = left + up - up_left
+                d_left = abs(estimate - left)
+                d_up = abs(estimate - up)
+                d_up_left = abs(estimate - up_left)
+                if d_left <= d_up and d_left <= d_up_left:
+                    nearest = left
+                elif d_up <= d_up_left:
+                    nearest = up
+                else:
+                    nearest = up_left
+                row[i] = (row[i] + nearest) & 0xff
+        result += row
+        previous = row
+    return result
+
+
+class GifWriter:
+    """Writes Rasters as the frames of an animated GIF file, which
+    loops forever.  Each frame has its own palette:  its exact colors
+    if it has no more than 256, and otherwise a fixed palette of 256
+    colors (3 bits each of red and green, 2 of blue).
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "blink.gif")
+    >>> gif = GifWriter(path, 4, 4, fps=2)
+    >>> gif.add(Raster(4, 4, "red"), 0)
+    >>> gif.add(Raster(4, 4, "blue"), 3)
+    >>> gif.close()
+    >>> open(path, "rb").read(6)
+    b'GIF89a'
+
+    read_gif decodes the frames, and how long each is shown:
+
+    >>> [(frame.pixel(0, 0), delay) for frame, delay in read_gif(path)]
+    [((255, 0, 0), 150), ((0, 0, 255), 50)]
+
+    A frame of noise fills the LZW code table, which then starts
+    over; it also decodes to the same pixels:
+
+    >>> import random
+    >>> rng = random.Random(210)
+    >>> noise = Raster(200, 150)
+    >>> for y in range(150):
+    ...     for x in range(0, 200, 2):
+    ...         noise.fill_rect(x, y, x + 2, y + 1, color_rgb(rng.randrange(8) * 32, 0, y // 50))
+    >>> gif = GifWriter(path, 200, 150)
+    >>> gif.add(noise, 0)
+    >>> gif.close()
+    >>> read_gif(path)[0][0].pixels == noise.pixels
+    True
+    """
+
+    def __init__(self, path: str, width: int, height: int, fps: float = 30):
+        self.gif_file = open(path, "wb")
+        self.fps = fps
+        # Encoded frame waiting for its delay, which is not known
+        # until the next frame is added, and its frame number
+        self.pending: Optional[bytes] = None
+        self.pending_at = 0
+        self.gif_file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0))
+        # Application extension:  loop forever
+        self.gif_file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def add(self, image: Raster, frame_number: int):
+        """Add image as frame frame_number of the animation (counting
+        frames at fps per second); it is shown until the next frame added
+        """
+        self._write_pending(frame_number)
+        palette, indices = _gif_indices(image)
+        self.pending = (struct.pack("<BHHHHB", 0x2c, 0, 0, image.width, image.height, 0x87)
+                        + palette + b"\x08" + _gif_blocks(_lzw(indices, 8)))
+        self.pending_at = frame_number
+
+    def _write_pending(self, until_frame: int):
+        if self.pending is not None:
+            frames = max(until_frame - self.pending_at, 1)
+            delay_cs = max(round(frames * 100 / self.fps), 2)
+            # Graphic control extension:  how long to show the frame
+            self.gif_file.write(struct.pack("<BBBBHBB", 0x21, 0xf9, 4, 0, delay_cs, 0, 0))
+            self.gif_file.write(self.pending)
+            self.pending = None
+
+    def close(self):
+        self._write_pending(self.pending_at + 1)
+        self.gif_file.write(b"\x3b")
+        self.gif_file.close()
+
+
+def _gif_indices(image: Raster) -> tuple[bytes, bytes]:
+    """(palette, indices) for image:  768 bytes of palette colors
+    and, for each pixel, the index of its color in the palette
+    """
+    reds = image.pixels[0::3]
+    greens = image.pixels[1::3]
+    blues = image.pixels[2::3]
+    colors = set(zip(reds, greens, blues))
+    if len(colors) <= 256:
+        colors = sorted(colors)
+        index = {color: i for i, color in enumerate(colors)}
+        palette = b"".join(bytes(color) for color in colors)
+        indices = bytes(map(index.__getitem__, zip(reds, greens, blues)))
+    else:
+        # Keep the top bits of each channel, and combine the three
+        # channels with | on the rows as (very long) integers
+        n_pixels = len(reds)
+        red_bits = reds.translate(bytes(value & 0xe0 for value in range(256)))
+        green_bits = greens.translate(bytes((value >> 3) & 0x1c for value in range(256)))
+        blue_bits = blues.translate(bytes(value >> 6 for value in range(256)))
+        combined = (int.from_bytes(red_bits, "big") | int.from_bytes(green_bits, "big")
+                    | int.from_bytes(blue_bits, "big"))
+        indices = combined.to_bytes(n_pixels, "big")
+        palette = b"".join(bytes([(i >> 5) * 255 // 7, ((i >> 2) & 7) * 255 // 7, (i & 3) * 255 // 3])
+                           for i in range(256))
+    return palette.ljust(768, b"\0"), indices
+
+
+def _lzw(indices: bytes, min_code_size: int) -> bytes:
+    """GIF variant of LZW compression of indices"""
+    clear = 1 << min_code_size
+    end = clear + 1
+    output = bytearray()
+    bits = 0        # Bits not yet output, least significant first
+    n_bits = 0
+    code_size = min_code_size + 1
+    table = {}      # (prefix code << 8) | next index -> code
+    next_code = end + 1
+
+    def emit(code: int):
+        nonlocal bits, n_bits
+        bits |= code << n_bits
+        n_bits += code_size
+        while n_bits >= 8:
+            output.append(bits & 0xff)
+            bits >>= 8
+            n_bits -= 8
+
+    emit(clear)
+    if not indices:
+        emit(end)
+        return bytes(output + (bytes([bits]) if n_bits else b""))
+    prefix = indices[0]
+    for index in indices[1:]:
+        key = (prefix << 8) | index
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            # The decoder is one code behind, so it widens codes
+            # once next_code has passed the largest code of this size
+            if next_code > (1 << code_size):
+                code_size += 1
+        else:
+            emit(clear)
+            table = {}
+            next_code = end + 1
+            code_size = min_code_size + 1
+        prefix = index
+    emit(prefix)
+    emit(end)
+    if n_bits:
+        output.append(bits & 0xff)
+    return bytes(output)
+
+
+def _gif_blocks(data: bytes) -> bytes:
+    """data as GIF sub-blocks of at most 255 bytes, then an empty block"""
+    return b"".join(bytes([len(data[start:start + 255])]) + data[start:start + 255]
+                    for start in range(0, len(data), 255)) + b"\0"
+
+
+def read_gif(path: str) -> list[tuple[Raster, int]]:
+    """Read the frames of a GIF file (not interlaced, no transparency),
+    such as GifWriter writes, as (image, delay) with the delay in
+    hundredths of a second.  Each image is the whole picture with
+    that frame drawn over the ones before it.  See GifWriter for
+    examples.
+    """
+    with open(path, "rb") as gif_file:
+        data = gif_file.read()
+    assert data[:6] in [b"GIF87a", b"GIF89a"], f"{path} is not a GIF file"
+    width, height, flags = struct.unpack("<HHB", data[6:11])
+    pos = 13
+    palette = b""
+    if flags & 0x80:
+        palette = data[pos:pos + 3 * (2 << (flags & 7))]
+        pos += len(palette)
+    picture = Raster(width, height, "black")
+    frames = []
+    delay = 0
+    while data[pos] != 0x3b:
+        if data[pos] == 0x21:
+            kind = data[pos + 1]
+            pos += 2
+            if kind == 0xf9:
+                delay = struct.unpack("<H", data[pos + 2:pos + 4])[0]
+            _, pos = _gif_read_blocks(data, pos)
+            continue
+        assert data[pos] == 0x2c, f"{path}: unexpected block {data[pos]:#x}"
+        left, top, frame_width, frame_height, flags = struct.unpack("<HHHHB", data[pos + 1:pos + 10])
+        pos += 10
+        assert not flags & 0x40, f"{path}: interlaced GIF not supported"
+        frame_palette = palette
+        if flags & 0x80:
+            frame_palette = data[pos:pos + 3 * (2 << (flags & 7))]
+            pos += len(frame_palette)
+        min_code_size = data[pos]
+        compressed, pos = _gif_read_blocks(data, pos + 1)
+        indices = _unlzw(compressed, min_code_size)[:frame_width * frame_height]
+        frame = Raster(frame_width, frame_height)
+        frame.pixels = bytearray(b"".join(frame_palette[3 * index:3 * index + 3] for index in indices))
+        picture.paste(frame, left, top)
+        frames.append((picture.copy(), delay))
+        delay = 0
+    return frames
+
+
+def _gif_read_blocks(data: bytes, pos: int) -> tuple[bytes, int]:
+    """The sub-blocks starting at data[pos], joined, and the position
+    after the empty block that ends them
+    """
+    blocks = []
+    while data[pos]:
+        blocks.append(data[pos + 1:pos + 1 + data[pos]])
+        pos += 1 + data[pos]
+    return b"".join(blocks), pos + 1
+
+
+def _unlzw(data: bytes, min_code_size: int) -> bytes:
+    """Undo GIF LZW compression (the inverse of _lzw)"""
+    clear = 1 << min_code_size
+    end = clear + 1
+    output = bytearray()
+    bits = 0        # Bits not yet used, least significant first
+    n_bits = 0
+    pos = 0
+    code_size = min_code_size + 1
+    table = []
+    previous = None
+    while True:
+        while n_bits < code_size and pos < len(data):
+            bits |= data[pos] << n_bits
+            n_bits += 8
+            pos += 1
+        if n_bits < code_size:
+            break
+        code = bits & ((1 << code_size) - 1)
+        bits >>= code_size
+        n_bits -= code_size
+        if code == clear:
+            table = [bytes([index]) for index in range(clear)] + [b"", b""]
+            code_size = min_code_size + 1
+            previous = None
+            continue
+        if code == end:
+            break
+        if previous is None:
+            entry = table[code]
+        else:
+            # A code not yet in the table is the one about to be added
+            entry = table[code] if code < len(table) else table[previous] + table[previous][:1]
+            table.append(table[previous] + entry[:1])
+            if len(table) == 1 << code_size and code_size < 12:
+                code_size += 1
+        output += entry
+        previous = code
+    return bytes(output)
+
+
+class RasterCanvas:
+    """Draws like the Tk canvas of a GraphWin, but into a Raster.
+    Supports rectangles, ovals, lines, text, and images, with the
+    options fill, outline, width, and text (font gives the text size).
+
+    Items are drawn in three layers, each in the order the items were
+    created:  images at the bottom, then rectangles, then everything
+    else.  Our views use images only for base maps, and rectangles
+    for grid cells and plot marks, which are not drawn over anything
+    but other rectangles.  Recoloring a rectangle repaints just that
+    rectangle, and the parts of top layer items over it, so recoloring
+    grid cells is cheap however many cells are labeled; other changes
+    redraw everything at the next update.
+
+    If frame_pattern is given, each update that follows a change saves
+    the image as a frame, at frame_pattern.format(frame_number), e.g.,
+    'frames/cave-{:05d}.png' (or just 'cave.png' to keep only the last).
+
+    >>> canvas = RasterCanvas(20, 10)
+    >>> cell = canvas.create_rectangle(0, 0, 10, 10, fill="red", outline="black")
+    >>> canvas.itemconfig(cell, fill="blue")
+    >>> canvas.raster.pixel(5, 5)
+    (0, 0, 255)
+    """
+
+    def __init__(self, width: int, height: int, background: Color = "white",
+                 frame_pattern: Optional[str] = None):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.raster = Raster(width, height, background)
+        self.frame_pattern = frame_pattern
+        self.frame_count = 0
+        self.items: dict[int, list] = {}   # id -> [kind, coords, options]
+        self.images: list[int] = []        # Bottom layer
+        self.overlays: list[int] = []      # Top layer:  ovals, lines, text
+        # Overlays by the OVERLAY_BUCKETs their bounds touch, rebuilt
+        # when needed after overlays are added, moved, or removed
+        self.overlay_buckets: Optional[dict[tuple[int, int], list[int]]] = None
+        self.next_id = 1
+        self.stale = False    # Must redraw everything before the next frame
+        self.changed = False  # Changed since the last frame was saved
+        self.closed = False
+
+    def _create(self, kind: str, coords: list[float], options: dict) -> int:
+        item = self.next_id
+        self.next_id += 1
+        self.items[item] = [kind, coords, options]
+        if kind == "rectangle":
+            self._paint_rectangle(item)
+        elif kind == "image":
+            self.images.append(item)
+            # Belongs beneath anything already drawn
+            self.stale = True
+        else:
+            self.overlays.append(item)
+            self.overlay_buckets = None
+            self._paint(kind, coords, options)
+        self.changed = True
+        return item
+
+    def create_rectangle(self, x0, y0, x1, y1, **options) -> int:
+        return self._create("rectangle", [x0, y0, x1, y1], options)
+
+    def create_oval(self, x0, y0, x1, y1, **options) -> int:
+        return self._create("oval", [x0, y0, x1, y1], options)
+
+    def create_line(self, x0, y0, x1, y1, **options) -> int:
+        return self._create("line", [x0, y0, x1, y1], options)
+
+    def create_text(self, x, y, **options) -> int:
+        return self._create("text", [x, y], options)
+
+    def create_image(self, x, y, **options) -> int:
+        """Draw options['image'], a Raster, centered at (x, y)"""
+        return self._create("image", [x, y], options)
+
+    def itemconfig(self, item: int, **options):
+        kind, _, item_options = self.items[item]
+        item_options.update(options)
+        self.changed = True
+        if kind == "rectangle":
+            self._paint_rectangle(item)
+        else:
+            self.overlay_buckets = None
+            self.stale = True
+
+    def coords(self, item: int) -> list[float]:
+        """Coordinates of item, as given when it was created (and moved)"""
+        return list(self.items[item][1])
+
+    def move(self, item: int, dx: float, dy: float):
+        coords = self.items[item][1]
+        for i in range(len(coords)):
+            coords[i] += dx if i % 2 == 0 else dy
+        self.overlay_buckets = None
+        self.stale = True
+        self.changed = True
+
+    def delete(self, item: int):
+        kind = self.items.pop(item)[0]
+        if kind == "image":
+            self.images.remove(item)
+        elif kind != "rectangle":
+            self.overlays.remove(item)
+            self.overlay_buckets = None
+        self.stale = True
+        self.changed = True
+
+    def tag_lower(self, item: int):
+        """Rectangles are always beneath the top layer, so nothing to do"""
+        assert self.items[item][0] == "rectangle", "Only rectangles can be lowered"
+
+    def _bounds(self, kind: str, coords: list[float], options: dict) -> tuple[int, int, int, int]:
+        """(x0, y0, x1, y1), with x1 and y1 exclusive, enclosing every
+        pixel _paint could set for the item (perhaps a few more)
+        """
+        if kind == "text":
+            x, y = coords
+            scale = max(1, round(options.get("font", ("helvetica", 12))[1] / GLYPH_HEIGHT))
+            half_width = (GLYPH_WIDTH + 1) * scale * len(options.get("text", "")) / 2
+            half_height = GLYPH_HEIGHT * scale / 2
+            margin = 1
+        else:
+            x0, y0, x1, y1 = coords
+            x, y = (x0 + x1) / 2, (y0 + y1) / 2
+            half_width, half_height = abs(x1 - x0) / 2, abs(y1 - y0) / 2
+            margin = int(options.get("width", 1)) + 1
+        return (int(x - half_width) - margin, int(y - half_height) - margin,
+                int(x + half_width) + margin + 1, int(y + half_height) + margin + 1)
+
+    def _overlays_over(self, x0: int, y0: int, x1: int, y1: int) -> list[int]:
+        """Overlays whose bounds meet the box from (x0, y0) up to
+        (x1, y1), in the order they are drawn
+        """
+        if self.overlay_buckets is None:
+            self.overlay_buckets = {}
+            for overlay in self.overlays:
+                bx0, by0, bx1, by1 = self._bounds(*self.items[overlay])
+                for bucket_x in range(bx0 // OVERLAY_BUCKET, (bx1 - 1) // OVERLAY_BUCKET + 1):
+                    for bucket_y in range(by0 // OVERLAY_BUCKET, (by1 - 1) // OVERLAY_BUCKET + 1):
+                        self.overlay_buckets.setdefault((bucket_x, bucket_y), []).append(overlay)
+        nearby = set()
+        for bucket_x in range(x0 // OVERLAY_BUCKET, (x1 - 1) // OVERLAY_BUCKET + 1):
+            for bucket_y in range(y0 // OVERLAY_BUCKET, (y1 - 1) // OVERLAY_BUCKET + 1):
+                nearby.update(self.overlay_buckets.get((bucket_x, bucket_y), []))
+        over = []
+        for overlay in nearby:
+            bx0, by0, bx1, by1 = self._bounds(*self.items[overlay])
+            if bx0 < x1 and x0 < bx1 and by0 < y1 and y0 < by1:
+                over.append(overlay)
+        # Items are numbered in the order they were created
+        return sorted(over)
+
+    def _paint_rectangle(self, item: int):
+        """Paint a rectangle beneath the top layer"""
+        if self.stale:
+            return  # Will be drawn with everything else
+        kind, coords, options = self.items[item]
+        self._paint(kind, coords, options)
+        # Put back the parts of overlays drawn over it, and no more,
+        # so as not to paint an overlay over a later one beside it
+        x0, y0, x1, y1 = coords
+        x0, y0 = round(min(x0, x1)), round(min(y0, y1))
+        x1, y1 = round(max(coords[0], coords[2])) + 1, round(max(coords[1], coords[3])) + 1
+        overlays = self._overlays_over(x0, y0, x1, y1)
+        if overlays:
+            self.raster.set_clip(x0, y0, x1, y1)
+            for overlay in overlays:
+                self._paint(*self.items[overlay])
+            self.raster.set_clip()
+
+    def _paint(self, kind: str, coords: list[float], options: dict):
+        """Draw one item onto the raster"""
+        raster = self.raster
+        if kind in ["rectangle", "oval"]:
+            fill = raster.fill_rect if kind == "rectangle" else raster.fill_oval
+            x0, y0, x1, y1 = coords
+            x0, x1 = min(x0, x1), max(x0, x1)
+            y0, y1 = min(y0, y1), max(y0, y1)
+            outline = options.get("outline", "black")
+            width = int(options.get("width", 1)) if outline else 0
+            if width:
+                fill(x0, y0, x1 + 1, y1 + 1, outline)
+            fill(x0 + width, y0 + width, x1 + 1 - width, y1 + 1 - width, options.get("fill", ""))
+        elif kind == "line":
+            raster.draw_line(*coords, options.get("fill", "black"), int(options.get("width", 1)))
+        elif kind == "text":
+            font = options.get("font", ("helvetica", 12))
+            raster.draw_text(*coords, options.get("text", ""), options.get("fill", "black"), font[1])
+        elif kind == "image":
+            image = options["image"]
+            x, y = coords
+            raster.paste(image, round(x - image.width / 2), round(y - image.height / 2))
+
+    def redraw(self):
+        """Draw every item again, from the background up"""
+        self.raster = Raster(self.width, self.height, self.background)
+        for image in self.images:
+            self._paint(*self.items[image])
+        for kind, coords, options in self.items.values():
+            if kind == "rectangle":
+                self._paint(kind, coords, options)
+        for overlay in self.overlays:
+            self._paint(*self.items[overlay])
+        self.stale = False
+
+    def update(self):
+        """Bring the image up to date, and save it as the next
+        frame if there is a frame_pattern and anything has changed
+        """
+        if self.stale:
+            self.redraw()
+        if self.frame_pattern and self.changed:
+            self.raster.save(self.frame_pattern.format(self.frame_count))
+            self.frame_count += 1
+        self.changed = False
+
+    def save(self, path: str):
+        """Save the image as it is now to path (PNG or PPM)"""
+        if self.stale:
+            self.redraw()
+        self.raster.save(path)
+
+    def isClosed(self) -> bool:
+        return self.closed
+
+    def close(self):
+        """Save the last frame, if needed, and stop drawing"""
+        if not self.closed:
+            self.update()
+            self.closed = True
@@ -0,0 +1,128 @@
+"""Compiled trie of dictionary words for the Boggle solver.
+
+A trie is first built as nested dicts (trie_insert), which is
+easy to grow one word at a time, then compiled (compile_trie) into
+a Lexicon:  a handful of flat arrays that are compact, quick to
+walk one letter at a time, and quick to save and load as bytes.
+
+In a Lexicon, nodes are numbered in breadth-first order with the
+root as node 0, so the children of each node are numbered
+consecutively.  For node n,
+   - its children are nodes first[n] up to (not including) first[n+1],
+   - edges[c] is the character code of the letter leading to child c,
+   - word_ids[n] is the index in words of the word that node n
+     completes, or -1 if the path to n is only a prefix.
+"""
+import marshal
+from array import array
+from typing import Optional
+
+# Dict trie key marking a node that completes a word.  Cannot
+# collide with a letter, since allowed words are alphabetic.
+WORD = "$"
+
+# Node number of the root of every Lexicon
+ROOT = 0
+
+
+def trie_insert(trie: dict, word: str):
+    """Add word to trie, creating nodes for its letters as needed.
+
+    >>> trie = {}
+    >>> trie_insert(trie, "AXE")
+    >>> trie
+    {'A': {'X': {'E': {'$': 'AXE'}}}}
+    """
+    node = trie
+    for letter in word:
+        child = node.get(letter)
+        if child is None:
+            child = {}
+            node[letter] = child
+        node = child
+    node[WORD] = word
+
+
+class Lexicon:
+    """A trie compiled into flat arrays"""
+
+    def __init__(self, edges: bytes, first: array, word_ids: array, words: list[str]):
+        self.edges = edges
+        self.first = first
+        self.word_ids = word_ids
+        self.words = words
+
+    def child(self, node: int, letter: str) -> int:
+        """The child of node reached by letter, or -1 if there is none
+
+        >>> lex = compile_trie({"A": {"B": {WORD: "AB"}}})
+        >>> lex.child(ROOT, "A")
+        1
+        >>> lex.child(ROOT, "B")
+        -1
+        """
+        return self.edges.find(ord(letter), self.first[node], self.first[node + 1])
+
+    def word_at(self, node: int) -> Optional[str]:
+        """The word completed at node, or None if node is only a prefix"""
+        word_id = self.word_ids[node]
+        if word_id < 0:
+            return None
+        return self.words[word_id]
+
+    def to_bytes(self) -> bytes:
+        """Serialized form, for saving in a cache file"""
+        return marshal.dumps((self.edges, self.first.tobytes(),
+                              self.word_ids.tobytes(), "\n".join(self.words)))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Lexicon":
+        """Rebuild a Lexicon from its serialized form.  Each array is
+        restored with one block copy, so this is fast regardless of size.
+
+        >>> lex = compile_trie({"A": {"B": {WORD: "AB"}}})
+        >>> copy = Lexicon.from_bytes(lex.to_bytes())
+        >>> copy.word_at(copy.child(copy.child(ROOT, "A"), "B"))
+        'AB'
+        """
+        edges, first_bytes, word_id_bytes, joined_words = marshal.loads(data)
+        first = array("i")
+        first.frombytes(first_bytes)
+        word_ids = array("i")
+        word_ids.frombytes(word_id_bytes)
+        words = joined_words.split("\n") if joined_words else []
+        return cls(edges, first, word_ids, words)
+
+
+def compile_trie(trie: dict) -> Lexicon:
+    """Compile a nested-dict trie (see trie_insert) into a Lexicon.
+
+    >>> trie = {}
+    >>> for word in ["BETA", "ALPHA", "BET"]:
+    ...     trie_insert(trie, word)
+    >>> sorted(compile_trie(trie).words)
+    ['ALPHA', 'BET', 'BETA']
+    """
+    edges = bytearray([0])  # Root is not reached by any letter
+    first = array("i")
+    word_ids = array("i")
+    words = []
+    # Breadth-first:  nodes[n] is the dict for node n, and
+    # children are appended in the order their parents are visited
+    nodes = [trie]
+    node_i = 0
+    while node_i < len(nodes):
+        node = nodes[node_i]
+        first.append(len(nodes))
+        if WORD in node:
+            word_ids.append(len(words))
+            words.append(node[WORD])
+        else:
+            word_ids.append(-1)
+        for letter in sorted(node):
+            if letter != WORD:
+                edges.append(ord(letter))
+                nodes.append(node[letter])
+        node_i += 1
+    first.append(len(nodes))
+    return Lexicon(bytes(edges), first, word_ids, words)
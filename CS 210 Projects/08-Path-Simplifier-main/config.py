@@ -5,6 +5,14 @@ BASEMAP_IMAGE = "basemaps/Oregon-Siuslaw-Smith.png"
 BASEMAP_WIDTH_PX = 987
 BASEMAP_HEIGHT_PX = 565
 
+# Draw the map in a window ("tk"), or off-screen ("raster"),
+# saving frames as PNG (or PPM) files named by FRAME_PATTERN
+DISPLAY_BACKEND = "tk"
+FRAME_PATTERN = "frames/path-{:05d}.png"
+# Or record the drawing, without drawing it, in a log to be rendered
+# later (python3 -m graphics.recorder), e.g., "path.log.gz"; None to draw
+RECORD_PATH = None
+
 # CSV file of raw path UTM coordinates
 UTM_CSV = "data/Smith_River_300k_pre-ride_2022.csv"
 
@@ -0,0 +1,219 @@
+"""Record drawing as an event log, and render the log later.
+
+A view in recording mode draws nothing while the algorithm runs;
+instead each drawing operation is logged by a Recorder, with the
+time since recording began, so the algorithm runs at full speed
+however slow drawing would be.  Events are written to the log as
+they come (a little at a time), and render reads them back the same
+way, so neither holds a whole recording in memory.  Afterward, render replays the log
+into an off-screen view (see graphics.raster) at a chosen frame
+rate, saving numbered frames, an animated GIF, or both.
+
+Log format:  JSON lines, compressed with gzip if the path ends
+in '.gz'.  The first line is a header describing the view, whose
+"view" entry names the module that can render it (with a render_log
+function).  Each other line is one event, [seconds, operation,
+arguments ...], e.g., [0.0125, "fill", 3, 4, "#ff0000"].
+
+Render a log from the command line with, e.g.,
+    python3 -m graphics.recorder cave.log.gz --gif cave.gif --fps 30
+"""
+import argparse
+import gzip
+import importlib
+import json
+import shutil
+import time
+from typing import Callable, Iterator, Optional
+
+from graphics.raster import GifWriter, Raster
+
+# A Recorder writes the events it has buffered to its log when they
+# reach FLUSH_CHARS characters, or FLUSH_SECONDS after it last wrote
+FLUSH_CHARS = 65536
+FLUSH_SECONDS = 1.0
+
+
+class Recorder:
+    """Writes the events of one recording to the log at path as they
+    come, buffering at most FLUSH_CHARS characters (or FLUSH_SECONDS)
+    of them.  The log is complete when the Recorder is closed.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "test.log.gz")
+    >>> recording = Recorder(path, {"view": "none"})
+    >>> for i in range(3):
+    ...     recording.record("fill", i, 0, "red", at=i / 10)
+    >>> recording.close()
+    >>> read_log(path)[1]
+    [[0.0, 'fill', 0, 0, 'red'], [0.1, 'fill', 1, 0, 'red'], [0.2, 'fill', 2, 0, 'red']]
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self.log_file = _open_log(path, "wt")
+        self.log_file.write(json.dumps(header) + "\n")
+        # Lines of events not yet written, and their total length
+        self.pending: list[str] = []
+        self.pending_chars = 0
+        self.start = time.perf_counter()
+        self.last_flush = self.start
+
+    def record(self, operation: str, *args, at: Optional[float] = None):
+        """Log operation with args, at time at (in seconds from
+        the start of recording), by default now
+        """
+        now = time.perf_counter()
+        if at is None:
+            at = now - self.start
+        line = json.dumps([round(at, 6), operation, *args], separators=(",", ":")) + "\n"
+        self.pending.append(line)
+        self.pending_chars += len(line)
+        if self.pending_chars >= FLUSH_CHARS or now - self.last_flush >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events to the log"""
+        self.log_file.write("".join(self.pending))
+        self.log_file.flush()
+        self.pending = []
+        self.pending_chars = 0
+        self.last_flush = time.perf_counter()
+
+    def close(self):
+        """Write the last events and close the log"""
+        self.flush()
+        self.log_file.close()
+
+
+def _open_log(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def write_log(path: str, header: dict, events: list[list]):
+    """Save a header and events in log format.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "test.log.gz")
+    >>> write_log(path, {"view": "none"}, [[0.5, "fill", 1, 2, "red"]])
+    >>> read_log(path)
+    ({'view': 'none'}, [[0.5, 'fill', 1, 2, 'red']])
+    """
+    with _open_log(path, "wt") as log_file:
+        log_file.write(json.dumps(header) + "\n")
+        for event in events:
+            log_file.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+
+def read_header(path: str) -> dict:
+    """Just the header of a log"""
+    with _open_log(path, "rt") as log_file:
+        return json.loads(log_file.readline())
+
+
+def read_events(path: str) -> Iterator[list]:
+    """The events of a log, one at a time"""
+    with _open_log(path, "rt") as log_file:
+        log_file.readline()  # Header
+        for line in log_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_log(path: str) -> tuple[dict, list[list]]:
+    """(header, events) of a log"""
+    return read_header(path), list(read_events(path))
+
+
+def render(log_path: str,
+           start: Callable[[dict], None],
+           apply: Callable[[list], None],
+           finish_frame: Callable[[], Raster],
+           fps: float = 30, slowdown: float = 1.0,
+           frame_pattern: Optional[str] = None,
+           gif_path: Optional[str] = None) -> int:
+    """Replay a log at fps frames per second, slowdown times slower
+    than it was recorded, returning the number of frames.
+      start(header) sets up an off-screen view,
+      apply(event) draws one event in the view, and
+      finish_frame() brings the view up to date and returns its image.
+    Frame n shows every event up to time (n + 1) / (fps * slowdown).
+    Frames are saved at frame_pattern.format(n), e.g., 'frames/cave-{:05d}.png',
+    and/or as an animated GIF at gif_path.
+
+    >>> import os, tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> path = os.path.join(folder, "test.log")
+    >>> write_log(path, {}, [[0.0, "red"], [0.25, "blue"]])
+    >>> image = Raster(2, 2)
+    >>> def paint(event):
+    ...     image.fill_rect(0, 0, 2, 2, event[1])
+    >>> render(path, lambda header: None, paint, lambda: image, fps=10,
+    ...        frame_pattern=os.path.join(folder, "{}.ppm"))
+    3
+    >>> sorted(os.listdir(folder))
+    ['0.ppm', '1.ppm', '2.ppm', 'test.log']
+    """
+    start(read_header(log_path))
+    events = read_events(log_path)
+    # The next event not yet drawn, if any
+    event = next(events, None)
+    gif = None
+
+    def frame_of(event: list) -> int:
+        # Allowing for times rounded in the log, so an event logged
+        # at exactly the start of a frame is not drawn a frame early
+        return int(event[0] * slowdown * fps + 1e-4)
+
+    frame = 0
+    while True:
+        while event is not None and frame_of(event) <= frame:
+            apply(event)
+            event = next(events, None)
+        image = finish_frame()
+        # Nothing changes until the frame of the next event
+        if event is not None:
+            next_frame = frame_of(event)
+        else:
+            next_frame = frame + 1
+        if frame_pattern:
+            first_path = frame_pattern.format(frame)
+            image.save(first_path)
+            for repeat in range(frame + 1, next_frame):
+                shutil.copyfile(first_path, frame_pattern.format(repeat))
+        if gif_path:
+            if gif is None:
+                gif = GifWriter(gif_path, image.width, image.height, fps)
+            gif.add(image, frame)
+        frame = next_frame
+        if event is None:
+            break
+    if gif:
+        gif.close()
+    return frame
+
+
+def main():
+    """Render a log with the view module named in its header"""
+    parser = argparse.ArgumentParser("Render a recorded drawing log as frames or a GIF")
+    parser.add_argument("log", help="Log recorded by a view in recording mode")
+    parser.add_argument("--frames", dest="frame_pattern",
+        help="Pattern for numbered frame files, e.g., frames/cave-{:05d}.png")
+    parser.add_argument("--gif", dest="gif_path", help="Animated GIF file to write")
+    parser.add_argument("--fps", dest="fps", type=float, default=30,
+        help="Frames per second")
+    parser.add_argument("--slowdown", dest="slowdown", type=float, default=1.0,
+        help="Play back this many times slower than recorded")
+    args = parser.parse_args()
+    if not (args.frame_pattern or args.gif_path):
+        parser.error("Specify --frames, --gif, or both")
+    view = importlib.import_module(read_header(args.log)["view"])
+    n_frames = view.render_log(args.log, fps=args.fps, slowdown=args.slowdown,
+                               frame_pattern=args.frame_pattern, gif_path=args.gif_path)
+    print(f"Rendered {n_frames} frames")
+
+
+if __name__ == "__main__":
+    main()
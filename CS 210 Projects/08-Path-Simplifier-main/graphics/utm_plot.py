@@ -1,8 +1,13 @@
 """Plot UTM points on a basemap image.
 M Young, 2022-09-17
+
+The map is drawn in a Tk window, or with backend="raster" off-screen
+into an image (see graphics.raster), which needs no display.
+Points and lines are canvas items, named by their item ids.
 """
+from typing import Optional
 
-import graphics.graphics as graphics
+import graphics.raster as raster
 
 import logging
 logging.basicConfig()
@@ -13,22 +18,22 @@ PT_MARK_SIZE = 3  # pixels
 
 # Contrasty colors for at least 10 groups
 COLOR_WHEEL = [
-    graphics.color_rgb(255,0,0),
-    graphics.color_rgb(0,255,255),
-    graphics.color_rgb(127,0,255),
-    graphics.color_rgb(127,255,0),
-    graphics.color_rgb(255,0,255),
-    graphics.color_rgb(255,127,0),
-    graphics.color_rgb(0,0,255),
-    graphics.color_rgb(0,127,255),
-    graphics.color_rgb(50,50,0),
-    graphics.color_rgb(255,0,127)
+    raster.color_rgb(255,0,0),
+    raster.color_rgb(0,255,255),
+    raster.color_rgb(127,0,255),
+    raster.color_rgb(127,255,0),
+    raster.color_rgb(255,0,255),
+    raster.color_rgb(255,127,0),
+    raster.color_rgb(0,0,255),
+    raster.color_rgb(0,127,255),
+    raster.color_rgb(50,50,0),
+    raster.color_rgb(255,0,127)
 ]
 
 # Colors for path simplification project
 # Initially we'll use light grey for trial lines, dark red for the final path
-LIGHT = graphics.color_rgb(247,146,230)  # Hot violet
-DARK = graphics.color_rgb(150,0,0)
+LIGHT = raster.color_rgb(247,146,230)  # Hot violet
+DARK = raster.color_rgb(150,0,0)
 
 next_color = 0
 def choose_color() -> object:
@@ -43,27 +48,42 @@ def choose_color() -> object:
     return choice
 
 class Map:
-    """A plot in UTM coordinates with a georeferenced image"""
+    """A plot in UTM coordinates with a georeferenced image.
+    With backend "raster", the map is drawn off-screen, and each
+    flush saves a frame named by frame_pattern (see
+    graphics.raster.RasterCanvas).
+    """
     def __init__(self, basemap_path: str,
                  window: tuple[int, int],
                  utm_origin: tuple[int, int],
-                 utm_ne_extent: tuple[int, int]):
+                 utm_ne_extent: tuple[int, int],
+                 backend: str = "tk",
+                 frame_pattern: Optional[str] = None):
         win_width, win_height = window
         self.win_width, self.win_height = window
         self.utm_origin_easting, self.utm_origin_northing = utm_origin
         self.utm_extent_easting, self.utm_extent_northing = utm_ne_extent
         self.utm_width = self.utm_extent_easting - self.utm_origin_easting
         self.utm_height = self.utm_extent_northing - self.utm_origin_northing
-        self.window = graphics.GraphWin(basemap_path, win_width, win_height)
-        self.basemap = graphics.Image(graphics.Point(win_width//2, win_height//2), basemap_path)
-        self.basemap.draw(self.window)
+        self.live = backend == "tk"
+        if backend == "raster":
+            self.window = raster.RasterCanvas(win_width, win_height, frame_pattern=frame_pattern)
+            self.basemap = self.window.create_image(win_width//2, win_height//2,
+                                                    image=raster.read_png(basemap_path))
+        else:
+            assert backend == "tk", f"Unknown display backend '{backend}'"
+            # Imported only when needed, as importing it connects to the display
+            import graphics.graphics as graphics
+            self.window = graphics.GraphWin(basemap_path, win_width, win_height)
+            self.basemap = graphics.Image(graphics.Point(win_width//2, win_height//2), basemap_path)
+            self.basemap.draw(self.window)
         # Conversion factor from meters (UTM) to pixels
         self.pixels_per_meter_easting = self.win_width / self.utm_width
         self.pixels_per_meter_northing = self.win_height / self.utm_height
         # Should be very close but not identical
         log.debug(f"Pixels per meter {self.pixels_per_meter_easting}, {self.pixels_per_meter_northing}")
         # We will keep a list of "trial strokes" that can be erased when the full plot is done
-        self.trial_strokes: list[graphics.Line] = []
+        self.trial_strokes: list[int] = []
 
 
     def pixel_coordinates(self, easting, northing) -> tuple[int, int]:
@@ -72,20 +92,33 @@ class Map:
         pixel_y = int(self.pixels_per_meter_northing * (northing - self.utm_origin_northing))
         return (pixel_x, pixel_y)
 
-    def plot_point(self, easting, northing, size_px: int=PT_MARK_SIZE, color: str = "red") -> graphics.Circle:
+    def _changed(self):
+        """Show a change at once in a window.  Off-screen,
+        changes are saved by flush and close.
+        """
+        if self.live:
+            self.window.update()
+
+    def _center(self, symbol: int) -> tuple[float, float]:
+        """Center of the canvas item symbol, in pixels"""
+        x0, y0, x1, y1 = self.window.coords(symbol)
+        return ((x0 + x1) / 2, (y0 + y1) / 2)
+
+    def plot_point(self, easting, northing, size_px: int=PT_MARK_SIZE, color: str = "red") -> int:
         pixel_x, pixel_y = self.pixel_coordinates(easting, northing)
-        symbol = graphics.Circle(graphics.Point(pixel_x, pixel_y), size_px)
-        symbol.setFill(color)
-        symbol.draw(self.window)
+        symbol = self.window.create_oval(pixel_x - size_px, pixel_y - size_px,
+                                         pixel_x + size_px, pixel_y + size_px,
+                                         fill=color, outline="black")
+        self._changed()
         return symbol
 
-    def move_point(self, symbol: graphics.Circle, new_pos: tuple[int, int]):
+    def move_point(self, symbol: int, new_pos: tuple[int, int]):
         """Move point to new easting, northing"""
         easting, northing = new_pos
         pixel_x, pixel_y = self.pixel_coordinates(easting, northing)
-        old_center = symbol.getCenter()
-        old_x, old_y = old_center.x, old_center.y
-        symbol.move(pixel_x - old_x, pixel_y - old_y)
+        old_x, old_y = self._center(symbol)
+        self.window.move(symbol, pixel_x - old_x, pixel_y - old_y)
+        self._changed()
 
     def plot_segment(self,
                       utm_start: tuple[int, int], utm_end: tuple[int, int],
@@ -97,32 +130,37 @@ class Map:
         x_start, y_start = self.pixel_coordinates(easting_start, northing_start)
         easting_end, northing_end = utm_end
         x_end, y_end = self.pixel_coordinates(easting_end, northing_end)
-        symbol = graphics.Line(graphics.Point(x_start, y_start),
-                               graphics.Point(x_end, y_end))
+        symbol = self.window.create_line(x_start, y_start, x_end, y_end,
+                                         fill=color, width=2)
         if trial:
             self.trial_strokes.append(symbol)
-        symbol.setWidth(2)
-        symbol.setOutline(color)
-        symbol.draw(self.window)
+        self._changed()
 
     def erase_trial_strokes(self):
         """Erases ALL of them"""
         for mark in self.trial_strokes:
-            mark.undraw()
+            self.window.delete(mark)
         self.trial_strokes = []
+        self._changed()
 
 
     def connect_all(self,
-             symbol: graphics.Circle,
+             symbol: int,
              group: list[tuple[float, float]]):
         color = choose_color()
-        symbol.setFill(color)
-        center = symbol.getCenter()
+        self.window.itemconfig(symbol, fill=color)
+        center_x, center_y = self._center(symbol)
         for easting, northing in group:
             x, y = self.pixel_coordinates(easting, northing)
-            ray = graphics.Line(center, graphics.Point(x, y))
-            ray.setOutline(color)
-            ray.draw(self.window)
+            self.window.create_line(center_x, center_y, x, y, fill=color)
+        self._changed()
+
+    def flush(self):
+        """Bring the display up to date; off-screen,
+        save it as the next frame
+        """
+        self.window.update()
 
     def close(self):
-        self.window.close()
\ No newline at end of file
+        """Close the window; off-screen, save the last frame"""
+        self.window.close()
@@ -1,6 +1,13 @@
-"""Plot of UTM coordinates on registered basemap"""
+"""Plot of UTM coordinates on registered basemap.
+
+With config.RECORD_PATH, the plot is recorded instead of drawn
+(see init), to be rendered later into frames or an animated GIF
+(see render_log).
+"""
 
 import graphics.utm_plot
+import graphics.raster
+import graphics.recorder
 import config
 
 from typing import Optional
@@ -8,14 +15,33 @@ from typing import Optional
 canvas: Optional[graphics.utm_plot.Map] = None
 cursor: Optional[tuple[float, float]] = None
 
+# Log of drawing operations, when recording instead of drawing
+recording: Optional[graphics.recorder.Recorder] = None
+
 def init():
-    """Create the display"""
-    global canvas
+    """Create the display, or start recording"""
+    global canvas, cursor, recording
+    cursor = None
+    if config.RECORD_PATH:
+        recording = graphics.recorder.Recorder(config.RECORD_PATH,
+            {"view": "map_view", "basemap": config.BASEMAP_IMAGE,
+             "window": [config.BASEMAP_WIDTH_PX, config.BASEMAP_HEIGHT_PX],
+             "origin": [config.ORIGIN_EASTING, config.ORIGIN_NORTHING],
+             "extent": [config.EXTENT_EASTING, config.EXTENT_NORTHING]})
+        return
     canvas = graphics.utm_plot.Map(config.BASEMAP_IMAGE,
                 (config.BASEMAP_WIDTH_PX, config.BASEMAP_HEIGHT_PX),
                 (config.ORIGIN_EASTING, config.ORIGIN_NORTHING),
-                (config.EXTENT_EASTING, config.EXTENT_NORTHING))
-    cursor = None
+                (config.EXTENT_EASTING, config.EXTENT_NORTHING),
+                backend=config.DISPLAY_BACKEND, frame_pattern=config.FRAME_PATTERN)
+
+def _plot_segment(from_point: tuple[float, float], to_point: tuple[float, float],
+                  color=graphics.utm_plot.DARK, trial=False):
+    """Draw (or record) one segment"""
+    if recording:
+        recording.record("segment", from_point, to_point, color, trial)
+    elif canvas:
+        canvas.plot_segment(from_point, to_point, color=color, trial=trial)
 
 def move_to(point: tuple[float, float]):
     """Set location from which next plot_to will start"""
@@ -24,28 +50,66 @@ def move_to(point: tuple[float, float]):
 
 def plot_to(point: tuple[float, float]):
     global cursor
-    if canvas:
+    if canvas or recording:
         if cursor:
-            canvas.plot_segment(cursor, point)
+            _plot_segment(cursor, point)
         cursor = point
 
 def scratch(from_point: tuple[float, float], to_point: tuple[float, float]):
     """Writes a light scratch line that can be erased later"""
-    if canvas:
-        canvas.plot_segment(from_point, to_point, color=graphics.utm_plot.LIGHT, trial=True)
+    _plot_segment(from_point, to_point, color=graphics.utm_plot.LIGHT, trial=True)
 
 def clean_scratches():
     """Erase scratchmarks from plot"""
-    if canvas:
+    if recording:
+        recording.record("erase")
+    elif canvas:
         canvas.erase_trial_strokes()
 
 def wait_to_close():
-    """Prompt user for permission to shut down"""
+    """Prompt user for permission to shut down
+    (an off-screen map is just saved, without asking,
+    and a recording finishes its log)
+    """
     global canvas
     global cursor
+    global recording
+    if recording:
+        recording.close()
+        recording = None
     if canvas:
-        input("Press enter to quit")
+        if canvas.live:
+            input("Press enter to quit")
         canvas.close()
         canvas = None
-        cursor = None
+    cursor = None
+
+def render_log(log_path: str, fps: float = 30, slowdown: float = 1.0,
+               frame_pattern: Optional[str] = None,
+               gif_path: Optional[str] = None) -> int:
+    """Render a log recorded with config.RECORD_PATH into numbered
+    frames and/or an animated GIF, returning the number of frames
+    (see graphics.recorder.render).
+    """
+    def start(header: dict):
+        global canvas
+        canvas = graphics.utm_plot.Map(header["basemap"], tuple(header["window"]),
+                                       tuple(header["origin"]), tuple(header["extent"]),
+                                       backend="raster")
+
+    def apply(event: list):
+        _, operation, *args = event
+        if operation == "segment":
+            from_point, to_point, color, trial = args
+            canvas.plot_segment(tuple(from_point), tuple(to_point), color=color, trial=trial)
+        else:
+            canvas.erase_trial_strokes()
+
+    def finish_frame() -> graphics.raster.Raster:
+        canvas.flush()
+        return canvas.window.raster
 
+    n_frames = graphics.recorder.render(log_path, start, apply, finish_frame,
+                                        fps, slowdown, frame_pattern, gif_path)
+    wait_to_close()
+    return n_frames
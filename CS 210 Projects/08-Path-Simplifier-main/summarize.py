@@ -80,6 +80,7 @@ def main():
     print(f"{len(points)} raw points")
     summary = summarize(points, config.TOLERANCE_METERS)
     print(f"{len(summary)} points in summary")
+    map_view.wait_to_close()
     
 if __name__ == "__main__":
     doctest.testmod()
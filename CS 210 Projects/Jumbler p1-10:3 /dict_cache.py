@@ -0,0 +1,78 @@
+"""Compiled dictionary cache.
+
+Reading and indexing a 41,000-word dictionary is most of the
+startup cost of a word game solver.  The solver can save its
+compiled index as a binary cache file next to the dictionary,
+and later runs load the cache instead of rebuilding the index.
+
+A cache file starts with one header line recording the
+modification time, size, and SHA-256 hash of the dictionary
+it was built from.  It is used only if the dictionary still
+matches:  the time and size are checked first, and if they
+differ (e.g., the file was copied or touched) the hash decides.
+"""
+import hashlib
+import os
+from typing import Optional
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.WARN)
+
+# First word of a cache file header; change the version
+# whenever the layout of cached data changes.
+MAGIC = "dict-cache-1"
+
+
+def file_hash(path: str) -> str:
+    """Hex SHA-256 digest of the contents of the file at path"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_cache(cache_path: str, source_path: str, kind: str) -> Optional[bytes]:
+    """Return the data saved in cache_path by write_cache, or None if
+    there is no such cache, it holds a different kind of index, or it
+    was built from a different version of source_path.
+    """
+    try:
+        with open(cache_path, "rb") as cache_file:
+            header = cache_file.readline().decode("ascii").split()
+            data = cache_file.read()
+        stat = os.stat(source_path)
+    except (OSError, UnicodeDecodeError):
+        return None
+    if len(header) != 5 or header[0] != MAGIC or header[1] != kind:
+        return None
+    _, _, mtime_ns, size, digest = header
+    if int(size) != stat.st_size:
+        return None
+    if int(mtime_ns) != stat.st_mtime_ns and digest != file_hash(source_path):
+        log.info(f"{source_path} has changed since {cache_path} was built")
+        return None
+    return data
+
+
+def write_cache(cache_path: str, source_path: str, kind: str, data: bytes):
+    """Save data as the compiled index of source_path.
+    Failure to write the cache (e.g., in a read-only directory)
+    is logged but otherwise ignored; it just means the next run
+    will have to rebuild the index.
+    """
+    stat = os.stat(source_path)
+    header = f"{MAGIC} {kind} {stat.st_mtime_ns} {stat.st_size} {file_hash(source_path)}\n"
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(header.encode("ascii"))
+            cache_file.write(data)
+        # Replace in one step, so a concurrent reader never sees half a cache
+        os.replace(temp_path, cache_path)
+    except OSError as err:
+        log.warning(f"Could not write dictionary cache {cache_path}: {err}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -6,8 +6,25 @@ Credits:
 Me :)
 """
 
+import argparse
+import json
+import marshal
+import multiprocessing
+import time
+from typing import Iterable, Iterator, Optional
+
+import dict_cache
+
 # DICT = 'shortdict.txt'    # Short version for testing & debugging
 DICT = "dict.txt"       # Full dictionary word list
+# Keep normalized dictionary words in DICT + CACHE_SUFFIX,
+# so later runs need not re-read and re-normalize the dictionary
+USE_CACHE = True
+CACHE_SUFFIX = ".anagrams"
+# A blank tile, which can stand for any letter
+BLANK = "?"
+# Batch mode hands each worker process this many queries at a time
+BATCH_CHUNK = 64
 
 def normalize(word: str) -> list[str]:
     """Returns a list of characters that is canonical for anagrams.
@@ -29,6 +46,182 @@ def normalize(word: str) -> list[str]:
 
     return(word)
 
+def signature(word: str) -> str:
+    """normalize(word) as a single string, which is
+    cheaper to store and compare than a list.
+
+    >>> signature("Gamma")
+    'aagmm'
+    """
+    return "".join(normalize(word))
+
+def read_words(path: str, use_cache: bool = USE_CACHE) -> list[tuple[str, str]]:
+    """Returns (signature, word) for each word in the
+    dictionary at path.  If use_cache, the list is saved
+    beside the dictionary and reused for as long as the
+    dictionary is unchanged.
+
+    >>> read_words("shortdict.txt", use_cache=False)[:2]
+    [('aahlp', 'alpha'), ('abet', 'beta')]
+    """
+    cache_path = path + CACHE_SUFFIX
+    if use_cache:
+        data = dict_cache.read_cache(cache_path, path, "anagrams")
+        if data is not None:
+            signatures, words = marshal.loads(data)
+            return list(zip(signatures.split("\n"), words.split("\n")))
+
+    entries = []
+    with open(path, "r") as dict_file:
+        for line in dict_file:
+            word = line.strip()
+            entries.append((signature(word), word))
+
+    if use_cache:
+        signatures = "\n".join(entry[0] for entry in entries)
+        words = "\n".join(entry[1] for entry in entries)
+        dict_cache.write_cache(cache_path, path, "anagrams",
+                               marshal.dumps((signatures, words)))
+    return entries
+
+def build_index(entries: list[tuple[str, str]]) -> dict[str, list[str]]:
+    """Index words by signature, so that all the anagrams
+    of a word can be found with one lookup.
+
+    >>> build_index([("abt", "bat"), ("act", "cat"), ("abt", "tab")])
+    {'abt': ['bat', 'tab'], 'act': ['cat']}
+    """
+    index = {}
+    for word_signature, word in entries:
+        if word_signature in index:
+            index[word_signature].append(word)
+        else:
+            index[word_signature] = [word]
+    return index
+
+# Index of DICT, built on first use and then kept for
+# the rest of the run (see get_index)
+_index: Optional[dict[str, list[str]]] = None
+
+def get_index() -> dict[str, list[str]]:
+    """The anagram index of DICT"""
+    global _index
+    if _index is None:
+        _index = build_index(read_words(DICT))
+    return _index
+
+def anagrams(anagram: str, index: dict[str, list[str]]) -> list[str]:
+    """Words in index that match anagram, in dictionary order.
+
+    >>> index = build_index(read_words("shortdict.txt", use_cache=False))
+    >>> anagrams("AgEmo", index)
+    ['omega']
+    >>> anagrams("nosuchword", index)
+    []
+    """
+    return index.get(signature(anagram), [])
+
+def letter_needs(word_signature: str) -> tuple[int, tuple[tuple[int, int], ...]]:
+    """Letter histogram of an alphabetic signature, as
+    (mask, needs):  mask has bit i set if the i'th letter of the
+    alphabet is used, and needs lists (i, count) for each letter used.
+
+    >>> letter_needs("aagmm")
+    (4161, ((0, 2), (6, 1), (12, 2)))
+    """
+    counts = [0] * 26
+    for letter in word_signature:
+        counts[ord(letter) - ord("a")] += 1
+    mask = 0
+    needs = []
+    for letter_i in range(26):
+        if counts[letter_i] > 0:
+            mask |= 1 << letter_i
+            needs.append((letter_i, counts[letter_i]))
+    return (mask, tuple(needs))
+
+def build_sub_index(index: dict[str, list[str]]) -> list[list[tuple[int, tuple, list[str]]]]:
+    """Index for sub-anagram search:  entry n is a list of
+    (mask, needs, words) for the alphabetic signatures of length n.
+    Words with hyphens, spaces, etc. cannot be spelled from tiles,
+    so they are left out.
+    """
+    by_length = []
+    for word_signature, words in index.items():
+        if not word_signature.isalpha():
+            continue
+        while len(by_length) <= len(word_signature):
+            by_length.append([])
+        mask, needs = letter_needs(word_signature)
+        by_length[len(word_signature)].append((mask, needs, words))
+    return by_length
+
+def sub_anagrams(letters: str, sub_index: list, min_length: int = 1) -> list[str]:
+    """Words in sub_index that can be spelled with at least min_length
+    of the given letters, each letter used at most once.  BLANK tiles in
+    letters can stand for any letter.  Longest words come first.
+
+    Candidates are pruned by length, then by which letters they use
+    (one mask operation), and only then are letter counts compared.
+
+    >>> sub_index = build_sub_index(build_index(read_words("shortdict.txt", use_cache=False)))
+    >>> sub_anagrams("tabe", sub_index)
+    ['beta']
+    >>> sub_anagrams("mmagaxe", sub_index)
+    ['gamma']
+    >>> sub_anagrams("lphaxx???", sub_index)
+    ['alpha', 'delta', 'beta']
+    >>> sub_anagrams("????", sub_index)
+    ['beta']
+    """
+    letters = letters.lower()
+    blanks = letters.count(BLANK)
+    have = [0] * 26
+    have_mask = 0
+    for letter in letters:
+        if "a" <= letter <= "z":
+            have[ord(letter) - ord("a")] += 1
+            have_mask |= 1 << (ord(letter) - ord("a"))
+
+    found = []
+    max_length = min(len(letters), len(sub_index) - 1)
+    for length in range(max_length, max(min_length, 1) - 1, -1):
+        matches = []
+        for mask, needs, words in sub_index[length]:
+            if blanks == 0 and mask & ~have_mask:
+                continue
+            shortfall = 0
+            for letter_i, count in needs:
+                if count > have[letter_i]:
+                    shortfall += count - have[letter_i]
+            if shortfall <= blanks:
+                matches.extend(words)
+        found.extend(sorted(matches))
+    return found
+
+# Sub-anagram index of DICT, built on first use (see get_sub_index)
+_sub_index: Optional[list] = None
+
+def get_sub_index() -> list:
+    """The sub-anagram index of DICT"""
+    global _sub_index
+    if _sub_index is None:
+        _sub_index = build_sub_index(get_index())
+    return _sub_index
+
+def find_sub(letters: str, min_length: int = 1):
+    """
+    Print words in DICT that can be spelled from
+    some of letters (see sub_anagrams).
+
+    >>> find_sub("kawea", 4)
+    awake
+    wake
+    weak
+    """
+    for word in lookup(letters, sub=True, min_length=min_length):
+        print(word)
+
 def find(anagram: str):
     """
     Print words in DICT that match anagram.
@@ -43,17 +236,110 @@ def find(anagram: str):
 
     >>> find("KAWEA")
     awake
+
+    >>> find("KAW?A")
+    awake
   
     """
-    dict_file = open(DICT, "r")
-    for line in dict_file:
-        word = line.strip()
-        if normalize(word) == normalize(anagram):
-            print(word)
+    for word in lookup(anagram):
+        print(word)
+
+def lookup(query: str, sub: bool = False, min_length: int = 1) -> list[str]:
+    """Words in DICT matching query:  its sub-anagrams if sub,
+    otherwise its exact anagrams (with blanks, if any).
+
+    >>> lookup("kawea")
+    ['awake']
+    >>> lookup("kawea", sub=True, min_length=4)
+    ['awake', 'wake', 'weak']
+    """
+    if sub:
+        return sub_anagrams(query, get_sub_index(), min_length)
+    if BLANK in query:
+        # Exact anagram with wildcards:  use every tile
+        return sub_anagrams(query, get_sub_index(), len(query))
+    return anagrams(query, get_index())
+
+def _init_worker(index: dict[str, list[str]], sub_index: list):
+    """Install the shared indexes in a batch worker process.  When
+    workers are forked, they inherit the parent's indexes as-is
+    rather than rebuilding them or copying them through a pipe.
+    """
+    global _index, _sub_index
+    _index = index
+    _sub_index = sub_index
+
+def _lookup_in_worker(task: tuple[str, bool, int]) -> dict:
+    """Answer one batch query, timing the lookup"""
+    query, sub, min_length = task
+    start = time.perf_counter()
+    words = lookup(query, sub, min_length)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {"query": query, "words": words, "ms": round(elapsed_ms, 3)}
+
+def find_batch(queries: Iterable[str], sub: bool = False, min_length: int = 1,
+               workers: Optional[int] = None) -> Iterator[dict]:
+    """Answer each query (one per line; blank lines skipped) in a pool
+    of worker processes, yielding a record for each in input order
+    as soon as it and all earlier queries are answered.
+    Each record reports the query, the matching words, and the
+    time in milliseconds to look them up.
+    """
+    tasks = ((line.strip(), sub, min_length) for line in queries if line.strip())
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(get_index(), get_sub_index())) as pool:
+        yield from pool.imap(_lookup_in_worker, tasks, chunksize=BATCH_CHUNK)
+
+def repl(sub: bool = False, min_length: int = 1):
+    """Answer anagram queries, one per line, until
+    an empty line or the end of input.  The dictionary
+    is indexed only once for all the queries.
+    If sub, answer with sub-anagrams (see find_sub).
+    """
+    while True:
+        try:
+            anagram = input("Anagram to find> ")
+        except EOFError:
+            break
+        if len(anagram.strip()) == 0:
+            break
+        if sub:
+            find_sub(anagram.strip(), min_length)
+        else:
+            find(anagram.strip())
+
+def getargs() -> argparse.Namespace:
+    """Return arguments as a Namespace object"""
+    parser = argparse.ArgumentParser("Find anagrams")
+    parser.add_argument("--repl", dest="repl", action="store_true",
+        help="Keep answering queries until an empty line")
+    parser.add_argument("--sub", dest="sub", action="store_true",
+        help="Find words spelled by any subset of the letters "
+             f"('{BLANK}' is a blank tile)")
+    parser.add_argument("--min", dest="min_length", type=int, default=1,
+        help="With --sub, shortest word to report")
+    parser.add_argument("--batch", dest="batch", default=None,
+        type=argparse.FileType(mode="r", encoding="utf-8"),
+        help="Answer queries listed one per line in this file ('-' for stdin)")
+    parser.add_argument("--workers", dest="workers", type=int, default=None,
+        help="Number of worker processes for --batch (default: all cores)")
+    return parser.parse_args()
 
 def main(): 
+    args = getargs()
+    if args.batch:
+        # Batch mode:  JSONL results to stdout, one line per query
+        for result in find_batch(args.batch, args.sub, args.min_length, args.workers):
+            print(json.dumps(result), flush=True)
+        return
+    if args.repl:
+        repl(args.sub, args.min_length)
+        return
     anagram = input("Anagram to find> ")
-    find(anagram)
+    if args.sub:
+        find_sub(anagram, args.min_length)
+    else:
+        find(anagram)
 
 if __name__ == "__main__":
     main()
@@ -2,27 +2,107 @@
 2022-09-22  Michal Young for CS 210 at U Oregon
 CC-by-SA open source license
 
-This module creates and returns a grid represented as a list-of-lists.
+This module creates and returns a grid of cells, stored compactly
+as one byte per cell (see class Cave).
 It can also manage an associated cavern display.
 """
 import doctest
+import re
 
 # Text symbols (single characters) for contents of grid
 AIR = " "
 STONE = "#"
 WATER = "~"
 
+# The same symbols as single bytes, as stored in Cave.cells
+AIR_BYTE = AIR.encode("ascii")
+STONE_BYTE = STONE.encode("ascii")
+WATER_BYTE = WATER.encode("ascii")
 
+# Matches any cell that is not air (stone or water) in Cave.cells
+NOT_AIR = re.compile(b"[^" + re.escape(AIR_BYTE) + b"]")
+# Matches a horizontal run of air cells
+AIR_RUN = re.compile(re.escape(AIR_BYTE) + b"+")
 
-def read_cave(cavern_path: str) -> list[list[str]]:
+
+class Cave:
+    """A rectangular grid of cells, each AIR, STONE, or WATER.
+    Cells are stored row by row in one bytearray, one byte per cell,
+    so cave[row, col] is self.cells[row * self.ncols + col].
+
+    >>> cave = Cave(2, 3)
+    >>> cave[1, 2] = STONE
+    >>> cave[1, 2] == STONE
+    True
+    >>> cave.cells
+    bytearray(b'     #')
+    >>> cave[0, 3]
+    Traceback (most recent call last):
+    ...
+    IndexError: Cell (0, 3) is outside the 2x3 cave
+    """
+
+    def __init__(self, nrows: int, ncols: int, fill: str = AIR):
+        self.nrows = nrows
+        self.ncols = ncols
+        self.cells = bytearray(fill.encode("ascii") * (nrows * ncols))
+
+    def __len__(self) -> int:
+        """Number of rows, as for a list of rows"""
+        return self.nrows
+
+    def _offset(self, row: int, col: int) -> int:
+        """Index of cell (row, col) in self.cells.  Checked, because
+        a column past the right edge would otherwise wrap into the
+        next row.
+        """
+        if not (0 <= row < self.nrows and 0 <= col < self.ncols):
+            raise IndexError(f"Cell ({row}, {col}) is outside the {self.nrows}x{self.ncols} cave")
+        return row * self.ncols + col
+
+    def __getitem__(self, position: tuple[int, int]) -> str:
+        return chr(self.cells[self._offset(*position)])
+
+    def __setitem__(self, position: tuple[int, int], content: str):
+        self.cells[self._offset(*position)] = ord(content)
+
+    def row_text(self, row: int) -> str:
+        """Contents of row as a string of symbols"""
+        start = row * self.ncols
+        return self.cells[start:start + self.ncols].decode("ascii")
+
+
+def air_runs(cave: Cave, row: int) -> list[tuple[int, int]]:
+    """Each horizontal run of air in row, as (start_col, end_col)
+    with end_col exclusive, from left to right.  cave.cells may be
+    any bytes-like object, such as a memoryview of shared memory.
+
+    >>> cave = new_cave(1, 8)
+    >>> hwall(cave, 0, 2, 3)
+    >>> air_runs(cave, 0)
+    [(0, 2), (5, 8)]
+    >>> cave.cells = memoryview(cave.cells)
+    >>> air_runs(cave, 0)
+    [(0, 2), (5, 8)]
+    """
+    row_start = row * cave.ncols
+    return [(run.start() - row_start, run.end() - row_start)
+            for run in AIR_RUN.finditer(cave.cells, row_start, row_start + cave.ncols)]
+
+
+def read_cave(cavern_path: str) -> Cave:
     """Build and return a cavern (grid of character cells)
     from specification found at cavern_path, which should be
-    the path to a text file.   
-    
-    >>> read_cave("data/tiny_cave.txt")
-    [['#', '#', '#', '#'], ['#', ' ', ' ', '#'], ['#', ' ', ' ', '#'], ['#', '#', '#', '#']]
+    the path to a text file.
+
+    >>> print(text(read_cave("data/tiny-cave.txt")))
+    -----
+    |###|
+    |# #|
+    |###|
+    -----
     """
-    cave = []
+    cave = Cave(0, 0)
     cave_open = False
     with open(cavern_path, 'r') as cavern_file:
         for line in cavern_file:
@@ -46,6 +126,7 @@ def read_cave(cavern_path: str) -> list[list[str]]:
                 assert start_row >= 0, "Start row must be integer, zero or greater"
                 assert start_col >= 0, "Start column must be integer, zero or greater"
                 assert length >= 1, "Length of wall must be integer, at least 1"
+                assert start_row < nrows, "Wall cannot start below floor"
                 assert start_col + length <= ncols, "Wall cannot extend beyond right edge"
                 hwall(cave, start_row, start_col, length)
             elif command == "vwall":
@@ -58,6 +139,7 @@ def read_cave(cavern_path: str) -> list[list[str]]:
                 assert start_row >= 0, "Start row must be integer, zero or greater"
                 assert start_col >= 0, "Start column must be integer, zero or greater"
                 assert length >= 1, "Length of wall must be integer, at least 1"
+                assert start_col < ncols, "Wall cannot start beyond right edge"
                 assert start_row + length <= nrows, "Wall cannot extend through floor"
                 vwall(cave, start_row, start_col, length)
             else:
@@ -65,52 +147,107 @@ def read_cave(cavern_path: str) -> list[list[str]]:
     return cave
 
 
-def new_cave(nrows: int, ncols: int):
+def new_cave(nrows: int, ncols: int) -> Cave:
     """Create and return a new cave with
     nrows rows and ncols columns, initially filled
     entirely with air.
 
-    >>> new_cave(3, 4)
-    [[' ', ' ', ' ', ' '], [' ', ' ', ' ', ' '], [' ', ' ', ' ', ' ']]
+    >>> print(text(new_cave(3, 4)))
+    ------
+    |    |
+    |    |
+    |    |
+    ------
     """
-    cave = []
-    for row in range(nrows):
-        newRow = []
-        cave.append(newRow)
-        for col in range(ncols):
-            newRow.append(AIR)
-    return cave
+    return Cave(nrows, ncols)
 
 
-def hwall(cave: list[list[str]], row: int, col: int, length: int):
+def _wall_start(cave: Cave, row: int, col: int, length: int, down: bool) -> int:
+    """Index in cave.cells of the first cell of a wall of length cells
+    from (row, col), going right or down.  Raises IndexError if any of
+    it is outside the cave, as slicing cave.cells would instead grow
+    the cave or wrap into the next row.
+    """
+    last_row, last_col = (row + length - 1, col) if down else (row, col + length - 1)
+    if not (length >= 0 and 0 <= row < cave.nrows and 0 <= col < cave.ncols
+            and last_row < cave.nrows and last_col < cave.ncols):
+        raise IndexError(f"Wall from ({row}, {col}) of length {length} "
+                         f"is outside the {cave.nrows}x{cave.ncols} cave")
+    return row * cave.ncols + col
+
+
+def hwall(cave: Cave, row: int, col: int, length: int):
     """Build a horizontal wall of stone starting from (row,col) and
     extending length cells to the right.
 
     >>> cave = new_cave(3, 3)
     >>> hwall(cave, 1, 1, 2)
-    >>> cave
-    [[' ', ' ', ' '], [' ', '#', '#'], [' ', ' ', ' ']]
+    >>> print(text(cave))
+    -----
+    |   |
+    | ##|
+    |   |
+    -----
+    >>> hwall(cave, 3, 0, 2)
+    Traceback (most recent call last):
+    ...
+    IndexError: Wall from (3, 0) of length 2 is outside the 3x3 cave
     """
-    for i in range(length):
-        cave[row][col + i] = STONE
+    start = _wall_start(cave, row, col, length, down=False)
+    cave.cells[start:start + length] = STONE_BYTE * length
 
 
-def vwall(cave: list[list[str]], row: int, col: int, length: int):
+def vwall(cave: Cave, row: int, col: int, length: int):
     """Build a vertical wall of stone starting from (row,col) and
     extending length cells down.
 
     >>> cave = new_cave(3, 3)
     >>> vwall(cave, 1, 1, 2)
-    >>> cave
-    [[' ', ' ', ' '], [' ', '#', ' '], [' ', '#', ' ']]
+    >>> print(text(cave))
+    -----
+    |   |
+    | # |
+    | # |
+    -----
+    >>> vwall(cave, 0, 3, 2)
+    Traceback (most recent call last):
+    ...
+    IndexError: Wall from (0, 3) of length 2 is outside the 3x3 cave
+    """
+    start = _wall_start(cave, row, col, length, down=True)
+    # Every ncols'th cell from start is the same column, one row down
+    cave.cells[start:start + length * cave.ncols:cave.ncols] = STONE_BYTE * length
+
+
+def remove_hwall(cave: Cave, row: int, col: int, length: int):
+    """Clear a horizontal wall (or anything else) from (row,col) and
+    length cells to the right, leaving air.
+
+    >>> cave = new_cave(1, 4)
+    >>> hwall(cave, 0, 0, 4)
+    >>> remove_hwall(cave, 0, 1, 2)
+    >>> cave.row_text(0)
+    '#  #'
     """
-    for i in range(length):
-        cave[row + i][col] = STONE
+    start = _wall_start(cave, row, col, length, down=False)
+    cave.cells[start:start + length] = AIR_BYTE * length
+
+
+def remove_vwall(cave: Cave, row: int, col: int, length: int):
+    """Clear a vertical wall (or anything else) from (row,col) and
+    length cells down, leaving air.
+    """
+    start = _wall_start(cave, row, col, length, down=True)
+    cave.cells[start:start + length * cave.ncols:cave.ncols] = AIR_BYTE * length
+
 
-def text(cave: list[list[str]]) -> str:
+def text(cave: Cave) -> str:
     """A textual version of the cave, for debugging
 
-    >>> print(text([[' ', '#'], ['#', ' ']]))
+    >>> cave = new_cave(2, 2)
+    >>> cave[0, 1] = STONE
+    >>> cave[1, 0] = STONE
+    >>> print(text(cave))
     ----
     | #|
     |# |
@@ -118,10 +255,10 @@ def text(cave: list[list[str]]) -> str:
     """
     if len(cave) == 0:
         return "(apparent cave-in; no cave)"
-    top_bot_border = '-' * (len(cave[0]) + 2)
+    top_bot_border = '-' * (cave.ncols + 2)
     txt_rows = [ top_bot_border ]
-    for row in cave:
-        txt_rows.append("|" + "".join(row) + "|")
+    for row in range(cave.nrows):
+        txt_rows.append("|" + cave.row_text(row) + "|")
     txt_rows.append(top_bot_border)
     return "\n".join(txt_rows)
 
@@ -0,0 +1,262 @@
+"""Cave files too large to read the simple way.
+
+cave.read_cave builds the whole grid before drawing any walls.  For
+huge generated caves we instead
+  - read_walls:  stream through a cave specification (same cave /
+    hwall / vwall format), keeping only the walls, as intervals;
+  - rasterize:  draw those walls into a Cave, either the whole cave
+    or just a band of rows;
+  - write_packed / read_packed:  save and load a cave in a binary
+    format of one bit per cell (1 for stone), which can be memory-mapped
+    so that a band of rows is read without reading the whole file.
+
+Packed format:  a header (HEADER: magic, rows, columns), then each
+row in turn, padded to a whole number of bytes, most significant bit
+first (so the first cell of a row is the top bit of its first byte).
+"""
+import argparse
+import mmap
+import struct
+from typing import Iterator, Optional
+
+import cave
+
+MAGIC = b"CAVEBIT1"
+HEADER = struct.Struct("<8sQQ")   # magic, nrows, ncols
+
+# Translation tables between cells (one byte each) and
+# binary digits ('0' for air or water, '1' for stone)
+TO_DIGITS = bytes.maketrans(cave.AIR_BYTE + cave.WATER_BYTE + cave.STONE_BYTE, b"001")
+FROM_DIGITS = bytes.maketrans(b"01", cave.AIR_BYTE + cave.STONE_BYTE)
+
+
+# Vertical walls are indexed by blocks of this many rows, so that
+# rasterizing a band of rows looks only at walls in or across it
+BLOCK_ROWS = 256
+
+
+class WallSet:
+    """The walls of a cave, without its cells.
+      hwalls[row] is a list of (start_col, end_col) stone intervals in row;
+      vwalls[block] is a list of (start_row, end_row, col) stone intervals
+      that cross rows block * BLOCK_ROWS up to (block + 1) * BLOCK_ROWS.
+    Ends are exclusive.  Memory grows with the number of walls (and the
+    length of vertical walls, in blocks), not cells.
+    """
+
+    def __init__(self, nrows: int, ncols: int):
+        self.nrows = nrows
+        self.ncols = ncols
+        self.hwalls: dict[int, list[tuple[int, int]]] = {}
+        self.vwalls: dict[int, list[tuple[int, int, int]]] = {}
+
+    def add_vwall(self, row: int, col: int, length: int):
+        """Add a vertical wall to the block of each row it crosses"""
+        for block in range(row // BLOCK_ROWS, (row + length - 1) // BLOCK_ROWS + 1):
+            self.vwalls.setdefault(block, []).append((row, row + length, col))
+
+    def vwalls_in(self, first_row: int, end_row: int) -> Iterator[tuple[int, int, int]]:
+        """Each vertical wall crossing rows first_row up to end_row, once
+
+        >>> walls = WallSet(1000, 10)
+        >>> walls.add_vwall(0, 3, 600)
+        >>> walls.add_vwall(900, 4, 50)
+        >>> list(walls.vwalls_in(300, 700))
+        [(0, 600, 3)]
+        """
+        first_block = first_row // BLOCK_ROWS
+        for block in range(first_block, (end_row - 1) // BLOCK_ROWS + 1):
+            for start, end, col in self.vwalls.get(block, []):
+                # A wall is in every block it crosses; take it from
+                # the first of those that this band covers
+                if max(start // BLOCK_ROWS, first_block) == block and start < end_row and end > first_row:
+                    yield start, end, col
+
+
+def read_walls(cavern_path: str) -> WallSet:
+    """Read a cave specification one line at a time,
+    returning its walls.  Raises ValueError, with the line number,
+    for a line that is malformed or describes a wall outside the cave,
+    and also if the specification has no 'cave rows cols' line.
+
+    >>> walls = read_walls("data/cave.txt")
+    >>> walls.nrows, walls.ncols
+    (10, 10)
+    >>> walls.hwalls[6]
+    [(5, 9)]
+    >>> sorted(wall for wall in walls.vwalls[0] if wall[2] == 4)
+    [(0, 3, 4), (4, 9, 4)]
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "bad-cave.txt")
+    >>> with open(path, "w") as spec:
+    ...     _ = spec.write("cave 3 4\\nvwall 0 6 2\\n")
+    >>> read_walls(path)
+    Traceback (most recent call last):
+    ...
+    ValueError: line 2: Wall cannot start beyond right edge: 'vwall 0 6 2'
+    >>> with open(path, "w") as spec:
+    ...     _ = spec.write("\\n")
+    >>> read_walls(path)
+    Traceback (most recent call last):
+    ...
+    ValueError: no 'cave rows cols' line
+    """
+    walls = None
+    with open(cavern_path, "r") as cavern_file:
+        for line_no, line in enumerate(cavern_file, start=1):
+
+            def check(ok: bool, message: str):
+                if not ok:
+                    raise ValueError(f"line {line_no}: {message}: {line.strip()!r}")
+
+            fields = line.split()
+            if len(fields) == 0:
+                continue
+            command = fields[0]
+            if command == "cave":
+                check(len(fields) == 3, "Syntax should be 'cave rows cols'")
+                check(all(field.isdecimal() for field in fields[1:]),
+                      "Rows and columns should be positive integers")
+                walls = WallSet(int(fields[1]), int(fields[2]))
+                check(walls.nrows > 0 and walls.ncols > 0, "Rows and columns should be positive")
+            elif command in ["hwall", "vwall"]:
+                check(walls is not None, "First line should be 'cave rows cols'")
+                check(len(fields) == 4, f"Syntax '{command} startrow startcol length'")
+                check(all(field.isdecimal() for field in fields[1:]),
+                      "Row, column, and length should be integers, zero or greater")
+                row, col, length = int(fields[1]), int(fields[2]), int(fields[3])
+                check(length >= 1, "Length of wall must be at least 1")
+                check(row < walls.nrows, "Wall cannot start below floor")
+                check(col < walls.ncols, "Wall cannot start beyond right edge")
+                if command == "hwall":
+                    check(col + length <= walls.ncols, "Wall cannot extend beyond right edge")
+                    walls.hwalls.setdefault(row, []).append((col, col + length))
+                else:
+                    check(row + length <= walls.nrows, "Wall cannot extend through floor")
+                    walls.add_vwall(row, col, length)
+            else:
+                print(f"**Command not understood: '{line}'")
+    if walls is None:
+        raise ValueError("no 'cave rows cols' line")
+    return walls
+
+
+def rasterize(walls: WallSet, first_row: int = 0, end_row: Optional[int] = None) -> cave.Cave:
+    """Draw walls into a new Cave holding rows first_row up to
+    (not including) end_row of the whole cave; by default, all rows.
+    Row r of the whole cave is row r - first_row of the result.
+
+    >>> walls = read_walls("data/cave.txt")
+    >>> cave.text(rasterize(walls)) == cave.text(cave.read_cave("data/cave.txt"))
+    True
+    >>> print(cave.text(rasterize(walls, 5, 8)))
+    ------------
+    |#   # #  #|
+    |#   ######|
+    |#   #    #|
+    ------------
+    """
+    if end_row is None:
+        end_row = walls.nrows
+    band = cave.new_cave(end_row - first_row, walls.ncols)
+    for row in range(first_row, end_row):
+        for start, end in walls.hwalls.get(row, []):
+            cave.hwall(band, row - first_row, start, end - start)
+    for start, end, col in walls.vwalls_in(first_row, end_row):
+        # Clip each wall to the band
+        start = max(start, first_row)
+        end = min(end, end_row)
+        cave.vwall(band, start - first_row, col, end - start)
+    return band
+
+
+def row_bytes(ncols: int) -> int:
+    """Bytes per row of ncols cells in packed format"""
+    return (ncols + 7) // 8
+
+
+def pack_rows(cavern: cave.Cave) -> Iterator[bytes]:
+    """Each row of cavern in packed format.  Each row is converted
+    to a string of binary digits and then to an integer, so bits
+    are packed by the str and int conversions, not a loop over cells.
+
+    >>> cavern = cave.new_cave(1, 10)
+    >>> cave.hwall(cavern, 0, 0, 1)
+    >>> cave.hwall(cavern, 0, 9, 1)
+    >>> list(pack_rows(cavern))
+    [b'\\x80@']
+    """
+    n_bytes = row_bytes(cavern.ncols)
+    padding = b"0" * (8 * n_bytes - cavern.ncols)
+    for row in range(cavern.nrows):
+        start = row * cavern.ncols
+        digits = cavern.cells[start:start + cavern.ncols].translate(TO_DIGITS) + padding
+        yield int(digits, 2).to_bytes(n_bytes, "big")
+
+
+def write_packed(cavern: cave.Cave, path: str):
+    """Save cavern in packed format (stone or not, one bit per cell)"""
+    with open(path, "wb") as packed:
+        packed.write(HEADER.pack(MAGIC, cavern.nrows, cavern.ncols))
+        for packed_row in pack_rows(cavern):
+            packed.write(packed_row)
+
+
+def read_packed(path: str, first_row: int = 0, end_row: Optional[int] = None) -> cave.Cave:
+    """Load rows first_row up to (not including) end_row (by default,
+    all rows) of a cave saved by write_packed.  The file is memory-mapped,
+    so only the requested rows are read from disk.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "twisty-cave.cavebits")
+    >>> original = cave.read_cave("data/twisty-cave.txt")
+    >>> write_packed(original, path)
+    >>> cave.text(read_packed(path)) == cave.text(original)
+    True
+    >>> read_packed(path, 2, 3).row_text(0) == original.row_text(2)
+    True
+    """
+    with open(path, "rb") as packed, \
+         mmap.mmap(packed.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, nrows, ncols = HEADER.unpack_from(data, 0)
+        assert magic == MAGIC, f"{path} is not a packed cave file"
+        if end_row is None:
+            end_row = nrows
+        n_bytes = row_bytes(ncols)
+        band = cave.new_cave(end_row - first_row, ncols)
+        for row in range(first_row, end_row):
+            offset = HEADER.size + row * n_bytes
+            bits = int.from_bytes(data[offset:offset + n_bytes], "big")
+            digits = format(bits, f"0{8 * n_bytes}b")[:ncols].encode("ascii")
+            start = (row - first_row) * ncols
+            band.cells[start:start + ncols] = digits.translate(FROM_DIGITS)
+    return band
+
+
+def packed_shape(path: str) -> tuple[int, int]:
+    """(nrows, ncols) of a packed cave file, from its header"""
+    with open(path, "rb") as packed:
+        magic, nrows, ncols = HEADER.unpack(packed.read(HEADER.size))
+    assert magic == MAGIC, f"{path} is not a packed cave file"
+    return (nrows, ncols)
+
+
+def main():
+    """Convert a cave specification to packed format, a band at a time"""
+    parser = argparse.ArgumentParser("Convert cave specification to packed format")
+    parser.add_argument("spec", help="Cave specification (cave/hwall/vwall lines)")
+    parser.add_argument("packed", help="Packed cave file to write")
+    parser.add_argument("--band", dest="band", type=int, default=1024,
+        help="Rows to rasterize at a time")
+    args = parser.parse_args()
+    walls = read_walls(args.spec)
+    with open(args.packed, "wb") as packed:
+        packed.write(HEADER.pack(MAGIC, walls.nrows, walls.ncols))
+        for first_row in range(0, walls.nrows, args.band):
+            band = rasterize(walls, first_row, min(first_row + args.band, walls.nrows))
+            for packed_row in pack_rows(band):
+                packed.write(packed_row)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,81 @@
-"""A graphical display of a cave represented as a rectangular grid of characters"""
+"""A graphical display of a cave represented as a rectangular grid of characters.
+
+The display can instead record what it would draw (see display), to
+be rendered later into frames or an animated GIF (see render_log).
+"""
 import graphics.grid
 import graphics.grid as grid_view
+import graphics.raster
+import graphics.recorder
+import re
+from typing import Optional
 
 import cave
 
+# Matches a horizontal run of stone, or of water, in Cave.cells
+STONE_OR_WATER_RUN = re.compile(re.escape(cave.STONE_BYTE) + b"+|"
+                                + re.escape(cave.WATER_BYTE) + b"+")
+
 # Size of displayed grid;
 # n_rows == 0 is also interpreted as "there is no current display"
 #
 n_rows = 0
 n_cols = 0
 
+# Drawing in a window ("tk") or off-screen into image files ("raster")
+backend = "tk"
+
+# Log of drawing operations, when recording instead of drawing
+recording: Optional[graphics.recorder.Recorder] = None
+
 # Water color can be changed, e.g., as we
 # move from chamber to chamber
 current_water = graphics.grid.get_cur_color()
 
 
-def display(cavern: list[list[str]], width: int, height: int):
+def display(cavern: cave.Cave, width: int, height: int,
+            display_backend: str = "tk", frame_pattern: Optional[str] = None,
+            record_path: Optional[str] = None):
     """Create a graphical representation of cave using the grid.
     This graphical representation can be further manipulated
     (e.g., filling cave cells with water of various colors)
-    with fill_cell.
+    with fill_cell.  With display_backend "raster", the display is
+    drawn off-screen and saved as image files named by frame_pattern
+    (see graphics.grid.make).  With record_path, nothing is drawn;
+    instead the log at record_path gets the size of the cave, then
+    its stone and water, then each fill as it happens, with its time.
+    Events are written to the log as they come, and prompt_to_close
+    finishes it.
     """
-    global n_rows, n_cols
-    n_rows = len(cavern)
-    n_cols = len(cavern[0])
-    grid_view.make(n_rows, n_cols, width, height)
+    global n_rows, n_cols, backend, recording
+    n_rows = cavern.nrows
+    n_cols = cavern.ncols
+    if record_path:
+        # The header has just the size; the cave's stone and water
+        # are logged as runs of cells at time 0, like any other event
+        recording = graphics.recorder.Recorder(record_path,
+            {"view": "cave_view", "width": width, "height": height,
+             "rows": n_rows, "cols": n_cols})
+        for row in range(n_rows):
+            row_start = row * n_cols
+            for run in STONE_OR_WATER_RUN.finditer(cavern.cells, row_start, row_start + n_cols):
+                length = run.end() - run.start()
+                if run.group()[:1] == cave.STONE_BYTE:
+                    recording.record("stone", row, run.start() - row_start, length, at=0.0)
+                else:
+                    recording.record("span", row, run.start() - row_start, length,
+                                     current_water, at=0.0)
+        return
+    backend = display_backend
+    grid_view.make(n_rows, n_cols, width, height,
+                   backend=display_backend, frame_pattern=frame_pattern)
     for row in range(n_rows):
         for col in range(n_cols):
-            if cavern[row][col] == cave.STONE:
+            if cavern[row, col] == cave.STONE:
                 grid_view.fill_cell(row, col, grid_view.black)
-            elif cavern[row][col] == cave.WATER:
+            elif cavern[row, col] == cave.WATER:
                 grid_view.fill_cell(row, col, current_water)
-    return
+    grid_view.flush()
 
 
 def change_water():
@@ -49,17 +93,76 @@ def fill_cell(row: int, col: int):
         return
     assert 0 <= row < n_rows, f"Row must be in range 0..{n_rows - 1} "
     assert 0 <= col < n_cols, f"Column must be in range 0..{n_cols - 1}"
+    if recording:
+        recording.record("fill", row, col, current_water)
+        return
     grid_view.fill_cell(row, col, color=current_water)
 
 
+def fill_span(row: int, col: int, length: int):
+    """Fill display of cave[row][col] and the length - 1 cells
+    to its right with current colored water
+    """
+    if n_rows == 0:
+        return
+    if recording:
+        recording.record("span", row, col, length, current_water)
+        return
+    for i in range(length):
+        fill_cell(row, col + i)
+
+
 def prompt_to_close():
-    """Prompt the user before closing the display"""
-    input("Press enter to close display")
-    grid_view.win.close()
+    """Prompt the user before closing the display
+    (no prompt for an off-screen display, which is just saved,
+    or when recording, which finishes the log)
+    """
+    global n_rows, n_cols, recording
+    if recording:
+        recording.close()
+        recording = None
+    else:
+        grid_view.flush()
+        if backend == "tk":
+            input("Press enter to close display")
+        grid_view.close()
     n_rows = 0
     n_cols = 0
 
 
+def render_log(log_path: str, fps: float = 30, slowdown: float = 1.0,
+               frame_pattern: Optional[str] = None,
+               gif_path: Optional[str] = None) -> int:
+    """Render a log recorded by display (with record_path) into
+    numbered frames and/or an animated GIF, returning the number
+    of frames (see graphics.recorder.render).
+    """
+    def start(header: dict):
+        cavern = cave.new_cave(header["rows"], header["cols"])
+        display(cavern, header["width"], header["height"], display_backend="raster")
+
+    def apply(event: list):
+        _, operation, row, col, *args = event
+        if operation == "fill":
+            grid_view.fill_cell(row, col, args[0])
+        elif operation == "stone":
+            for i in range(args[0]):
+                grid_view.fill_cell(row, col + i, grid_view.black)
+        else:
+            length, color = args
+            for i in range(length):
+                grid_view.fill_cell(row, col + i, color)
+
+    def finish_frame() -> graphics.raster.Raster:
+        grid_view.flush()
+        return grid_view.win.raster
+
+    n_frames = graphics.recorder.render(log_path, start, apply, finish_frame,
+                                        fps, slowdown, frame_pattern, gif_path)
+    prompt_to_close()
+    return n_frames
+
+
 
 
 
@@ -0,0 +1,579 @@
+"""Chamber labeling by union-find, an alternative to flood fill.
+
+Instead of flooding each chamber in turn, label_chambers makes one
+pass over the cave, row by row.  Each horizontal run of air gets a
+provisional label, and runs that touch a run in the row above are
+joined into the same set with union-find.  A second pass over the
+runs (not the cells) gives every chamber its final label, numbered
+1, 2, ... in the order the chambers are first seen scanning from the
+top left, the same order in which flood.scan_cave fills them.
+
+No recursion, and no cell is examined more than once.
+
+label_chambers_scipy does the same job with array operations from
+NumPy and SciPy, if they are installed.  Both engines can treat
+diagonal neighbors as connected (connectivity 8) as well as just
+horizontal and vertical neighbors (connectivity 4, as in flood fill).
+
+label_chambers_tiled splits a large cave into tiles (bands of whole
+rows), labels the tiles in parallel worker processes, and then joins
+chambers that cross tile edges with union-find.  The cave is placed
+in shared memory once, and each worker labels its own tile there,
+in place, without copying it.
+
+ChamberTracker keeps the chamber count of a cave up to date as walls
+are added and removed, without labeling the whole cave again.
+"""
+import doctest
+import multiprocessing
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional
+
+import cave
+
+
+class Chambers:
+    """Result of labeling the chambers of a cave.
+      count:   number of chambers
+      labels:  chamber label of each cell, in the same row-major order
+               as Cave.cells; 0 for cells that are not air.  None if
+               the label map was not requested.
+      sizes:   sizes[k] is the number of cells in chamber k (sizes[0] is 0)
+      boxes:   boxes[k] is the bounding box of chamber k, as
+               (top_row, left_col, bottom_row, right_col), inclusive
+               (boxes[0] is None)
+    """
+
+    def __init__(self, count: int, labels: array,
+                 sizes: list[int], boxes: list[tuple[int, int, int, int]]):
+        self.count = count
+        self.labels = labels
+        self.sizes = sizes
+        self.boxes = boxes
+
+
+class UnionFind:
+    """Disjoint sets of the integers 0 .. n-1, growing as needed"""
+
+    def __init__(self):
+        self.parent = array("i")
+
+    def make_set(self) -> int:
+        """Add a new singleton set and return its element"""
+        element = len(self.parent)
+        self.parent.append(element)
+        return element
+
+    def find(self, element: int) -> int:
+        """The representative of the set containing element"""
+        parent = self.parent
+        while parent[element] != element:
+            # Path halving keeps later finds short
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+        return element
+
+    def union(self, a: int, b: int) -> int:
+        """Merge the sets containing a and b; return the
+        new representative (the smaller of the two old ones)
+        """
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a < root_b:
+            self.parent[root_b] = root_a
+            return root_a
+        self.parent[root_a] = root_b
+        return root_b
+
+
+def label_chambers(cavern: cave.Cave, label_map: bool = True,
+                   connectivity: int = 4) -> Chambers:
+    """Label the chambers (connected regions of air) of cavern.
+    Pass label_map=False to skip building the per-cell label
+    map, which takes 4 bytes per cell.  With connectivity 8,
+    cells that touch only at a corner are in the same chamber.
+
+    >>> chambers = label_chambers(cave.read_cave("data/cave.txt"))
+    >>> chambers.count
+    3
+    >>> chambers.sizes
+    [0, 30, 10, 8]
+    >>> chambers.boxes[1:]
+    [(1, 1, 8, 5), (1, 7, 5, 8), (7, 5, 8, 8)]
+    >>> chambers.labels[11:20]
+    array('i', [1, 1, 1, 0, 1, 0, 2, 2, 0])
+
+    >>> diagonal = cave.new_cave(2, 2)
+    >>> diagonal[0, 1] = cave.STONE
+    >>> diagonal[1, 0] = cave.STONE
+    >>> label_chambers(diagonal).count
+    2
+    >>> label_chambers(diagonal, connectivity=8).count
+    1
+    """
+    runs, sizes, boxes = label_runs(cavern, connectivity)
+    labels = None
+    if label_map:
+        labels = array("i", bytes(4 * cavern.nrows * cavern.ncols))
+        for row, start, end, chamber in runs:
+            row_start = row * cavern.ncols
+            labels[row_start + start:row_start + end] = array("i", [chamber]) * (end - start)
+    return Chambers(len(sizes) - 1, labels, sizes, boxes)
+
+
+def label_runs(cavern: cave.Cave, connectivity: int = 4,
+               first_row: int = 0, end_row: Optional[int] = None) -> tuple[list, list, list]:
+    """The work of label_chambers, without the label map:  returns
+    (runs, sizes, boxes), where runs lists each horizontal run of air
+    as (row, start_col, end_col, chamber), end_col exclusive, in
+    scanning order, and sizes and boxes are as in Chambers.  Only rows
+    first_row up to end_row (by default, the last row) are labeled,
+    as if they were the whole cave; rows are still numbered as in
+    the whole cave.
+
+    >>> runs, sizes, boxes = label_runs(cave.read_cave("data/cave.txt"))
+    >>> runs[:3]
+    [(1, 1, 4, 1), (1, 5, 6, 1), (1, 7, 9, 2)]
+    >>> runs, sizes, boxes = label_runs(cave.read_cave("data/cave.txt"), 4, 5, 9)
+    >>> runs[:3]
+    [(5, 1, 4, 1), (5, 5, 6, 2), (5, 7, 9, 3)]
+    >>> boxes[1:]
+    [(5, 1, 8, 3), (5, 5, 5, 5), (5, 7, 5, 8), (7, 5, 8, 8)]
+    """
+    assert connectivity in [4, 8], "Connectivity must be 4 or 8"
+    # A run touches runs above that overlap it, or with 8-connectivity,
+    # that overlap it once widened by one cell on each side
+    reach = 0 if connectivity == 4 else 1
+    sets = UnionFind()
+
+    # First pass:  provisional label for each run, joining runs that
+    # overlap a run of the row above.  Runs are (row, start, end, label).
+    runs = []
+    above = []
+    if end_row is None:
+        end_row = cavern.nrows
+    for row in range(first_row, end_row):
+        current = []
+        above_i = 0
+        for start, end in cave.air_runs(cavern, row):
+            # Skip runs above that end before this one starts
+            while above_i < len(above) and above[above_i][2] + reach <= start:
+                above_i += 1
+            label = -1
+            touching = above_i
+            while touching < len(above) and above[touching][1] < end + reach:
+                if label < 0:
+                    label = sets.find(above[touching][3])
+                else:
+                    label = sets.union(label, above[touching][3])
+                touching += 1
+            if label < 0:
+                label = sets.make_set()
+            run = (row, start, end, label)
+            current.append(run)
+            runs.append(run)
+        above = current
+
+    # Second pass:  final labels, sizes, and bounding boxes
+    final = {}
+    sizes = [0]
+    boxes = [None]
+    for run_i, (row, start, end, label) in enumerate(runs):
+        root = sets.find(label)
+        chamber = final.get(root)
+        if chamber is None:
+            chamber = len(sizes)
+            final[root] = chamber
+            sizes.append(0)
+            boxes.append((row, start, row, end - 1))
+        sizes[chamber] += end - start
+        top, left, bottom, right = boxes[chamber]
+        boxes[chamber] = (top, min(left, start), row, max(right, end - 1))
+        runs[run_i] = (row, start, end, chamber)
+
+    return runs, sizes, boxes
+
+
+def label_chambers_scipy(cavern: cave.Cave, connectivity: int = 4) -> Chambers:
+    """Label the chambers of cavern like label_chambers, with the same
+    chamber numbering, but using scipy.ndimage.label on a boolean
+    array view of the cave.  labels is a flat NumPy array of int32.
+    Requires NumPy and SciPy, which are otherwise not needed.
+
+    Gives the same count, sizes, boxes, and labels as label_chambers
+    on every cave in data/, with either connectivity (the check
+    passes trivially if SciPy is not installed):
+
+    >>> import glob
+    >>> try:
+    ...     import scipy
+    ... except ImportError:
+    ...     scipy = None
+    >>> def same(path, connectivity):
+    ...     cavern = cave.read_cave(path)
+    ...     ours = label_chambers(cavern, connectivity=connectivity)
+    ...     theirs = label_chambers_scipy(cavern, connectivity)
+    ...     return ((ours.count, ours.sizes, ours.boxes, ours.labels.tolist())
+    ...             == (theirs.count, theirs.sizes, theirs.boxes, theirs.labels.tolist()))
+    >>> scipy is None or all(same(path, connectivity)
+    ...                      for path in sorted(glob.glob("data/*.txt"))
+    ...                      for connectivity in [4, 8])
+    True
+    """
+    assert connectivity in [4, 8], "Connectivity must be 4 or 8"
+    try:
+        import numpy
+        from scipy import ndimage
+    except ImportError as err:
+        raise ImportError("label_chambers_scipy needs numpy and scipy "
+                          "(pip install numpy scipy)") from err
+
+    # A view of the cave's own bytes, not a copy
+    grid = numpy.frombuffer(cavern.cells, dtype=numpy.uint8)
+    air = (grid == cave.AIR_BYTE[0]).reshape(cavern.nrows, cavern.ncols)
+    # Rank 1 structure is the 4 neighbors; rank 2 adds the diagonals
+    structure = ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+    labels, count = ndimage.label(air, structure=structure, output=numpy.int32)
+
+    sizes = numpy.bincount(labels.ravel(), minlength=count + 1)
+    sizes[0] = 0
+    boxes = [None]
+    for rows, cols in ndimage.find_objects(labels):
+        boxes.append((rows.start, cols.start, rows.stop - 1, cols.stop - 1))
+    return Chambers(count, labels.ravel(), sizes.tolist(), boxes)
+
+
+def _label_tile(shm_name: str, n_cols: int, first_row: int, end_row: int,
+                connectivity: int) -> tuple[list, list, list, list]:
+    """Label rows first_row up to end_row of the cave in shared memory
+    shm_name, reading the shared memory in place (the tile is not
+    copied).  Returns (sizes, boxes, top_runs, bottom_runs), with boxes
+    in rows of the whole cave and top_runs, bottom_runs the
+    (start, end, chamber) runs of the first and last rows of the tile.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        whole = cave.Cave(0, n_cols)
+        whole.nrows = end_row
+        whole.cells = shm.buf
+        runs, sizes, boxes = label_runs(whole, connectivity, first_row, end_row)
+        # No reference to the shared memory may outlive it
+        del whole
+    finally:
+        shm.close()
+    last_row = end_row - 1
+    top_runs = [(start, end, chamber) for row, start, end, chamber in runs if row == first_row]
+    bottom_runs = [(start, end, chamber) for row, start, end, chamber in runs if row == last_row]
+    return sizes, boxes, top_runs, bottom_runs
+
+
+def label_chambers_tiled(cavern: cave.Cave, tile_rows: int = 1024,
+                         workers: Optional[int] = None,
+                         connectivity: int = 4) -> Chambers:
+    """Label the chambers of cavern like label_chambers, with the same
+    count, sizes, boxes, and numbering, but in parallel:  tiles of
+    tile_rows rows are labeled by a pool of workers processes (by
+    default, one per CPU).  No label map is built (labels is None).
+
+    >>> cavern = cave.read_cave("data/twisty-cave.txt")
+    >>> tiled = label_chambers_tiled(cavern, tile_rows=3, workers=2)
+    >>> tiled.count
+    7
+    >>> whole = label_chambers(cavern, label_map=False)
+    >>> (tiled.sizes, tiled.boxes) == (whole.sizes, whole.boxes)
+    True
+    """
+    assert connectivity in [4, 8], "Connectivity must be 4 or 8"
+    assert tile_rows > 0, "Tiles must have at least one row"
+    reach = 0 if connectivity == 4 else 1
+    n_cols = cavern.ncols
+    tiles = [(first_row, min(first_row + tile_rows, cavern.nrows))
+             for first_row in range(0, cavern.nrows, tile_rows)]
+    if not tiles or n_cols == 0:
+        return Chambers(0, None, [0], [None])
+
+    shm = shared_memory.SharedMemory(create=True, size=len(cavern.cells))
+    try:
+        shm.buf[:len(cavern.cells)] = cavern.cells
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(
+                _label_tile,
+                [(shm.name, n_cols, first_row, end_row, connectivity)
+                 for first_row, end_row in tiles])
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Chamber k of tile t is element offsets[t] + k - 1 of sets
+    sets = UnionFind()
+    offsets = []
+    for sizes, _, _, _ in results:
+        offsets.append(len(sets.parent))
+        for _ in range(len(sizes) - 1):
+            sets.make_set()
+
+    # Join chambers whose runs touch across each edge between tiles
+    for tile_i in range(1, len(results)):
+        above = results[tile_i - 1][3]
+        above_offset = offsets[tile_i - 1] - 1
+        offset = offsets[tile_i] - 1
+        above_i = 0
+        for start, end, chamber in results[tile_i][2]:
+            while above_i < len(above) and above[above_i][1] + reach <= start:
+                above_i += 1
+            touching = above_i
+            while touching < len(above) and above[touching][0] < end + reach:
+                sets.union(offset + chamber, above_offset + above[touching][2])
+                touching += 1
+
+    # Number the joined chambers in order of first appearance:  tile
+    # by tile, and within a tile in its own order, which is scanning order
+    final = {}
+    sizes = [0]
+    boxes = [None]
+    for tile_i, (tile_sizes, tile_boxes, _, _) in enumerate(results):
+        for chamber in range(1, len(tile_sizes)):
+            root = sets.find(offsets[tile_i] + chamber - 1)
+            joined = final.get(root)
+            if joined is None:
+                joined = len(sizes)
+                final[root] = joined
+                sizes.append(0)
+                boxes.append(tile_boxes[chamber])
+            sizes[joined] += tile_sizes[chamber]
+            top, left, bottom, right = boxes[joined]
+            tile_top, tile_left, tile_bottom, tile_right = tile_boxes[chamber]
+            boxes[joined] = (min(top, tile_top), min(left, tile_left),
+                             max(bottom, tile_bottom), max(right, tile_right))
+    return Chambers(len(sizes) - 1, None, sizes, boxes)
+
+
+class ChamberTracker:
+    """Chambers of a cave that is being edited.  The cave must be
+    edited through the tracker (add_hwall, remove_vwall, etc.) so
+    that count stays correct.
+
+    Every air cell has a set element of a UnionFind (0 for cells
+    that are not air), and cells are in the same chamber exactly when
+    their elements are in the same set.  Removing a wall can only join
+    chambers, which is a union.  Adding a wall can split a chamber,
+    which union-find cannot undo, so the cells of each piece that
+    splits off are given a new element.  Only the pieces that split
+    off are searched, never the whole cave.
+
+    >>> cavern = cave.read_cave("data/cave.txt")
+    >>> tracker = ChamberTracker(cavern)
+    >>> tracker.count
+    3
+    >>> tracker.add_hwall(4, 1, 3)     # Split the big chamber
+    4
+    >>> tracker.remove_vwall(1, 6, 5)  # Join the right chamber to it
+    3
+    >>> tracker.count == label_chambers(cavern, label_map=False).count
+    True
+    >>> tracker.add_vwall(8, 2, 3)     # Through the floor:  no change
+    Traceback (most recent call last):
+    ...
+    IndexError: Wall from (8, 2) of length 3 is outside the 10x10 cave
+    >>> tracker.count, cavern[8, 2]
+    (3, ' ')
+    """
+
+    def __init__(self, cavern: cave.Cave, connectivity: int = 4):
+        self.cavern = cavern
+        self.n_cols = cavern.ncols
+        chambers = label_chambers(cavern, True, connectivity)
+        self.count = chambers.count
+        self.labels = chambers.labels
+        # Set element k is chamber k of the initial labeling
+        self.sets = UnionFind()
+        for _ in range(chambers.count + 1):
+            self.sets.make_set()
+        # Size of each chamber, by representative element
+        self.sizes = {chamber: size for chamber, size in enumerate(chambers.sizes) if size}
+        self.offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if connectivity == 8:
+            self.offsets += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        else:
+            assert connectivity == 4, "Connectivity must be 4 or 8"
+
+    def chamber(self, row: int, col: int) -> int:
+        """An identifier for the chamber containing cavern[row, col],
+        the same for every cell of the chamber until the next edit,
+        or 0 if the cell is not air
+        """
+        element = self.labels[row * self.n_cols + col]
+        return self.sets.find(element) if element else 0
+
+    def size(self, row: int, col: int) -> int:
+        """Number of cells in the chamber containing cavern[row, col]"""
+        return self.sizes.get(self.chamber(row, col), 0)
+
+    def add_hwall(self, row: int, col: int, length: int) -> int:
+        """cave.hwall, then return the new chamber count"""
+        return self._add_stone(self._wall(row, col, length, down=False))
+
+    def add_vwall(self, row: int, col: int, length: int) -> int:
+        """cave.vwall, then return the new chamber count"""
+        return self._add_stone(self._wall(row, col, length, down=True))
+
+    def remove_hwall(self, row: int, col: int, length: int) -> int:
+        """cave.remove_hwall, then return the new chamber count"""
+        return self._add_air(self._wall(row, col, length, down=False))
+
+    def remove_vwall(self, row: int, col: int, length: int) -> int:
+        """cave.remove_vwall, then return the new chamber count"""
+        return self._add_air(self._wall(row, col, length, down=True))
+
+    def _wall(self, row: int, col: int, length: int, down: bool) -> list[int]:
+        """Positions of the cells of a wall, going right or down.  Raises
+        IndexError, as cave.hwall and cave.vwall do, if any of it is
+        outside the cave; nothing has been changed yet at that point.
+        """
+        start = cave._wall_start(self.cavern, row, col, length, down)
+        step = self.n_cols if down else 1
+        return list(range(start, start + length * step, step))
+
+    def _neighbors(self, pos: int) -> list[int]:
+        """Positions of the air cells connected to the cell at pos"""
+        row, col = divmod(pos, self.n_cols)
+        n_rows = self.cavern.nrows
+        cells = self.cavern.cells
+        air = cave.AIR_BYTE[0]
+        found = []
+        for d_row, d_col in self.offsets:
+            row_i = row + d_row
+            col_i = col + d_col
+            if 0 <= row_i < n_rows and 0 <= col_i < self.n_cols:
+                neighbor = row_i * self.n_cols + col_i
+                if cells[neighbor] == air:
+                    found.append(neighbor)
+        return found
+
+    def _add_air(self, positions: list[int]) -> int:
+        """Turn the cells at positions into air, joining
+        the chambers around them
+        """
+        cells = self.cavern.cells
+        air = cave.AIR_BYTE[0]
+        for pos in positions:
+            if cells[pos] == air:
+                continue
+            cells[pos] = air
+            element = self.sets.make_set()
+            self.labels[pos] = element
+            self.sizes[element] = 1
+            self.count += 1
+            for neighbor in self._neighbors(pos):
+                root = self.sets.find(element)
+                other = self.sets.find(self.labels[neighbor])
+                if root != other:
+                    joined = self.sets.union(root, other)
+                    self.sizes[joined] = self.sizes.pop(root) + self.sizes.pop(other)
+                    self.count -= 1
+        return self.count
+
+    def _add_stone(self, positions: list[int]) -> int:
+        """Turn the cells at positions into stone, splitting
+        the chambers around them if they are cut in two (or more)
+        """
+        cells = self.cavern.cells
+        air = cave.AIR_BYTE[0]
+        stone = cave.STONE_BYTE[0]
+        # Remove the cells from their chambers
+        touched = set()
+        for pos in positions:
+            if cells[pos] != air:
+                cells[pos] = stone
+                continue
+            cells[pos] = stone
+            root = self.sets.find(self.labels[pos])
+            self.labels[pos] = 0
+            self.sizes[root] -= 1
+            if self.sizes[root] == 0:
+                del self.sizes[root]
+                self.count -= 1
+            touched.add(root)
+        # The air cells next to the new stone, by chamber.  A chamber
+        # with only one such cell cannot have been cut apart.
+        seeds = {}
+        for pos in positions:
+            for neighbor in self._neighbors(pos):
+                root = self.sets.find(self.labels[neighbor])
+                if root in touched:
+                    seeds.setdefault(root, set()).add(neighbor)
+        for root, chamber_seeds in seeds.items():
+            if len(chamber_seeds) > 1:
+                self._split(root, list(chamber_seeds))
+        return self.count
+
+    def _split(self, root: int, seeds: list[int]):
+        """Search out from each seed in turn, one cell at a time, until
+        at most one search is still going.  Searches that meet are part
+        of the same piece and are combined.  A search that runs out of
+        cells has found all of a piece, which becomes a new chamber; the
+        last search still going keeps the old chamber, unexplored.
+        """
+        # Search i has visited[cell] = i and a queue of cells to expand;
+        # merged tracks searches that have been combined
+        merged = UnionFind()
+        queues = []
+        visited = {}
+        for seed in seeds:
+            search = merged.make_set()
+            queues.append([seed])
+            visited[seed] = search
+        active = set(range(len(seeds)))
+        done = []
+        while len(active) > 1:
+            for search in list(active):
+                if search not in active:
+                    continue
+                queue = queues[search]
+                if not queue:
+                    active.discard(search)
+                    done.append(search)
+                    if len(active) <= 1:
+                        break
+                    continue
+                pos = queue.pop()
+                for neighbor in self._neighbors(pos):
+                    other = visited.get(neighbor)
+                    if other is None:
+                        visited[neighbor] = search
+                        queue.append(neighbor)
+                        continue
+                    other = merged.find(other)
+                    if other != search:
+                        # Combine the two searches into the survivor
+                        survivor = merged.union(search, other)
+                        absorbed = other if survivor == search else search
+                        queues[survivor].extend(queues[absorbed])
+                        queues[absorbed] = []
+                        active.discard(absorbed)
+                        search = survivor
+                        queue = queues[search]
+        if not active:
+            # Every piece was searched completely; the last keeps the chamber
+            active.add(done.pop())
+        if not done:
+            return
+
+        # Each finished search is a new chamber
+        pieces = {search: [] for search in done}
+        for pos, search in visited.items():
+            search = merged.find(search)
+            if search in pieces:
+                pieces[search].append(pos)
+        for cells in pieces.values():
+            element = self.sets.make_set()
+            for pos in cells:
+                self.labels[pos] = element
+            self.sizes[element] = len(cells)
+            self.sizes[root] -= len(cells)
+            self.count += 1
+
+
+if __name__ == "__main__":
+    doctest.testmod()
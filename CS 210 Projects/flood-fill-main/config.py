@@ -1,3 +1,24 @@
 CAVE_PATH = 'data/twisty-cave.txt'
 WIN_WIDTH = 500
 WIN_HEIGHT = 500
+# Draw in a window ("tk"), or off-screen ("raster"), saving
+# frames as PNG (or PPM) files named by FRAME_PATTERN
+DISPLAY_BACKEND = "tk"
+FRAME_PATTERN = "frames/cave-{:05d}.png"
+# Or record the drawing, without drawing it, in a log to be rendered
+# later (python3 -m graphics.recorder), e.g., "cave.log.gz"; None to draw
+RECORD_PATH = None
+
+# How flood.scan_cave counts chambers:
+#   "fill":   flood each chamber with water in turn (animated)
+#   "label":  label all chambers in one union-find pass (no display)
+#   "scipy":  label all chambers with scipy.ndimage (needs numpy, scipy)
+#   "tiled":  label tiles of the cave in parallel processes, then join them
+SCAN_METHOD = "fill"
+# Rows per tile, and number of worker processes (None for one
+# per CPU), for the "tiled" scan method
+TILE_ROWS = 1024
+SCAN_WORKERS = None
+# Are cells touching only at a corner connected (8) or not (4)?
+# Only the labeling methods support 8.
+CONNECTIVITY = 4
@@ -4,57 +4,141 @@ Josh Jilot, 10/25
 Credits: Just me :)
 """
 import doctest
+from typing import Callable, Optional
 
 import config
 import cave
 import cave_view
+import chambers
 
-def scan_cave(cavern: list[list[str]]) -> int:
+def scan_cave(cavern: cave.Cave, method: str = config.SCAN_METHOD,
+              connectivity: int = config.CONNECTIVITY) -> int:
     """
     Scan the cave for air pockets.  Return the number of
     air pockets encountered.
 
+    With method "fill", each air pocket is flooded with water in turn
+    (and shown on the display, if any).  With method "label", chambers
+    are counted by chambers.label_chambers in one pass, leaving the
+    cave unchanged; "scipy" is the same but uses array operations
+    (chambers.label_chambers_scipy), and "tiled" splits the cave into
+    tiles of config.TILE_ROWS rows labeled in parallel by
+    config.SCAN_WORKERS processes (chambers.label_chambers_tiled).
+    The labeling methods can
+    also count diagonally connected cells as one chamber
+    (connectivity 8); filling is always 4-connected.
+
     >>> cavern_1 = cave.read_cave("data/tiny-cave.txt")
     >>> scan_cave(cavern_1)
     1
     >>> cavern_2 = cave.read_cave("data/cave.txt")
     >>> scan_cave(cavern_2)
     3
+    >>> scan_cave(cave.new_cave(500, 500))  # Far deeper than recursion allows
+    1
+    >>> scan_cave(cave.read_cave("data/cave.txt"), method="label")
+    3
+    >>> scan_cave(cave.read_cave("data/cave.txt"), method="label", connectivity=8)
+    3
+    >>> scan_cave(cave.read_cave("data/twisty-cave.txt"), method="tiled")
+    7
     """
+    if method == "label":
+        return chambers.label_chambers(cavern, False, connectivity).count
+    if method == "scipy":
+        return chambers.label_chambers_scipy(cavern, connectivity).count
+    if method == "tiled":
+        return chambers.label_chambers_tiled(cavern, config.TILE_ROWS, config.SCAN_WORKERS,
+                                             connectivity).count
+    assert method == "fill", f"Unknown scan method '{method}'"
+    assert connectivity == 4, "Flood fill counts 4-connected chambers only"
+
     air_pockets = 0
-    for row_i in range(len(cavern)):
-        for col_i in range(len(cavern[0])):
-            if cavern[row_i][col_i] == cave.AIR:
-                air_pockets += 1
-                fill(cavern, row_i, col_i)
-                cave_view.change_water()
+    cells = cavern.cells
+    pos = cells.find(cave.AIR_BYTE)
+    while pos >= 0:
+        air_pockets += 1
+        row_i, col_i = divmod(pos, cavern.ncols)
+        fill(cavern, row_i, col_i)
+        cave_view.change_water()
+        pos = cells.find(cave.AIR_BYTE, pos + 1)
 
     return air_pockets
 
-def fill(cavern: list[list[str]], row_i: int, col_i: int):
+def fill(cavern: cave.Cave, row_i: int, col_i: int,
+         fill_span: Optional[Callable[[int, int, int], None]] = cave_view.fill_span):
     """
-    Fill the whole chamber around cavern[row_i][col_i] with water
-    """    
-
-    if (row_i < len(cavern) and row_i >= 0
-    and col_i < len(cavern[0]) and col_i >= 0
-    and cavern[row_i][col_i] == cave.AIR):
-        
-        cavern[row_i][col_i] = cave.WATER
-        cave_view.fill_cell(row_i, col_i)
-
-        fill(cavern, row_i + 1, col_i)
-        fill(cavern, row_i - 1, col_i)
-        fill(cavern, row_i, col_i + 1)
-        fill(cavern, row_i, col_i - 1)
-    else:
- 
-        return 
+    Fill the whole chamber around cavern[row_i, col_i] with water.
+
+    Works one horizontal span of air at a time:  fill the span containing
+    a seed cell, then look for air in the rows directly above and below
+    the span, remembering one seed cell for each run of air found there.
+    Seeds are kept on a list rather than the call stack, so a chamber can
+    be as large as the cave.  After each span is filled, fill_span(row,
+    col, length) is called (as for cave.hwall) to animate the fill; pass
+    None to skip the display entirely.
+
+    Cells are found and filled with bytearray searches and slice
+    assignment on cavern.cells, rather than one cell at a time.
+
+    >>> cavern = cave.read_cave("data/cave.txt")
+    >>> fill(cavern, 1, 1, None)
+    >>> print(cave.text(cavern))
+    ------------
+    |##########|
+    |#~~~#~#  #|
+    |#~~~#~#  #|
+    |#~~~~~#  #|
+    |#~~~#~#  #|
+    |#~~~#~#  #|
+    |#~~~######|
+    |#~~~#    #|
+    |#~~~#    #|
+    |##########|
+    ------------
+    """
+    n_rows = cavern.nrows
+    n_cols = cavern.ncols
+    cells = cavern.cells
+    air = cave.AIR_BYTE[0]
+    if not (0 <= row_i < n_rows and 0 <= col_i < n_cols):
+        return
+    seeds = [row_i * n_cols + col_i]
+    while seeds:
+        pos = seeds.pop()
+        if cells[pos] != air:
+            # Out of the chamber, or filled since it was seeded
+            continue
+        row_i = pos // n_cols
+        row_start = row_i * n_cols
+        row_end = row_start + n_cols
+
+        # Widen to the whole span of air and fill it
+        left = pos
+        while left > row_start and cells[left - 1] == air:
+            left -= 1
+        wall = cave.NOT_AIR.search(cells, pos, row_end)
+        right = wall.start() if wall else row_end
+        cells[left:right] = cave.WATER_BYTE * (right - left)
+        if fill_span:
+            fill_span(row_i, left - row_start, right - left)
+
+        # One seed for each run of air just above or below the span
+        for offset in [-n_cols, n_cols]:
+            if 0 <= row_start + offset < len(cells):
+                col = cells.find(cave.AIR_BYTE, left + offset, right + offset)
+                while col >= 0:
+                    seeds.append(col)
+                    wall = cave.NOT_AIR.search(cells, col, right + offset)
+                    if not wall:
+                        break
+                    col = cells.find(cave.AIR_BYTE, wall.start(), right + offset)
 
 def main():
     doctest.testmod()
     cavern = cave.read_cave(config.CAVE_PATH)
-    cave_view.display(cavern, config.WIN_WIDTH, config.WIN_HEIGHT)
+    cave_view.display(cavern, config.WIN_WIDTH, config.WIN_HEIGHT,
+                      config.DISPLAY_BACKEND, config.FRAME_PATTERN, config.RECORD_PATH)
     chambers = scan_cave(cavern)
     print(f"Found {chambers} chambers")
     cave_view.prompt_to_close()
@@ -15,9 +15,19 @@ Uses the simple graphics module provided by Zelle, which in turn
 is built on the Tk graphics package (and which should therefore be 
 available on all major Python platforms, including Linux, Mac, and 
 all flavors of Windows at least back to XP). 
+
+Cell fills are batched:  each cell has one canvas item, created the
+first time the cell is filled and recolored after that, and fill_cell
+only queues the new color.  Queued colors are drawn together, at most
+max_fps times a second (see make), or when flush is called.  Filling
+the same cell again before it is drawn just replaces the queued color.
+
+The grid can also be drawn off-screen, without Tk, into an image
+(see graphics.raster); pass backend="raster" to make.
 """
+import time
 
-from graphics.graphics import *    # Zelle's simple OO graphics
+from graphics.raster import color_rgb, RasterCanvas
 
 global win  # The window we are drawing the grid in
 global cell_width, cell_height  # The size of a cell in the grid
@@ -42,7 +52,15 @@ blue = color_rgb(0,0,200)
 global nrows
 nrows = 1
 
-def make( rows, cols, width, height ) :
+global cell_items  # Canvas item id of each cell filled so far, by (row, col)
+global pending     # Colors queued by fill_cell but not yet drawn, by (row, col)
+global frame_time, last_flush
+cell_items = {}
+pending = {}
+frame_time = 1 / 30
+last_flush = 0.0
+
+def make( rows, cols, width, height, max_fps=30, backend="tk", frame_pattern=None ) :
     """Create the grid display, initially all white.
     rows, cols are the grid size in rows and columns.
     width, height are the window size in pixels.
@@ -52,16 +70,31 @@ def make( rows, cols, width, height ) :
         cols:  number of columns of cells in the grid (horizontal divisions)
         width:  horizontal width of window in pixels
         height: vertical height of window in pixels
+        max_fps: most times per second that queued cell fills are drawn
+        backend: "tk" to draw in a window, or "raster" to draw into
+           an image in memory (graphics.raster.RasterCanvas)
+        frame_pattern: with the raster backend, where to save a frame
+           each time the grid is drawn, e.g., 'frames/grid-{:05d}.png'
     Returns:  nothing
     """
     global win, cell_width, cell_height, nrows
-    win = GraphWin("Grid", width, height )
-    win.setCoords(0, 0, cols, rows)
-    bkgrnd = Rectangle( Point(0,0), Point(width,height) )
-    bkgrnd.setFill( color_rgb(255,255,255) ) # White background
+    global cell_items, pending, frame_time, last_flush
+    if backend == "raster":
+        win = RasterCanvas(width, height, frame_pattern=frame_pattern)
+    else:
+        assert backend == "tk", f"Unknown display backend '{backend}'"
+        # Imported only when needed, as importing it connects to the display
+        from graphics.graphics import GraphWin
+        # We update the window ourselves, in batches (see flush)
+        win = GraphWin("Grid", width, height, autoflush=False)
     cell_width = width / cols
     cell_height = height / rows
     nrows = rows 
+    cell_items = {}
+    pending = {}
+    frame_time = 1 / max_fps
+    last_flush = time.monotonic()
+    win.update()
 
 def get_cur_color():
     """Return the currently chosen color in the color wheel.  
@@ -120,15 +153,34 @@ def fill_cell(row, col, color):
            include grid.white, grid.black, and values returned by 
            grid.get_next_color() and grid.get_cur_color()
 
+    The fill is queued, and drawn with the next batch (see flush).
     """
-    global nrows, win
-    left = col
-    right = col + 1
-    top = nrows - (row + 1)
-    bottom = nrows - row
-    mark = Rectangle( Point(left,bottom), Point(right,top) )
-    mark.setFill(color)
-    mark.draw(win)
+    pending[(row, col)] = color
+    if time.monotonic() - last_flush >= frame_time:
+        flush()
+
+def flush():
+    """Draw all queued cell fills and update the window.
+
+    Args: none
+    Returns: nothing
+    """
+    global pending, last_flush
+    for (row, col), color in pending.items():
+        item = cell_items.get((row, col))
+        if item is None:
+            # Canvas coordinates are pixels, with row 0 at the top
+            item = win.create_rectangle(col * cell_width, row * cell_height,
+                                        (col + 1) * cell_width, (row + 1) * cell_height,
+                                        fill=color, outline=black)
+            # Keep labels on top of cells filled after them
+            win.tag_lower(item)
+            cell_items[(row, col)] = item
+        else:
+            win.itemconfig(item, fill=color)
+    pending = {}
+    win.update()
+    last_flush = time.monotonic()
     
 def label_cell(row, col, text, color=black):
     """Place text label on cell[row,col].
@@ -144,14 +196,12 @@ def label_cell(row, col, text, color=black):
         text: string (usually one character) to label the cell with
         color: Color of text label
     """
-    global nrows, win
-    xcenter = col + 0.5
-    ycenter = nrows - (row + 1) + 0.5
-    label = Text( Point(xcenter, ycenter), text)
-    label.setFace("helvetica")
-    label.setSize(20)  ## Is there a better way to choose text size? 
-    label.setFill(color)
-    label.draw(win)
+    global win
+    xcenter = (col + 0.5) * cell_width
+    ycenter = (row + 0.5) * cell_height
+    ## Is there a better way to choose text size? 
+    win.create_text(xcenter, ycenter, text=text, fill=color, font=("helvetica", 20))
+    flush()
 
 def sub_grid_dim(rows, cols):
     """Divide each cell into rows x cols for sub-labeling
@@ -176,15 +226,14 @@ def sub_label_cell(row, col, sub_row, sub_col, text, color=black):
         text: Label (usually one character) to place there
         color: color of text
       """
-      global nrows, n_sub_rows, n_sub_cols, win
-      xcenter = col + ((sub_col + 0.5) / n_sub_cols)
-      ycenter = nrows - (row + 1) + ((sub_row + 0.5) / n_sub_rows)
+      global n_sub_rows, n_sub_cols, win
+      # Sub-row 0 is at the bottom of the cell
+      xcenter = (col + ((sub_col + 0.5) / n_sub_cols)) * cell_width
+      ycenter = (row + 1 - ((sub_row + 0.5) / n_sub_rows)) * cell_height
       # print("Placing subgrid label at ({},{})".format(xcenter,ycenter))
-      label = Text( Point(xcenter, ycenter), text)
-      label.setFace("helvetica")
-      label.setSize(10)  ## Is there a better way to choose text size? 
-      label.setFill(color)
-      label.draw(win)
+      ## Is there a better way to choose text size? 
+      win.create_text(xcenter, ycenter, text=text, fill=color, font=("helvetica", 10))
+      flush()
     
 
 def close() :
@@ -195,6 +244,7 @@ def close() :
     Effect:  the grid graphics window is closed. 
     """
     global win
+    flush()
     win.close()
     
 if __name__ == "__main__":
@@ -8,6 +8,10 @@ import points_plot
 
 GOOD_PI = 3.141592653589793  # A very good estimate, from math.pi
 SAMPLES = 10000   # More =>  more precise, but slower
+# Plot in a window ("tk") or off-screen ("raster"),
+# saving the plot as a PNG (or PPM) file at PLOT_PATH
+DISPLAY_BACKEND = "tk"
+PLOT_PATH = "pi-points.png"
 
 def in_unit_circle(x: float, y: float) -> bool:
     """Returns True if and only if (x,y) lies within the circle
@@ -92,7 +96,7 @@ def pi_approx() -> float:
 def main():
     doctest.testmod()
     # plot_random_points() # Eyeball test
-    points_plot.init()
+    points_plot.init(backend=DISPLAY_BACKEND, frame_pattern=PLOT_PATH)
     estimate = pi_approx()
     print(f"Pi is approximately {estimate}")
     points_plot.wait_to_close()
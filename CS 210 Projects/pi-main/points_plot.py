@@ -2,9 +2,12 @@
 Author: Michal Young, July 2022
 Credits:  Independent work, but we are grateful for
    graphics.py by John Zell of Wartburg College.
+
+The plot is drawn in a Tk window, or with backend="raster" off-screen
+into an image file (see graphics.raster), which needs no display.
 """
 
-from graphics.graphics import GraphWin, Point, Rectangle
+from graphics.raster import RasterCanvas
 from typing import Optional
 
 ## Global parameters:  How big is a point, in pixels?
@@ -12,20 +15,31 @@ PT_WID = 6                  # Width of a point
 KERF = max(1, PT_WID//2)    # Extends this far up and down
 
 ## Module state, initialized by init
-WIN: Optional[GraphWin] = None
+WIN = None    # A GraphWin, or a RasterCanvas when drawing off-screen
+LIVE = True   # Is WIN a window on the display?
 ORIGIN: tuple[float, float] = [0.0, 0.0]
 BOUND: tuple[float, float] = [1.0, 1.0]
 
-def init(width=500, height=500, origin=(0.0, 0.0), bound=(1.0, 1.0)):
+def init(width=500, height=500, origin=(0.0, 0.0), bound=(1.0, 1.0),
+         backend="tk", frame_pattern: Optional[str] = None):
     """Initializes a canvas for plotting points in the Cartesian plain.
     By default we plot in the unit square, from (0,0) to (1,1),
     in a canvas of size 500x500 pixels.  Pass height and width to
     choose a different canvas size.  Pass origin and bound to set a
-    different range of world coordinates.
+    different range of world coordinates.  Pass backend="raster" to
+    plot off-screen; the plot is saved when closed, to frame_pattern
+    (see graphics.raster.RasterCanvas).
     """
-    global WIN
-    WIN = GraphWin("Plot", width, height )
-    WIN.setBackground("white")
+    global WIN, LIVE
+    LIVE = backend == "tk"
+    if backend == "raster":
+        WIN = RasterCanvas(width, height, frame_pattern=frame_pattern)
+    else:
+        assert backend == "tk", f"Unknown display backend '{backend}'"
+        # Imported only when needed, as importing it connects to the display
+        from graphics.graphics import GraphWin
+        WIN = GraphWin("Plot", width, height )
+        WIN.setBackground("white")
     global ORIGIN
     ORIGIN = origin
     global BOUND
@@ -33,7 +47,9 @@ def init(width=500, height=500, origin=(0.0, 0.0), bound=(1.0, 1.0)):
 
 
 def close():
-    """Return to uninitialized state, with no window"""
+    """Return to uninitialized state, with no window
+    (saving the plot, if drawn off-screen)
+    """
     global WIN
     if WIN:
         WIN.close()
@@ -47,7 +63,8 @@ def wait_to_close():
     """
     global WIN
     if WIN:
-        input("Press enter to close plot window")
+        if LIVE:
+            input("Press enter to close plot window")
         close()
 
 
@@ -68,10 +85,11 @@ def plot(x: float, y: float, color_rgb: tuple[int, int, int]=(50, 50, 50)):
     x_center = (x - x_origin) * WIN.width
     y_center = (y - y_origin) * WIN.height
     # Mark with a 2x2 pixel rectangle
-    mark = Rectangle(Point(x_center - KERF, y_center - KERF),
-                     Point(x_center + KERF, y_center + KERF))
     r, g, b = color_rgb
     rgb_str = "#%02x%02x%02x" % (r,g,b)
-    mark.setFill(rgb_str)
-    mark.draw(WIN)
+    WIN.create_rectangle(x_center - KERF, y_center - KERF,
+                         x_center + KERF, y_center + KERF,
+                         fill=rgb_str, outline="black")
+    if LIVE:
+        WIN.update()
 
@@ -8,9 +8,29 @@ from that origin.
 
 Wildfire CSV file has been pruned to Oregon, which is in UTM zones T 10 and T 11;
 we'll use T 10.
+
+Rows are read and converted a batch at a time, each batch in
+a pool of worker processes, and written as soon as they are
+converted (in their original order), so even the full national
+fire history can be converted without holding it all in memory.
+Each batch is projected by the utm package in a single call on
+NumPy arrays (pip install utm numpy).
+
+From the command line, e.g.,
+    python3 add_utm.py data/WFIGS_History.csv data/fire_locations_utm.csv
 """
-import utm
+import argparse
 import csv
+import io
+import math
+import multiprocessing
+import os
+import re
+from collections import deque
+from typing import Iterator, Optional, Sequence, TextIO
+
+import numpy
+import utm
 
 import logging
 logging.basicConfig()
@@ -28,25 +48,241 @@ LON_COL = "X"
 # Oregon is T10 (western 2/3) and T11 (eastern).
 UTM_ZONE_NUM = 10
 UTM_ZONE_LET = "T"
+# Rows converted at a time, by each of WORKERS processes
+# (None for one per core)
+BATCH_SIZE = 10000
+WORKERS = None
+
+# UTM zone letters, south to north (I and O are not used)
+ZONE_LETTERS = "CDEFGHJKLMNPQRSTUVWX"
+
+
+def check_zone(zone_number: int, zone_letter: str):
+    """Raise ValueError unless zone_number and zone_letter name a UTM zone"""
+    if not (1 <= zone_number <= 60 and len(zone_letter) == 1
+            and zone_letter.upper() in ZONE_LETTERS):
+        raise ValueError(f"UTM zone should be a number 1-60 and a letter C-X "
+                         f"(not I or O), got {zone_number}{zone_letter}")
+
+
+def parse_zone(zone: str) -> tuple[int, str]:
+    """(number, letter) of a UTM zone written like '10T'
+
+    >>> parse_zone("10T"), parse_zone("5s")
+    ((10, 'T'), (5, 'S'))
+    >>> parse_zone("61T")
+    Traceback (most recent call last):
+    ...
+    ValueError: UTM zone should be a number 1-60 and a letter C-X (not I or O), got 61T
+    """
+    match = re.fullmatch(r"([0-9]{1,2})([A-Za-z])", zone.strip())
+    if not match:
+        raise ValueError(f"UTM zone should be a number and a letter, like 10T, got {zone}")
+    zone_number, zone_letter = int(match[1]), match[2].upper()
+    check_zone(zone_number, zone_letter)
+    return zone_number, zone_letter
+
+
+def to_utm(lats: Sequence[float], lons: Sequence[float],
+           zone_number: int = UTM_ZONE_NUM,
+           zone_letter: str = UTM_ZONE_LET) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Arrays of the easting and northing in the given UTM zone of each
+    latitude and longitude, in degrees.  Each array of points is
+    converted by utm.from_latlon in one call for the points north of
+    the equator and one for those south of it, which have a false
+    northing of 10,000 km whatever the zone letter.  Raises ValueError
+    (utm.OutOfRangeError) for a point outside UTM coverage.
+
+    >>> eastings, northings = to_utm([44.058, 44.41761587], [-121.315, -117.8579135])
+    >>> eastings.astype(int).tolist(), northings.astype(int).tolist()
+    ([634962, 909370], [4879695, 4931132])
+    >>> to_utm([0.5, -0.5], [-123, -123])[1].astype(int).tolist()
+    [55265, 9944734]
+
+    The same as utm.from_latlon gives for each fire in data/ by itself:
+    >>> with open("data/WFIGS_History.csv", newline='', encoding="utf-8") as history:
+    ...     located = [(float(row[LAT_COL]), float(row[LON_COL]))
+    ...                for row in csv.DictReader(history) if row[LAT_COL] and row[LON_COL]]
+    >>> lats, lons = zip(*located)
+    >>> eastings, northings = to_utm(lats, lons)
+    >>> expected = [utm.from_latlon(lat, lon, UTM_ZONE_NUM, UTM_ZONE_LET)[:2]
+    ...             for lat, lon in located]
+    >>> len(expected), max(math.dist(point, expect) for point, expect
+    ...                    in zip(zip(eastings, northings), expected)) < 1e-6
+    (884, True)
+
+    >>> to_utm([90], [0])
+    Traceback (most recent call last):
+    ...
+    utm.error.OutOfRangeError: latitude out of range (must be between 80 deg S and 84 deg N)
+    """
+    check_zone(zone_number, zone_letter)
+    lats = numpy.asarray(lats, dtype=float)
+    lons = numpy.asarray(lons, dtype=float)
+    eastings = numpy.empty(len(lats))
+    northings = numpy.empty(len(lats))
+    for northern in [True, False]:
+        part = (lats >= 0) == northern
+        if part.any():
+            eastings[part], northings[part], _, _ = utm.from_latlon(
+                lats[part], lons[part], force_zone_number=zone_number,
+                force_northern=northern)
+    return eastings, northings
+
+
+# Columns and zone for _convert_batch, installed by _init_worker
+# as each worker starts
+_worker_lat_i = 0
+_worker_lon_i = 0
+_worker_zone_number = UTM_ZONE_NUM
+_worker_zone_letter = UTM_ZONE_LET
+
+def _init_worker(lat_i: int, lon_i: int, zone_number: int, zone_letter: str):
+    """Install the columns and zone in a worker process"""
+    global _worker_lat_i, _worker_lon_i, _worker_zone_number, _worker_zone_letter
+    _worker_lat_i = lat_i
+    _worker_lon_i = lon_i
+    _worker_zone_number = zone_number
+    _worker_zone_letter = zone_letter
+
+
+def _convert_batch(text: str) -> tuple[str, int, int]:
+    """Convert CSV records (text, without the header) to output
+    records:  easting, northing, zone, then the original record.
+    Returns the output text, the number of records in it, and the
+    number left out for lack of a location.  Records go to and from
+    workers as text, which is much quicker to pass between processes
+    than lists of fields.
+    """
+    rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+    located = [row for row in rows if row[_worker_lat_i] and row[_worker_lon_i]]
+    eastings, northings = to_utm([float(row[_worker_lat_i]) for row in located],
+                                 [float(row[_worker_lon_i]) for row in located],
+                                 _worker_zone_number, _worker_zone_letter)
+    zone = _worker_zone_letter + str(_worker_zone_number)
+    converted = io.StringIO(newline='')
+    # astype(int) truncates toward zero, as int() does
+    csv.writer(converted).writerows(
+        [easting, northing, zone, *row] for easting, northing, row
+        in zip(eastings.astype(int).tolist(), northings.astype(int).tolist(), located))
+    return converted.getvalue(), len(located), len(rows) - len(located)
+
+
+def read_batches(infile: TextIO, batch_size: int) -> Iterator[str]:
+    """Text of the CSV records in infile, batch_size records at a
+    time (the last batch may be shorter).  A record may be more than
+    one line, if a quoted field has a newline in it.
+
+    >>> text = 'a,b\\n"1\\n2",3\\n4,5\\n'
+    >>> list(read_batches(io.StringIO(text), 2))
+    ['a,b\\n"1\\n2",3\\n', '4,5\\n']
+    """
+    lines = []
+    records = 0
+    quotes = 0
+    for line in infile:
+        lines.append(line)
+        # Quotes within a quoted field are doubled, so the record
+        # ends at the first line end after an even number of quotes
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            quotes = 0
+            records += 1
+            if records == batch_size:
+                yield "".join(lines)
+                lines = []
+                records = 0
+    if lines:
+        yield "".join(lines)
+
+
+def add_utm(src: str, dest: str,
+            lat_col: str = LAT_COL, lon_col: str = LON_COL,
+            zone_number: int = UTM_ZONE_NUM, zone_letter: str = UTM_ZONE_LET,
+            batch_size: int = BATCH_SIZE, workers: Optional[int] = WORKERS) -> int:
+    """Copy CSV file src to dest with Easting, Northing, and UTM Zone
+    columns added in front, returning the number of rows written.
+    Rows without a latitude and longitude are left out.  Batches of
+    rows are converted by workers processes, with at most two batches
+    per worker in memory at once.
+
+    >>> import os, tempfile
+    >>> dest = os.path.join(tempfile.mkdtemp(), "utm.csv")
+    >>> add_utm("data/WFIGS_History.csv", dest, batch_size=100, workers=2)
+    884
+    >>> open(dest, "rb").read() == open("data/fire_locations_utm.csv", "rb").read()
+    True
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with open(src, newline='', encoding="utf-8") as infile:
+        header = next(csv.reader(infile))
+        fields = ["Easting", "Northing", "UTM Zone"] + header
+        log.debug(f"Field names {fields}")
+        worker_args = (header.index(lat_col), header.index(lon_col), zone_number, zone_letter)
+        with open(dest, "w", newline='', encoding="utf-8") as outfile:
+            csv.writer(outfile).writerow(fields)
+            written = 0
+            skipped = 0
+
+            def write(converted: tuple[str, int, int]):
+                nonlocal written, skipped
+                text, n_written, n_skipped = converted
+                outfile.write(text)
+                written += n_written
+                skipped += n_skipped
+
+            if workers == 1:
+                _init_worker(*worker_args)
+                for batch in read_batches(infile, batch_size):
+                    write(_convert_batch(batch))
+            else:
+                with multiprocessing.Pool(workers, initializer=_init_worker,
+                                          initargs=worker_args) as pool:
+                    # Batches being converted, oldest first
+                    pending = deque()
+                    for batch in read_batches(infile, batch_size):
+                        pending.append(pool.apply_async(_convert_batch, (batch,)))
+                        if len(pending) >= 2 * workers:
+                            write(pending.popleft().get())
+                    while pending:
+                        write(pending.popleft().get())
+    if skipped:
+        log.warning(f"Skipped {skipped} rows without {lat_col} and {lon_col}")
+    return written
+
+
+def getargs() -> argparse.Namespace:
+    """Return arguments as a Namespace object"""
+    parser = argparse.ArgumentParser("Add UTM coordinates to a CSV file of fire locations")
+    parser.add_argument("src", nargs="?", default=SRC,
+        help="CSV file with latitude and longitude columns")
+    parser.add_argument("dest", nargs="?", default=DEST,
+        help="CSV file to write, with Easting, Northing, and UTM Zone columns added")
+    parser.add_argument("--lat", dest="lat_col", default=LAT_COL,
+        help="Header of latitude column")
+    parser.add_argument("--lon", dest="lon_col", default=LON_COL,
+        help="Header of longitude column")
+    parser.add_argument("--zone", dest="zone", default=str(UTM_ZONE_NUM) + UTM_ZONE_LET,
+        help="UTM zone for all points, e.g., 10T")
+    parser.add_argument("--batch", dest="batch", type=int, default=BATCH_SIZE,
+        help="Rows converted at a time")
+    parser.add_argument("--workers", dest="workers", type=int, default=WORKERS,
+        help="Worker processes (default one per core)")
+    args = parser.parse_args()
+    try:
+        args.zone_number, args.zone_letter = parse_zone(args.zone)
+    except ValueError as error:
+        parser.error(str(error))
+    return args
 
 
-with open(SRC, newline='', encoding="utf-8") as infile:
-    reader = csv.DictReader(infile)
-    # Have field names been initialized at this point? (Yes)
-    fields = ["Easting", "Northing", "UTM Zone"] + reader.fieldnames
-    log.debug(f"Field names {fields}")
-    with open(DEST, "w") as outfile:
-        writer = csv.DictWriter(outfile, fields)
-        writer.writeheader()
-        for row in reader:
-            lat = float(row[LAT_COL])
-            lon = float(row[LON_COL])
-            easting, northing, _, _ = utm.from_latlon(lat, lon,
-                                                      force_zone_number=UTM_ZONE_NUM,
-                                                      force_zone_letter=UTM_ZONE_LET)
-            row["Easting"] = int(easting)
-            row["Northing"] = int(northing)
-            row["UTM Zone"] = UTM_ZONE_LET + str(UTM_ZONE_NUM)
-            writer.writerow(row)
+def main():
+    args = getargs()
+    written = add_utm(args.src, args.dest, args.lat_col, args.lon_col,
+                      args.zone_number, args.zone_letter, args.batch, args.workers)
+    log.info(f"Wrote {written} rows to {args.dest}")
 
 
+if __name__ == "__main__":
+    main()
@@ -20,9 +20,51 @@ BASEMAP_EXTENT_NORTHING = 5171453
 BASEMAP_WIDTH_UTM = BASEMAP_EXTENT_EASTING - BASEMAP_ORIGIN_EASTING
 BASEMAP_HEIGHT_UTM =  BASEMAP_EXTENT_NORTHING - BASEMAP_ORIGIN_NORTHING
 
+# Draw the map in a window ("tk"), or off-screen ("raster"),
+# saving a frame per iteration as PNG (or PPM) files
+# named by FRAME_PATTERN
+DISPLAY_BACKEND = "tk"
+FRAME_PATTERN = "frames/wildfire-{:05d}.png"
+
 # How many clusters should we try to make?
 N_CLUSTERS = 10
 
+# Points at a time for which distances to every centroid
+# are computed together (see wildfire.assign_labels)
+ASSIGN_CHUNK = 4096
+
+# Starting centroids:  "kmeans++" spreads them through the points;
+# "random" starts from a random assignment of points to clusters
+SEEDING = "kmeans++"
+
+# Cluster this many times from different starting centroids, in
+# RESTART_WORKERS processes (None for one per core), keeping the
+# clustering with the least inertia (see wildfire.best_clustering)
+RESTARTS = 1
+RESTART_WORKERS = None
+
+# Mini-batch clustering (minibatch.py), for data sets too large to
+# hold in memory:  points per batch; points read and shuffled at a
+# time, from which batches are taken; size of the random sample from
+# which starting centroids are chosen; most passes over the data; and
+# stop after a pass in which no centroid moved more than this (meters)
+MINIBATCH_SIZE = 1024
+MINIBATCH_BUFFER = 65536
+MINIBATCH_SAMPLE = 10000
+MINIBATCH_EPOCHS = 5
+MINIBATCH_TOLERANCE = 10
+
+# How to cluster:  "lloyd" finds the closest centroid to every point
+# in every iteration; "hamerly" gets the same result with distance
+# bounds that let it skip most points, which pays off with many clusters
+KMEANS_METHOD = "hamerly"
+
+# Side of the square cells of fire_index.GridIndex, in meters
+INDEX_CELL_SIZE = 10000
+
 # How long will we allow the algorithm to run?
 # (It will usually end much sooner)
-MAX_ITERATIONS = 30
\ No newline at end of file
+MAX_ITERATIONS = 30
+
+# Pause between centroid moves when replaying the clustering on screen
+STEP_SECONDS = 0.2
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Spatial index of fire locations, for questions like "which fires
+are within 10 km of this point?" without checking every fire.
+
+GridIndex divides the map into square cells, config.INDEX_CELL_SIZE
+meters on a side, and lists the fires in each cell.  A query looks
+only at the cells it could touch:  the cells overlapping a box or
+circle, or rings of cells around a point, widening until the nearest
+fires have been found.
+
+From the command line, e.g., fires within 10 km of Bend:
+    python3 fire_index.py 636000 4880000 --radius 10000
+"""
+import argparse
+import heapq
+import random
+from array import array
+from typing import Iterator
+
+import config
+import wildfire
+
+
+class GridIndex:
+    """Fires (points) by the grid cell they lie in.  Queries return
+    indexes into points, in increasing order (or nearest first).
+
+    >>> index = GridIndex([(5, 5), (15, 5), (25, 25), (5, 6)], cell_size=10)
+    >>> index.bbox(0, 0, 15, 10)
+    [0, 1, 3]
+    >>> index.within((6, 5), 2)
+    [0, 3]
+    >>> index.nearest((24, 24), 2)
+    [2, 1]
+    """
+
+    def __init__(self, points: list[tuple[int, int]],
+                 cell_size: float = config.INDEX_CELL_SIZE):
+        self.points = points
+        self.cell_size = cell_size
+        # Indexes of points in each (column, row) cell that has any
+        self.cells: dict[tuple[int, int], array] = {}
+        for i, (easting, northing) in enumerate(points):
+            key = self._cell(easting, northing)
+            bucket = self.cells.get(key)
+            if bucket is None:
+                bucket = array("i")
+                self.cells[key] = bucket
+            bucket.append(i)
+        if self.cells:
+            self.min_col = min(col for col, row in self.cells)
+            self.max_col = max(col for col, row in self.cells)
+            self.min_row = min(row for col, row in self.cells)
+            self.max_row = max(row for col, row in self.cells)
+
+    def _cell(self, easting: float, northing: float) -> tuple[int, int]:
+        """(column, row) of the cell containing (easting, northing)"""
+        return (int(easting // self.cell_size), int(northing // self.cell_size))
+
+    def _cells_in(self, min_easting: float, min_northing: float,
+                  max_easting: float, max_northing: float) -> Iterator[tuple[tuple[int, int], array]]:
+        """Each non-empty cell that overlaps the box, with its points"""
+        min_col, min_row = self._cell(min_easting, min_northing)
+        max_col, max_row = self._cell(max_easting, max_northing)
+        if (max_col - min_col + 1) * (max_row - min_row + 1) > len(self.cells):
+            # A big box:  quicker to check the cells that have points
+            for (col, row), bucket in self.cells.items():
+                if min_col <= col <= max_col and min_row <= row <= max_row:
+                    yield (col, row), bucket
+            return
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                bucket = self.cells.get((col, row))
+                if bucket is not None:
+                    yield (col, row), bucket
+
+    def bbox(self, min_easting: float, min_northing: float,
+             max_easting: float, max_northing: float) -> list[int]:
+        """Points within the box (including its edges)"""
+        found = []
+        for (col, row), bucket in self._cells_in(min_easting, min_northing,
+                                                 max_easting, max_northing):
+            if (min_easting <= col * self.cell_size
+                    and (col + 1) * self.cell_size <= max_easting
+                    and min_northing <= row * self.cell_size
+                    and (row + 1) * self.cell_size <= max_northing):
+                # Whole cell is inside the box
+                found.extend(bucket)
+            else:
+                found.extend(i for i in bucket
+                             if min_easting <= self.points[i][0] <= max_easting
+                             and min_northing <= self.points[i][1] <= max_northing)
+        found.sort()
+        return found
+
+    def within(self, center: tuple[float, float], radius: float) -> list[int]:
+        """Points no farther than radius from center"""
+        cx, cy = center
+        radius_sq = radius * radius
+        found = []
+        for key, bucket in self._cells_in(cx - radius, cy - radius, cx + radius, cy + radius):
+            found.extend(i for i in bucket if wildfire.sq_dist(center, self.points[i]) <= radius_sq)
+        found.sort()
+        return found
+
+    def _ring(self, col: int, row: int, ring: int) -> Iterator[tuple[int, int]]:
+        """Cells exactly ring cells away from (col, row), horizontally
+        or vertically, i.e., the cells on the edge of a square
+        """
+        if ring == 0:
+            yield (col, row)
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (c, row - ring)
+            yield (c, row + ring)
+        for r in range(row - ring + 1, row + ring):
+            yield (col - ring, r)
+            yield (col + ring, r)
+
+    def _cell_sq_dist(self, key: tuple[int, int], center: tuple[float, float]) -> float:
+        """Square of the distance from center to the nearest part of cell key"""
+        col, row = key
+        cx, cy = center
+        dx = max(col * self.cell_size - cx, 0, cx - (col + 1) * self.cell_size)
+        dy = max(row * self.cell_size - cy, 0, cy - (row + 1) * self.cell_size)
+        return dx * dx + dy * dy
+
+    def nearest(self, center: tuple[float, float], k: int) -> list[int]:
+        """The k points closest to center, closest first (and, among
+        points equally far, lowest index first).  We search rings of
+        cells around center, widening until the k'th closest point so
+        far is closer than any cell not yet searched.  If that would take
+        more cells than have points (center is far from the fires, or
+        they are sparse), we instead take the remaining non-empty
+        cells nearest first.
+        """
+        if not self.cells or k <= 0:
+            return []
+        cx, cy = center
+        col, row = self._cell(cx, cy)
+        # The k closest so far, as a heap of (-square of distance, -index),
+        # so that best[0] is the farthest of them
+        best = []
+
+        def consider(bucket: array):
+            for i in bucket:
+                entry = (-wildfire.sq_dist(center, self.points[i]), -i)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+
+        ring = 0
+        while (2 * ring + 1) ** 2 <= len(self.cells):
+            for key in self._ring(col, row, ring):
+                consider(self.cells.get(key, []))
+            # Points not yet seen are outside the square of cells
+            # searched so far, so at least this far from center
+            reach = min(cx - (col - ring) * self.cell_size,
+                        (col + ring + 1) * self.cell_size - cx,
+                        cy - (row - ring) * self.cell_size,
+                        (row + ring + 1) * self.cell_size - cy)
+            if ((len(best) == k and -best[0][0] < reach * reach)
+                    or (col - ring <= self.min_col and col + ring >= self.max_col
+                        and row - ring <= self.min_row and row + ring >= self.max_row)):
+                return [-i for _, i in sorted(best, reverse=True)]
+            ring += 1
+        remaining = sorted((self._cell_sq_dist(key, center), key) for key in self.cells
+                           if max(abs(key[0] - col), abs(key[1] - row)) >= ring)
+        for cell_sq_dist, key in remaining:
+            if len(best) == k and -best[0][0] < cell_sq_dist:
+                break
+            consider(self.cells[key])
+        return [-i for _, i in sorted(best, reverse=True)]
+
+
+def seed_near(index: GridIndex, center: tuple[float, float], radius: float, n: int,
+              rng: random.Random = random) -> list[tuple[int, int]]:
+    """
+    Starting centroids for clustering just the fires within radius
+    of center, chosen k-means++ style from those fires.  Raises
+    ValueError if there are fewer than n fires within radius
+    (including none at all), as n clusters cannot be formed.
+
+    >>> index = GridIndex(wildfire.get_fires_utm("data/test_locations_utm.csv"))
+    >>> seed_near(index, (442151, 4729315), 1000, 1)
+    [(442151, 4729315)]
+    >>> seed_near(index, (0, 0), 1000, 1)
+    Traceback (most recent call last):
+    ...
+    ValueError: Only 0 fires within 1000 m of (0, 0), need at least 1
+    """
+    assert n > 0, "Need at least one centroid"
+    nearby = [index.points[i] for i in index.within(center, radius)]
+    if len(nearby) < n:
+        raise ValueError(f"Only {len(nearby)} fires within {radius} m of {center}, "
+                         f"need at least {n}")
+    return wildfire.kmeans_pp_centroids(nearby, n, rng)
+
+
+def getargs() -> argparse.Namespace:
+    """Return arguments as a Namespace object"""
+    parser = argparse.ArgumentParser("Find fires near a UTM location")
+    parser.add_argument("easting", type=float, help="Easting of location")
+    parser.add_argument("northing", type=float, help="Northing of location")
+    parser.add_argument("--radius", dest="radius", type=float, default=None,
+        help="List fires within this many meters")
+    parser.add_argument("--nearest", dest="nearest", type=int, default=None,
+        help="List this many nearest fires")
+    parser.add_argument("--path", dest="path", default=config.FIRE_DATA_PATH,
+        help="CSV file with Easting and Northing columns")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    index = GridIndex(wildfire.get_fires_utm(args.path))
+    center = (args.easting, args.northing)
+    if args.nearest is not None:
+        found = index.nearest(center, args.nearest)
+    else:
+        radius = args.radius if args.radius is not None else 10000
+        found = index.within(center, radius)
+    print("Easting,Northing,Meters")
+    for i in found:
+        easting, northing = index.points[i]
+        print(f"{easting},{northing},{wildfire.sq_dist(center, index.points[i]) ** 0.5:.0f}")
+    print(f"{len(found)} fires")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 """Plot UTM points on a basemap image.
 M Young, 2022-09-17
+
+The map is drawn in a Tk window, or with backend="raster" off-screen
+into an image (see graphics.raster), which needs no display.
+Points and lines are canvas items, named by their item ids.
 """
+from typing import Optional
 
-import graphics.graphics as graphics
+import graphics.raster as raster
 
 import logging
 logging.basicConfig()
@@ -13,16 +18,16 @@ PT_MARK_SIZE = 3  # pixels
 
 # Contrasty colors for at least 10 groups
 COLOR_WHEEL = [
-    graphics.color_rgb(255,0,0),
-    graphics.color_rgb(0,255,255),
-    graphics.color_rgb(127,0,255),
-    graphics.color_rgb(127,255,0),
-    graphics.color_rgb(255,0,255),
-    graphics.color_rgb(255,127,0),
-    graphics.color_rgb(0,0,255),
-    graphics.color_rgb(0,127,255),
-    graphics.color_rgb(50,50,0),
-    graphics.color_rgb(255,0,127)
+    raster.color_rgb(255,0,0),
+    raster.color_rgb(0,255,255),
+    raster.color_rgb(127,0,255),
+    raster.color_rgb(127,255,0),
+    raster.color_rgb(255,0,255),
+    raster.color_rgb(255,127,0),
+    raster.color_rgb(0,0,255),
+    raster.color_rgb(0,127,255),
+    raster.color_rgb(50,50,0),
+    raster.color_rgb(255,0,127)
 ]
 
 next_color = 0
@@ -38,20 +43,35 @@ def choose_color() -> object:
     return choice
 
 class Map:
-    """A plot in UTM coordinates with a georeferenced image"""
+    """A plot in UTM coordinates with a georeferenced image.
+    With backend "raster", the map is drawn off-screen, and each
+    flush saves a frame named by frame_pattern (see
+    graphics.raster.RasterCanvas).
+    """
     def __init__(self, basemap_path: str,
                  window: tuple[int, int],
                  utm_origin: tuple[int, int],
-                 utm_ne_extent: tuple[int, int]):
+                 utm_ne_extent: tuple[int, int],
+                 backend: str = "tk",
+                 frame_pattern: Optional[str] = None):
         win_width, win_height = window
         self.win_width, self.win_height = window
         self.utm_origin_easting, self.utm_origin_northing = utm_origin
         self.utm_extent_easting, self.utm_extent_northing = utm_ne_extent
         self.utm_width = self.utm_extent_easting - self.utm_origin_easting
         self.utm_height = self.utm_extent_northing - self.utm_origin_northing
-        self.window = graphics.GraphWin(basemap_path, win_width, win_height)
-        self.basemap = graphics.Image(graphics.Point(win_width//2, win_height//2), basemap_path)
-        self.basemap.draw(self.window)
+        self.live = backend == "tk"
+        if backend == "raster":
+            self.window = raster.RasterCanvas(win_width, win_height, frame_pattern=frame_pattern)
+            self.basemap = self.window.create_image(win_width//2, win_height//2,
+                                                    image=raster.read_png(basemap_path))
+        else:
+            assert backend == "tk", f"Unknown display backend '{backend}'"
+            # Imported only when needed, as importing it connects to the display
+            import graphics.graphics as graphics
+            self.window = graphics.GraphWin(basemap_path, win_width, win_height)
+            self.basemap = graphics.Image(graphics.Point(win_width//2, win_height//2), basemap_path)
+            self.basemap.draw(self.window)
         # Conversion factor from meters (UTM) to pixels
         self.pixels_per_meter_easting = self.win_width / self.utm_width
         self.pixels_per_meter_northing = self.win_height / self.utm_height
@@ -65,29 +85,51 @@ class Map:
         pixel_y = int(self.pixels_per_meter_northing * (northing - self.utm_origin_northing))
         return (pixel_x, pixel_y)
 
-    def plot_point(self, easting, northing, size_px: int=PT_MARK_SIZE, color: str = "red") -> graphics.Circle:
+    def _changed(self):
+        """Show a change at once in a window.  Off-screen,
+        changes are saved by flush and close.
+        """
+        if self.live:
+            self.window.update()
+
+    def _center(self, symbol: int) -> tuple[float, float]:
+        """Center of the canvas item symbol, in pixels"""
+        x0, y0, x1, y1 = self.window.coords(symbol)
+        return ((x0 + x1) / 2, (y0 + y1) / 2)
+
+    def plot_point(self, easting, northing, size_px: int=PT_MARK_SIZE, color: str = "red") -> int:
         pixel_x, pixel_y = self.pixel_coordinates(easting, northing)
-        symbol = graphics.Circle(graphics.Point(pixel_x, pixel_y), size_px)
-        symbol.setFill(color)
-        symbol.draw(self.window)
+        symbol = self.window.create_oval(pixel_x - size_px, pixel_y - size_px,
+                                         pixel_x + size_px, pixel_y + size_px,
+                                         fill=color, outline="black")
+        self._changed()
         return symbol
 
-    def move_point(self, symbol: graphics.Circle, new_pos: tuple[int, int]):
+    def move_point(self, symbol: int, new_pos: tuple[int, int]):
         """Move point to new easting, northing"""
         easting, northing = new_pos
         pixel_x, pixel_y = self.pixel_coordinates(easting, northing)
-        old_center = symbol.getCenter()
-        old_x, old_y = old_center.x, old_center.y
-        symbol.move(pixel_x - old_x, pixel_y - old_y)
+        old_x, old_y = self._center(symbol)
+        self.window.move(symbol, pixel_x - old_x, pixel_y - old_y)
+        self._changed()
 
     def connect_all(self,
-             symbol: graphics.Circle,
+             symbol: int,
              group: list[tuple[float, float]]):
         color = choose_color()
-        symbol.setFill(color)
-        center = symbol.getCenter()
+        self.window.itemconfig(symbol, fill=color)
+        center_x, center_y = self._center(symbol)
         for easting, northing in group:
             x, y = self.pixel_coordinates(easting, northing)
-            ray = graphics.Line(center, graphics.Point(x, y))
-            ray.setOutline(color)
-            ray.draw(self.window)
\ No newline at end of file
+            self.window.create_line(center_x, center_y, x, y, fill=color)
+        self._changed()
+
+    def flush(self):
+        """Bring the display up to date; off-screen,
+        save it as the next frame
+        """
+        self.window.update()
+
+    def close(self):
+        """Close the window; off-screen, save the last frame"""
+        self.window.close()
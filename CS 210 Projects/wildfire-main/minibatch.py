@@ -0,0 +1,164 @@
+"""
+Mini-batch k-means clustering of wildfire locations, for data sets
+too large to hold in memory (e.g., national fire history files).
+
+Instead of assigning every point to a centroid in each iteration,
+as wildfire.main does, we read the CSV file a little at a time and
+move the centroids after each small random batch of points
+(Sculley, "Web-scale k-means clustering", 2010).  Each centroid is
+the running mean of all the points assigned to it so far, so it
+moves less and less as it settles.  Memory is bounded by the
+shuffle buffer (config.MINIBATCH_BUFFER points), not the file size.
+"""
+import argparse
+import random
+from typing import Callable, Iterator, Optional
+
+import config
+import wildfire
+
+
+def sample_points(path: str, size: int, rng: random.Random = random) -> list[tuple[int, int]]:
+    """
+    A uniform random sample of size points from the CSV file at path
+    (or all of them, if there are fewer), in one pass through the file
+    (reservoir sampling).
+
+    >>> sorted(sample_points("data/test_locations_utm.csv", 10))
+    [(442151, 4729315), (442151, 5071453), (914041, 4729315), (914041, 5071453)]
+    """
+    sample = []
+    for i, point in enumerate(wildfire.iter_fires_utm(path)):
+        if i < size:
+            sample.append(point)
+        else:
+            # Keep the i'th point with probability size / (i + 1)
+            j = rng.randrange(i + 1)
+            if j < size:
+                sample[j] = point
+    return sample
+
+
+def batches(path: str, batch_size: int, buffer_size: int,
+            rng: random.Random = random) -> Iterator[list[tuple[int, int]]]:
+    """
+    One pass through the points in the CSV file at path, as lists
+    of batch_size points (the last may be shorter).  The points are
+    read buffer_size at a time and shuffled, so a batch is a random
+    selection from its buffer, though not from the whole file.
+
+    >>> [len(batch) for batch in batches("data/test_locations_utm.csv", 3, 100)]
+    [3, 1]
+    """
+    buffer = []
+    for point in wildfire.iter_fires_utm(path):
+        buffer.append(point)
+        if len(buffer) == buffer_size:
+            rng.shuffle(buffer)
+            for start in range(0, buffer_size, batch_size):
+                yield buffer[start:start + batch_size]
+            buffer = []
+    rng.shuffle(buffer)
+    for start in range(0, len(buffer), batch_size):
+        yield buffer[start:start + batch_size]
+
+
+def minibatch_kmeans(path: str, n: int,
+                     batch_size: int = config.MINIBATCH_SIZE,
+                     buffer_size: int = config.MINIBATCH_BUFFER,
+                     sample_size: int = config.MINIBATCH_SAMPLE,
+                     epochs: int = config.MINIBATCH_EPOCHS,
+                     tolerance: float = config.MINIBATCH_TOLERANCE,
+                     rng: random.Random = random,
+                     on_move: Optional[Callable[[list[tuple[float, float]]], None]] = None
+                     ) -> list[tuple[float, float]]:
+    """
+    Cluster the points in the CSV file at path into n clusters,
+    returning the centroids.  Starting centroids are chosen k-means++
+    style from a random sample of sample_size points.  Then for each
+    batch, each point is assigned to its closest centroid, and each
+    centroid becomes the mean of every point assigned to it so far.
+    Stops after epochs passes through the file, or sooner after a
+    pass in which no centroid moved more than tolerance meters.
+    Calls on_move(centroids) after each batch.
+
+    >>> corners = wildfire.get_fires_utm("data/test_locations_utm.csv")
+    >>> centroids = minibatch_kmeans("data/test_locations_utm.csv", 4, batch_size=2)
+    >>> sorted(centroids) == sorted(corners)
+    True
+    """
+    sample = sample_points(path, sample_size, rng)
+    centroids = wildfire.kmeans_pp_centroids(sample, n, rng)
+    # Points assigned to each centroid so far
+    weights = [0] * n
+    for epoch in range(epochs):
+        start_centroids = centroids
+        for batch in batches(path, batch_size, buffer_size, rng):
+            labels = wildfire.assign_labels(batch, centroids)
+            x_sums, y_sums, counts = wildfire.cluster_sums(batch, labels, n)
+            moved = []
+            for i, (cx, cy) in enumerate(centroids):
+                count = counts[i]
+                if count:
+                    total = weights[i] + count
+                    cx = (cx * weights[i] + x_sums[i]) / total
+                    cy = (cy * weights[i] + y_sums[i]) / total
+                    weights[i] = total
+                moved.append((cx, cy))
+            centroids = moved
+            if on_move:
+                on_move(centroids)
+        greatest_move = max(wildfire.sq_dist(before, after)
+                            for before, after in zip(start_centroids, centroids))
+        if greatest_move <= tolerance * tolerance:
+            break
+    return centroids
+
+
+def score(path: str, centroids: list[tuple[float, float]]) -> tuple[list[int], float]:
+    """
+    The number of points from the CSV file at path that are closest
+    to each centroid, and the inertia (see wildfire.inertia) of that
+    clustering, in one more pass through the file.
+    """
+    counts = [0] * len(centroids)
+    total = 0.0
+    for batch in batches(path, config.ASSIGN_CHUNK, config.ASSIGN_CHUNK):
+        labels = wildfire.assign_labels(batch, centroids)
+        total += wildfire.inertia(batch, centroids, labels)
+        for label in labels:
+            counts[label] += 1
+    return counts, total
+
+
+def getargs() -> argparse.Namespace:
+    """Return arguments as a Namespace object"""
+    parser = argparse.ArgumentParser("Mini-batch k-means clustering of fire locations")
+    parser.add_argument("path", nargs="?", default=config.FIRE_DATA_PATH,
+        help="CSV file with Easting and Northing columns")
+    parser.add_argument("--clusters", dest="clusters", type=int, default=config.N_CLUSTERS,
+        help="Number of clusters")
+    parser.add_argument("--batch", dest="batch", type=int, default=config.MINIBATCH_SIZE,
+        help="Points per batch")
+    parser.add_argument("--epochs", dest="epochs", type=int, default=config.MINIBATCH_EPOCHS,
+        help="Most passes through the file")
+    parser.add_argument("--seed", dest="seed", type=int, default=None,
+        help="Random seed, for repeatable results")
+    return parser.parse_args()
+
+
+def main():
+    """Print the centroid of each cluster, with its number of points"""
+    args = getargs()
+    rng = random.Random(args.seed)
+    centroids = minibatch_kmeans(args.path, args.clusters, batch_size=args.batch,
+                                 epochs=args.epochs, rng=rng)
+    counts, total = score(args.path, centroids)
+    print("Easting,Northing,Fires")
+    for (easting, northing), count in zip(centroids, counts):
+        print(f"{round(easting)},{round(northing)},{count}")
+    print(f"Inertia {total:.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,13 @@ Credits: Just me :)
 """
 import doctest
 import csv
+import math
+import multiprocessing
 import random
+import time
+from array import array
+from operator import itemgetter
+from typing import Callable, Iterator, Optional
 
 import graphics.utm_plot
 import config
@@ -16,7 +22,9 @@ def make_map() -> graphics.utm_plot.Map:
     map = graphics.utm_plot.Map(config.BASEMAP_PATH,
                                 config.BASEMAP_SIZE,
                                 (config.BASEMAP_ORIGIN_EASTING, config.BASEMAP_ORIGIN_NORTHING),
-                                (config.BASEMAP_EXTENT_EASTING, config.BASEMAP_EXTENT_NORTHING))
+                                (config.BASEMAP_EXTENT_EASTING, config.BASEMAP_EXTENT_NORTHING),
+                                backend=config.DISPLAY_BACKEND,
+                                frame_pattern=config.FRAME_PATTERN)
     return map
 
 def get_fires_utm(path: str) -> list[tuple[int, int]]:
@@ -28,18 +36,24 @@ def get_fires_utm(path: str) -> list[tuple[int, int]]:
     >>> get_fires_utm("data/test_locations_utm.csv")
     [(442151, 4729315), (442151, 5071453), (914041, 4729315), (914041, 5071453)]
     """
-    fire_list = []
+    return list(iter_fires_utm(path))
 
+def iter_fires_utm(path: str) -> Iterator[tuple[int, int]]:
+    """
+    The (easting, northing) coordinate pairs within the study area
+    from the CSV file specified by path, one at a time as the file
+    is read, for data sets too large to hold in memory.
+    """
     with open(path, newline="", encoding="utf-8") as source_file:
-        reader = csv.DictReader(source_file)
+        reader = csv.reader(source_file)
+        header = next(reader)
+        easting_col = header.index("Easting")
+        northing_col = header.index("Northing")
         for row in reader:
-            easting = int(row["Easting"])
-            northing = int(row["Northing"])
+            easting = int(row[easting_col])
+            northing = int(row[northing_col])
             if in_bounds(easting, northing):
-                coords = (easting, northing)
-                fire_list.append(coords)
-
-    return fire_list
+                yield (easting, northing)
 
 def in_bounds(easting: float, northing: float) -> bool:
     """Is the UTM value within bounds of the map?"""
@@ -81,6 +95,52 @@ def assign_random(points: list[tuple[int, int]], n: int) -> list[list[tuple[int,
         assignments[choice].append(point)
     return assignments
 
+def random_labels(n_points: int, n: int, rng: random.Random = random) -> array:
+    """
+    Returns an array of n_points labels, each a random cluster
+    index in range(n).  (The same assignment as assign_random,
+    as labels rather than lists of points.)
+    """
+    return array("i", [rng.randrange(n) for i in range(n_points)])
+
+def kmeans_pp_centroids(points: list[tuple[int, int]], n: int,
+                        rng: random.Random = random) -> list[tuple[int, int]]:
+    """
+    Choose n of the points as starting centroids, k-means++ style:
+    the first at random, and each of the others at random with
+    probability proportional to the square of its distance from the
+    closest centroid chosen so far.  This spreads the centroids
+    through the data, so clustering usually converges in fewer
+    iterations than from a random partition (which starts every
+    centroid close to the mean of all the points).
+
+    >>> points = [(0, 0), (0, 1), (100, 100), (100, 101)]
+    >>> sorted(kmeans_pp_centroids(points, 2, random.Random(1)))[1][0]
+    100
+    """
+    centroids = [rng.choice(points)]
+    cx, cy = centroids[0]
+    # Square of distance from each point to its closest centroid so far
+    distances = [(x - cx) * (x - cx) + (y - cy) * (y - cy) for x, y in points]
+    while len(centroids) < n:
+        if sum(distances) == 0:
+            # Fewer distinct points than clusters
+            centroids.append(rng.choice(points))
+            continue
+        cx, cy = rng.choices(points, weights=distances)[0]
+        centroids.append((cx, cy))
+        distances = [min(distance, (x - cx) * (x - cx) + (y - cy) * (y - cy))
+                     for distance, (x, y) in zip(distances, points)]
+    return centroids
+
+def initial_centroids(points: list[tuple[int, int]], n: int,
+                      rng: random.Random = random) -> list[tuple[int, int]]:
+    """Starting centroids for clustering, chosen as config.SEEDING says"""
+    if config.SEEDING == "random":
+        return sum_centroids(*cluster_sums(points, random_labels(len(points), n, rng), n))
+    assert config.SEEDING == "kmeans++", f"Unknown seeding method '{config.SEEDING}'"
+    return kmeans_pp_centroids(points, n, rng)
+
 def centroid(points: list[tuple[int, int]]) -> tuple[int, int]:
     """The centroid of a set of points is the mean of x and mean of y"""
     x_sum = 0
@@ -107,6 +167,67 @@ def cluster_centroids(clusters: list[list[tuple[int,int]]]) -> list[tuple[int,in
         centroids.append(centroid(cluster))
     return centroids
 
+def cluster_sums(points: list[tuple[int, int]], labels: array, n: int
+                 ) -> tuple[array, array, array]:
+    """
+    Running totals for n clusters, as parallel arrays:  the sums of the
+    eastings and of the northings of the points labeled with each
+    cluster, and the number of points in each.
+
+    >>> cluster_sums([(1, 2), (3, 4), (5, 6)], array("i", [1, 0, 1]), 2)
+    (array('q', [3, 6]), array('q', [4, 8]), array('q', [1, 2]))
+    """
+    clusters = clusters_of(points, labels, n)
+    x_sums = array("q", [sum(map(itemgetter(0), cluster)) for cluster in clusters])
+    y_sums = array("q", [sum(map(itemgetter(1), cluster)) for cluster in clusters])
+    counts = array("q", [len(cluster) for cluster in clusters])
+    return x_sums, y_sums, counts
+
+def relabel(points: list[tuple[int, int]], labels: array, new_labels: array,
+            x_sums: array, y_sums: array, counts: array) -> int:
+    """
+    Update running totals (see cluster_sums) for labels changing to
+    new_labels, moving just the points whose labels changed from their
+    old cluster to their new one.  Returns the number of changed labels.
+    (If many labels changed, as in the first few iterations, it is
+    quicker to total every cluster again, so we do that instead.)
+
+    >>> points = [(1, 2), (3, 4), (5, 6)]
+    >>> sums = cluster_sums(points, array("i", [1, 0, 1]), 2)
+    >>> relabel(points, array("i", [1, 0, 1]), array("i", [0, 0, 1]), *sums)
+    1
+    >>> sums
+    (array('q', [4, 5]), array('q', [6, 6]), array('q', [2, 1]))
+    """
+    if labels == new_labels:
+        return 0
+    changed = [i for i, (old, new) in enumerate(zip(labels, new_labels)) if old != new]
+    if len(changed) > len(points) // 8:
+        x_sums[:], y_sums[:], counts[:] = cluster_sums(points, new_labels, len(counts))
+        return len(changed)
+    for i in changed:
+        x, y = points[i]
+        old = labels[i]
+        new = new_labels[i]
+        x_sums[old] -= x
+        y_sums[old] -= y
+        counts[old] -= 1
+        x_sums[new] += x
+        y_sums[new] += y
+        counts[new] += 1
+    return len(changed)
+
+def sum_centroids(x_sums: array, y_sums: array, counts: array) -> list[tuple[int, int]]:
+    """
+    The centroid of each cluster from its running totals (see
+    cluster_sums), the same as centroid of its list of points.
+
+    >>> sum_centroids(array("q", [3, 6]), array("q", [4, 8]), array("q", [1, 0]))
+    [(3, 4), (0, 0)]
+    """
+    return [(x_sum // count, y_sum // count) if count else (0, 0)
+            for x_sum, y_sum, count in zip(x_sums, y_sums, counts)]
+
 def sq_dist(p1: tuple[int, int], p2: tuple[int, int]) -> int:
     """
     Square of Euclidean distance between p1 and p2
@@ -126,20 +247,49 @@ def closest_index(point: tuple[int, int], centroids: list[tuple[int, int]]) -> i
 
     >>> closest_index((5, 5), [(3, 2), (4, 5), (7, 1)])
     1
+    >>> closest_index((5, 5), [(5, 5), (9, 9), (6, 6)])
+    0
     """
-    closest = 0
     closest_id = 0
-    
-    for centroid in centroids:
-        distance = sq_dist(point, centroid)
-        if closest == 0:
-            closest = distance
-        elif distance < closest:
+    closest = sq_dist(point, centroids[0])
+
+    for i in range(1, len(centroids)):
+        distance = sq_dist(point, centroids[i])
+        if distance < closest:
             closest = distance
-            closest_id = centroids.index(centroid)
+            closest_id = i
 
     return closest_id
 
+def assign_labels(points: list[tuple[int, int]],
+                  centroids: list[tuple[int, int]],
+                  chunk_size: int = config.ASSIGN_CHUNK) -> array:
+    """
+    Returns an array of labels:  the i'th label is the index of the
+    centroid closest to points[i] (the lowest index, if several are
+    equally close).  Distances are compared for chunk_size points
+    at a time, as a table with a row for each centroid, so there is
+    no Python function call per distance.  Instead of the square of
+    the distance from (x, y) to centroid (cx, cy), the table holds
+    that minus x*x + y*y, which is the same for every centroid:
+    cx*cx + cy*cy - 2*cx*x - 2*cy*y.  The closest centroid is still
+    the one with the least value, with less arithmetic per entry.
+
+    >>> list(assign_labels([(1, 1), (2, 2), (5, 5)], [(4, 4), (2, 2)]))
+    [1, 1, 0]
+    >>> list(assign_labels([(1, 1), (5, 5)], [(3, 3), (3, 3)], chunk_size=1))
+    [0, 0]
+    """
+    labels = array("i")
+    terms = [(cx * cx + cy * cy, 2 * cx, 2 * cy) for cx, cy in centroids]
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        # distances[j][i] is for chunk[i] and centroids[j], as above
+        distances = [[c_sq - x * twice_cx - y * twice_cy for x, y in chunk]
+                     for c_sq, twice_cx, twice_cy in terms]
+        labels.extend(column.index(min(column)) for column in zip(*distances))
+    return labels
+
 def assign_closest(points: list[tuple[int,int]],
                    centroids: list[tuple[int, int]]
                    ) -> list[list[int, int]]:
@@ -151,17 +301,223 @@ def assign_closest(points: list[tuple[int,int]],
     >>> assign_closest([(1, 1), (2, 2), (5, 5)], [(4, 4), (2, 2)])
     [[(5, 5)], [(1, 1), (2, 2)]]
     """
+    return clusters_of(points, assign_labels(points, centroids), len(centroids))
+
+def clusters_of(points: list[tuple[int, int]], labels: array, n: int
+                ) -> list[list[tuple[int, int]]]:
+    """
+    Returns a list of n lists.  The i'th list contains the points
+    labeled i.
+
+    >>> clusters_of([(1, 1), (2, 2), (5, 5)], array("i", [1, 1, 0]), 3)
+    [[(5, 5)], [(1, 1), (2, 2)], []]
+    """
     centroid_list = []
 
-    for centroid in centroids:
+    for i in range(n):
         centroid_list.append([])
-        
-    for point in points:
-        closest_id = closest_index(point, centroids)
-        centroid_list[closest_id].append(point)
+
+    for point, label in zip(points, labels):
+        centroid_list[label].append(point)
 
     return centroid_list
 
+def kmeans(points: list[tuple[int, int]],
+           centroids: list[tuple[int, int]],
+           max_iterations: int = config.MAX_ITERATIONS,
+           on_move: Optional[Callable[[list[tuple[int, int]]], None]] = None
+           ) -> tuple[list[tuple[int, int]], array]:
+    """
+    Cluster points, starting from centroids:  assign each point to the
+    closest centroid, move each centroid to the centroid of the points
+    assigned to it, and repeat until no assignment changes (or
+    max_iterations).  Calls on_move(centroids) after each move.
+    Returns the final centroids and the label of each point.
+
+    >>> centroids, labels = kmeans([(0, 0), (0, 2), (10, 0), (10, 2)], [(0, 0), (1, 1)])
+    >>> centroids, list(labels)
+    ([(0, 1), (10, 1)], [0, 0, 1, 1])
+    """
+    n = len(centroids)
+    labels = assign_labels(points, centroids)
+    x_sums, y_sums, counts = cluster_sums(points, labels, n)
+    for i in range(max_iterations):
+        centroids = sum_centroids(x_sums, y_sums, counts)
+        if on_move:
+            on_move(centroids)
+        new_labels = assign_labels(points, centroids)
+        changed = relabel(points, labels, new_labels, x_sums, y_sums, counts)
+        labels = new_labels
+        if changed == 0:
+            # No change ... this is "convergence"
+            break
+    return centroids, labels
+
+# Allowance for rounding in kmeans_hamerly's distance bounds:  a point
+# is skipped only if its bounds differ by more than this fraction
+_BOUND_SLACK = 1 + 1e-9
+
+def kmeans_hamerly(points: list[tuple[int, int]],
+                   centroids: list[tuple[int, int]],
+                   max_iterations: int = config.MAX_ITERATIONS,
+                   on_move: Optional[Callable[[list[tuple[int, int]]], None]] = None
+                   ) -> tuple[list[tuple[int, int]], array]:
+    """
+    The same clustering as kmeans, with the same results, but skipping
+    most distance calculations once clusters begin to settle (Hamerly,
+    "Making k-means even faster", 2010).  For each point we keep an
+    upper bound on its distance to its own centroid, and a lower bound
+    on its distance to every other centroid.  If the upper bound is
+    less than the lower bound, or than half the distance from its
+    centroid to the nearest other centroid, its centroid is still the
+    closest.  When centroids move, the bounds are loosened by how far
+    they moved, so they remain bounds.
+
+    >>> points = [(0, 0), (0, 2), (10, 0), (10, 2), (30, 0), (31, 1)]
+    >>> kmeans_hamerly(points, [(0, 0), (1, 1), (2, 2)]) == kmeans(points, [(0, 0), (1, 1), (2, 2)])
+    True
+    """
+    n = len(centroids)
+    labels, upper, lower = _closest_two(points, centroids)
+    x_sums, y_sums, counts = cluster_sums(points, labels, n)
+    for i in range(max_iterations):
+        moved = sum_centroids(x_sums, y_sums, counts)
+        drift = [math.dist(before, after) for before, after in zip(centroids, moved)]
+        centroids = moved
+        if on_move:
+            on_move(centroids)
+        greatest_drift = max(drift)
+        upper = [bound + drift[label] for bound, label in zip(upper, labels)]
+        lower = [bound - greatest_drift for bound in lower]
+        half_gaps = _half_gaps(centroids)
+        # Points whose closest centroid may have changed:  first
+        # tighten the upper bound, which may be enough to rule it out
+        unsure = [p for p, (bound, label) in enumerate(zip(upper, labels))
+                  if bound * _BOUND_SLACK >= max(lower[p], half_gaps[label])]
+        recheck = []
+        for p in unsure:
+            x, y = points[p]
+            cx, cy = centroids[labels[p]]
+            upper[p] = math.sqrt((x - cx) * (x - cx) + (y - cy) * (y - cy))
+            if upper[p] * _BOUND_SLACK >= max(lower[p], half_gaps[labels[p]]):
+                recheck.append(p)
+        new_labels = array("i", labels)
+        rechecked = _closest_two([points[p] for p in recheck], centroids)
+        for p, label, upper_bound, lower_bound in zip(recheck, *rechecked):
+            new_labels[p] = label
+            upper[p] = upper_bound
+            lower[p] = lower_bound
+        changed = relabel(points, labels, new_labels, x_sums, y_sums, counts)
+        labels = new_labels
+        if changed == 0:
+            break
+    return centroids, labels
+
+def _closest_two(points: list[tuple[int, int]], centroids: list[tuple[int, int]]
+                 ) -> tuple[array, list[float], list[float]]:
+    """
+    For each point, the index of its closest centroid (the lowest
+    index, if several are equally close, as in assign_labels), its
+    distance from that centroid, and its distance from the next closest.
+
+    >>> _closest_two([(0, 0), (5, 0)], [(3, 0), (0, 4)])
+    (array('i', [0, 0]), [3.0, 2.0], [4.0, 6.4031242374328485])
+    """
+    labels = array("i")
+    nearest = []
+    second = []
+    for x, y in points:
+        distances = [(x - cx) * (x - cx) + (y - cy) * (y - cy) for cx, cy in centroids]
+        closest = min(distances)
+        label = distances.index(closest)
+        distances[label] = math.inf
+        labels.append(label)
+        nearest.append(math.sqrt(closest))
+        second.append(math.sqrt(min(distances)))
+    return labels, nearest, second
+
+def _half_gaps(centroids: list[tuple[int, int]]) -> list[float]:
+    """Half the distance from each centroid to the nearest other centroid"""
+    return [min((math.dist(centroid, other) for j, other in enumerate(centroids) if j != i),
+                default=math.inf) / 2
+            for i, centroid in enumerate(centroids)]
+
+def cluster(points: list[tuple[int, int]],
+            centroids: list[tuple[int, int]],
+            max_iterations: int = config.MAX_ITERATIONS,
+            on_move: Optional[Callable[[list[tuple[int, int]]], None]] = None
+            ) -> tuple[list[tuple[int, int]], array]:
+    """kmeans or kmeans_hamerly, as config.KMEANS_METHOD says"""
+    if config.KMEANS_METHOD == "lloyd":
+        return kmeans(points, centroids, max_iterations, on_move)
+    assert config.KMEANS_METHOD == "hamerly", f"Unknown k-means method '{config.KMEANS_METHOD}'"
+    return kmeans_hamerly(points, centroids, max_iterations, on_move)
+
+def inertia(points: list[tuple[int, int]],
+            centroids: list[tuple[int, int]], labels: array) -> int:
+    """
+    Sum of the squares of the distances from each point to the
+    centroid of its cluster; less is a better clustering.
+
+    >>> inertia([(0, 0), (0, 2), (10, 0)], [(0, 1), (10, 0)], array("i", [0, 0, 1]))
+    2
+    """
+    total = 0
+    for (x, y), label in zip(points, labels):
+        cx, cy = centroids[label]
+        total += (x - cx) * (x - cx) + (y - cy) * (y - cy)
+    return total
+
+# Points and number of clusters for restart worker processes (see
+# best_clustering), installed by _init_restarts as each worker starts
+_restart_points: list[tuple[int, int]] = []
+_restart_n = 0
+
+def _init_restarts(points: list[tuple[int, int]], n: int):
+    """Install the shared points in a restart worker process"""
+    global _restart_points, _restart_n
+    _restart_points = points
+    _restart_n = n
+
+def _seeded_clustering(points: list[tuple[int, int]], n: int,
+                       seed: int) -> tuple[int, list[list[tuple[int, int]]], array]:
+    """(inertia, centroids at each step, labels) of clustering
+    from the starting centroids chosen by seed
+    """
+    centroids = initial_centroids(points, n, random.Random(seed))
+    steps = [centroids]
+    centroids, labels = cluster(points, centroids, on_move=steps.append)
+    return inertia(points, centroids, labels), steps, labels
+
+def _restart(seed: int) -> tuple[int, list[list[tuple[int, int]]], array]:
+    """_seeded_clustering of the worker's shared points"""
+    return _seeded_clustering(_restart_points, _restart_n, seed)
+
+def best_clustering(points: list[tuple[int, int]], n: int, restarts: int = 1,
+                    workers: Optional[int] = None
+                    ) -> tuple[list[list[tuple[int, int]]], array]:
+    """
+    Cluster points restarts times, each time from starting centroids
+    chosen with a different random seed, in a pool of worker processes,
+    and return the clustering with the least inertia:  its centroids
+    at each step (starting centroids first, final centroids last),
+    to animate it, and the label of each point.
+
+    >>> points = [(0, 0), (0, 2), (10, 0), (10, 2), (30, 0), (31, 1)]
+    >>> steps, labels = best_clustering(points, 3, restarts=4, workers=2)
+    >>> sorted(steps[-1]), inertia(points, steps[-1], labels)
+    ([(0, 1), (10, 1), (30, 0)], 6)
+    """
+    seeds = [random.randrange(2 ** 32) for i in range(restarts)]
+    if restarts == 1:
+        results = [_seeded_clustering(points, n, seeds[0])]
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_restarts,
+                                  initargs=(points, n)) as pool:
+            results = pool.map(_restart, seeds)
+    _, steps, labels = min(results, key=itemgetter(0))
+    return steps, labels
+
 def move_points(fire_map: graphics.utm_plot.Map,
                 points:  list[tuple[int, int]], 
                 symbols: list): 
@@ -182,25 +538,23 @@ def main():
     points = get_fires_utm(config.FIRE_DATA_PATH)
     fire_symbols = plot_points(fire_map, points, color="red")
 
-    # Initial random assignment
-    partition = assign_random(points, config.N_CLUSTERS)
-    centroids = cluster_centroids(partition)
-    centroid_symbols = plot_points(fire_map, centroids, size_px=10, color="blue")
-
-    # Continue improving assignment until assignment doesn't change
-    for i in range(config.MAX_ITERATIONS):
-        old_partition = partition
-        partition = assign_closest(points, centroids)
-        if partition == old_partition:
-            # No change ... this is "convergence"
-            break
-        centroids = cluster_centroids(partition)
+    # The best of config.RESTARTS clusterings, replayed step by step
+    steps, labels = best_clustering(points, config.N_CLUSTERS,
+                                    config.RESTARTS, config.RESTART_WORKERS)
+    centroid_symbols = plot_points(fire_map, steps[0], size_px=10, color="blue")
+    for centroids in steps[1:]:
+        if fire_map.live:
+            time.sleep(config.STEP_SECONDS)
         move_points(fire_map, centroids, centroid_symbols)
+        fire_map.flush()
 
     # Show connections at end
-    show_clusters(fire_map, centroid_symbols, partition)
+    show_clusters(fire_map, centroid_symbols,
+                  clusters_of(points, labels, config.N_CLUSTERS))
 
-    input("Press enter to quit")
+    if fire_map.live:
+        input("Press enter to quit")
+    fire_map.close()
 
 if __name__ == "__main__":
     main()